@@ -0,0 +1,39 @@
+"""add_booking_keyset_indexes
+
+Revision ID: 5c1e9a7d2f43
+Revises: b44b82acf81c
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '5c1e9a7d2f43'
+down_revision = 'b44b82acf81c'
+branch_labels = None
+depends_on = None
+
+
+# Индексы для keyset-пагинации бронирований по (date, id)
+INDEXES = {
+    'ix_bookings_date_id': ['date', 'id'],
+    'ix_bookings_user_id_date_id': ['user_id', 'date', 'id'],
+    'ix_bookings_cafe_id_date_id': ['cafe_id', 'date', 'id'],
+}
+
+
+def upgrade() -> None:
+    # CONCURRENTLY не блокирует запись в bookings на время построения индексов,
+    # но выполняется только вне транзакции
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES.items():
+            # Прерванное построение CONCURRENTLY оставляет невалидный индекс
+            op.drop_index(name, table_name='bookings', postgresql_concurrently=True, if_exists=True)
+            op.create_index(name, 'bookings', columns, unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in reversed(list(INDEXES)):
+            op.drop_index(name, table_name='bookings', postgresql_concurrently=True, if_exists=True)
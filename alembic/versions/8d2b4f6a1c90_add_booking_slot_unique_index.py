@@ -0,0 +1,65 @@
+"""add_booking_slot_unique_index
+
+Revision ID: 8d2b4f6a1c90
+Revises: 5c1e9a7d2f43
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '8d2b4f6a1c90'
+down_revision = '5c1e9a7d2f43'
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = 'uq_bookings_table_slot_date_active'
+# Действующие бронирования: отмененные и деактивированные не учитываются
+ACTIVE_BOOKING = "status <> 'CANCELLED' AND active"
+
+
+def check_duplicate_bookings() -> None:
+    """Остановка миграции, если стол уже забронирован дважды в одном слоте"""
+    duplicates = op.get_bind().execute(sa.text(
+        f"SELECT table_id, slot_id, date, array_agg(id ORDER BY id) AS ids "
+        f"FROM bookings WHERE {ACTIVE_BOOKING} "
+        f"GROUP BY table_id, slot_id, date HAVING count(*) > 1 "
+        f"ORDER BY date, table_id, slot_id LIMIT 20"
+    )).fetchall()
+    if duplicates:
+        rows = "\n".join(
+            f"  table {row.table_id}, slot {row.slot_id}, {row.date}: bookings {row.ids}"
+            for row in duplicates
+        )
+        raise RuntimeError(
+            f"Cannot create unique index {INDEX_NAME}: active bookings overlap "
+            f"(first {len(duplicates)} shown). Cancel or deactivate the extra "
+            f"bookings and run the migration again:\n{rows}"
+        )
+
+
+def upgrade() -> None:
+    # Запрет двойного бронирования стола в одном слоте на одну дату.
+    # Индекс частичный: отмененные и деактивированные бронирования не учитываются.
+    if not context.is_offline_mode():
+        check_duplicate_bookings()
+    
+    # CONCURRENTLY не блокирует запись в bookings на время построения индекса,
+    # но выполняется только вне транзакции
+    with op.get_context().autocommit_block():
+        # Прерванное построение CONCURRENTLY оставляет невалидный индекс
+        op.drop_index(INDEX_NAME, table_name='bookings', postgresql_concurrently=True, if_exists=True)
+        op.create_index(
+            INDEX_NAME,
+            'bookings',
+            ['table_id', 'slot_id', 'date'],
+            unique=True,
+            postgresql_where=sa.text(ACTIVE_BOOKING),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(INDEX_NAME, table_name='bookings', postgresql_concurrently=True)
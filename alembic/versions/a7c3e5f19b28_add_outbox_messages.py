@@ -0,0 +1,42 @@
+"""add_outbox_messages
+
+Revision ID: a7c3e5f19b28
+Revises: 8d2b4f6a1c90
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e5f19b28'
+down_revision = '8d2b4f6a1c90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Outbox задач Celery (уведомления о бронированиях)
+    op.create_table(
+        'outbox_messages',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('task', sa.String(100), nullable=False),
+        sa.Column('args', postgresql.JSONB(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('published_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_outbox_messages_pending',
+        'outbox_messages',
+        ['id'],
+        postgresql_where=sa.text('published_at IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_outbox_messages_pending', table_name='outbox_messages')
+    op.drop_table('outbox_messages')
@@ -0,0 +1,26 @@
+"""add_cafe_timezone
+
+Revision ID: c2d8f4a6e913
+Revises: a7c3e5f19b28
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c2d8f4a6e913'
+down_revision = 'a7c3e5f19b28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Часовой пояс кафе: время слотов задается в местном времени кафе.
+    # Существующим кафе назначается пояс по умолчанию (DEFAULT_CAFE_TIMEZONE)
+    op.add_column('cafes', sa.Column('timezone', sa.String(64), nullable=False, server_default='Europe/Moscow'))
+    op.alter_column('cafes', 'timezone', server_default=None)
+
+
+def downgrade() -> None:
+    op.drop_column('cafes', 'timezone')
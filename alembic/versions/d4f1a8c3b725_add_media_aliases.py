@@ -0,0 +1,33 @@
+"""add_media_aliases
+
+Revision ID: d4f1a8c3b725
+Revises: c2d8f4a6e913
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'd4f1a8c3b725'
+down_revision = 'c2d8f4a6e913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Соответствие старых UUID изображений хэшам содержимого
+    # (заполняется скриптом scripts/migrate_media.py)
+    op.create_table(
+        'media_aliases',
+        sa.Column('image_id', sa.String(36), nullable=False),
+        sa.Column('content_hash', sa.String(64), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('image_id')
+    )
+    op.create_index(op.f('ix_media_aliases_content_hash'), 'media_aliases', ['content_hash'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_media_aliases_content_hash'), table_name='media_aliases')
+    op.drop_table('media_aliases')
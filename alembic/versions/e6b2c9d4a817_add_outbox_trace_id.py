@@ -0,0 +1,24 @@
+"""add_outbox_trace_id
+
+Revision ID: e6b2c9d4a817
+Revises: d4f1a8c3b725
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'e6b2c9d4a817'
+down_revision = 'd4f1a8c3b725'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # trace_id запроса API для связи задачи Celery с запросом
+    op.add_column('outbox_messages', sa.Column('trace_id', sa.String(64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('outbox_messages', 'trace_id')
@@ -0,0 +1,24 @@
+"""add_outbox_failed_at
+
+Revision ID: f3a9d7c1b264
+Revises: e6b2c9d4a817
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'f3a9d7c1b264'
+down_revision = 'e6b2c9d4a817'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Сообщения, исчерпавшие OUTBOX_MAX_ATTEMPTS попыток публикации
+    op.add_column('outbox_messages', sa.Column('failed_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('outbox_messages', 'failed_at')
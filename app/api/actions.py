@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Optional
 from app.database import get_db
 from app.models.action import Action
 from app.models.cafe import Cafe
@@ -8,20 +8,32 @@ from app.models.user import User
 from app.schemas.action import ActionCreate, ActionUpdate, ActionResponse
 from app.core.auth import get_current_active_user, require_role
 from app.utils.logger import logger
+from app.utils.query_stats import query_budget
+from app.utils.pagination import paginate_keyset, NEXT_CURSOR_HEADER, MAX_PAGE_LIMIT
+from app.utils.response_cache import ResponseCache, invalidate_responses
 
 router = APIRouter(prefix="/actions", tags=["Акции"])
 
 
 @router.get("", response_model=List[ActionResponse])
+@query_budget(3)
 async def get_actions(
+    request: Request,
+    response: Response,
     cafe_id: int = None,
-    skip: int = 0,
-    limit: int = 100,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_LIMIT),
     active_only: bool = True,
+    cursor: Optional[str] = None,  # Курсор keyset-пагинации (пустой - первая страница)
     db: Session = Depends(get_db)
 ):
     """Получение списка акций"""
-    query = db.query(Action)
+    cache = ResponseCache(request, "actions")
+    cached = await cache.lookup()
+    if cached is not None:
+        return cached
+    
+    query = db.query(Action).options(selectinload(Action.cafes))
     
     if cafe_id:
         query = query.join(Cafe.actions).filter(Cafe.id == cafe_id)
@@ -29,7 +41,12 @@ async def get_actions(
     if active_only:
         query = query.filter(Action.active == True)
     
-    actions = query.offset(skip).limit(limit).all()
+    if cursor is not None:
+        actions, next_cursor = paginate_keyset(query, [Action.id], cursor, limit)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    else:
+        actions = query.offset(skip).limit(limit).all()
     
     # Преобразование для response
     result = []
@@ -40,7 +57,7 @@ async def get_actions(
         }
         result.append(ActionResponse(**action_dict))
     
-    return result
+    return await cache.store(result, response)
 
 
 @router.get("/{action_id}", response_model=ActionResponse)
@@ -79,8 +96,9 @@ async def create_action(
     if action_data.cafe_ids:
         cafes = db.query(Cafe).filter(Cafe.id.in_(action_data.cafe_ids)).all()
         # Менеджер может привязывать только к своим кафе
-        if current_user.role.value == "manager":
-            user_cafe_ids = [c.id for c in current_user.managed_cafes]
+        user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
+        if user_role == "manager":
+            user_cafe_ids = [row.id for row in db.query(Cafe.id).filter(Cafe.managers.any(User.id == current_user.id))]
             for cafe in cafes:
                 if cafe.id not in user_cafe_ids:
                     raise HTTPException(
@@ -91,6 +109,7 @@ async def create_action(
     
     db.add(new_action)
     db.commit()
+    await invalidate_responses("actions")
     db.refresh(new_action)
     
     logger.info(f"User {current_user.username} (id: {current_user.id}) created action {new_action.id}")
@@ -118,8 +137,9 @@ async def update_action(
         )
     
     # Менеджер может обновлять только акции своих кафе
-    if current_user.role.value == "manager":
-        user_cafe_ids = [c.id for c in current_user.managed_cafes]
+    user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
+    if user_role == "manager":
+        user_cafe_ids = [row.id for row in db.query(Cafe.id).filter(Cafe.managers.any(User.id == current_user.id))]
         action_cafe_ids = [c.id for c in action.cafes]
         if not any(cid in user_cafe_ids for cid in action_cafe_ids):
             raise HTTPException(
@@ -136,8 +156,9 @@ async def update_action(
     if action_data.cafe_ids is not None:
         cafes = db.query(Cafe).filter(Cafe.id.in_(action_data.cafe_ids)).all()
         # Менеджер может привязывать только к своим кафе
-        if current_user.role.value == "manager":
-            user_cafe_ids = [c.id for c in current_user.managed_cafes]
+        user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
+        if user_role == "manager":
+            user_cafe_ids = [row.id for row in db.query(Cafe.id).filter(Cafe.managers.any(User.id == current_user.id))]
             for cafe in cafes:
                 if cafe.id not in user_cafe_ids:
                     raise HTTPException(
@@ -147,6 +168,7 @@ async def update_action(
         action.cafes = cafes
     
     db.commit()
+    await invalidate_responses("actions")
     db.refresh(action)
     
     logger.info(f"User {current_user.username} (id: {current_user.id}) updated action {action.id}")
@@ -173,8 +195,9 @@ async def delete_action(
         )
     
     # Менеджер может удалять только акции своих кафе
-    if current_user.role.value == "manager":
-        user_cafe_ids = [c.id for c in current_user.managed_cafes]
+    user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
+    if user_role == "manager":
+        user_cafe_ids = [row.id for row in db.query(Cafe.id).filter(Cafe.managers.any(User.id == current_user.id))]
         action_cafe_ids = [c.id for c in action.cafes]
         if not any(cid in user_cafe_ids for cid in action_cafe_ids):
             raise HTTPException(
@@ -184,6 +207,7 @@ async def delete_action(
     
     action.active = False
     db.commit()
+    await invalidate_responses("actions")
     
     logger.info(f"User {current_user.username} (id: {current_user.id}) deactivated action {action.id}")
     
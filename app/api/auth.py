@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
-from app.database import get_db
+from app.database import get_async_db
 from app.models.user import User
 from app.schemas.token import Token, AuthData
 from app.schemas.user import UserResponse
@@ -17,15 +18,18 @@ router = APIRouter(prefix="/auth", tags=["Аутентификация"])
 @router.post("/login", response_model=Token)
 async def login(
     auth_data: AuthData,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Получение токена авторизации"""
     user = None
     
     # Пытаемся найти пользователя по email или phone
-    user = db.query(User).filter(
-        (User.email == auth_data.login) | (User.phone == auth_data.login)
-    ).first()
+    result = await db.execute(
+        select(User).where(
+            (User.email == auth_data.login) | (User.phone == auth_data.login)
+        ).limit(1)
+    )
+    user = result.scalar_one_or_none()
     
     if not user or not verify_password(auth_data.password, user.password_hash):
         logger.warning(f"Failed login attempt for {auth_data.login}")
@@ -54,12 +58,15 @@ async def login(
 @router.post("/login/form", response_model=Token)
 async def login_form(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Аутентификация через OAuth2 form (для Swagger UI)"""
-    user = db.query(User).filter(
-        (User.email == form_data.username) | (User.phone == form_data.username)
-    ).first()
+    result = await db.execute(
+        select(User).where(
+            (User.email == form_data.username) | (User.phone == form_data.username)
+        ).limit(1)
+    )
+    user = result.scalar_one_or_none()
     
     if not user or not verify_password(form_data.password, user.password_hash):
         raise HTTPException(
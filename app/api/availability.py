@@ -0,0 +1,76 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date
+from app.database import get_async_db
+from app.models.booking import Booking, BookingStatus
+from app.models.cafe import Cafe
+from app.models.table import Table
+from app.models.slot import Slot
+from app.models.user import User
+from app.schemas.availability import AvailabilityResponse
+from app.core.auth import get_current_active_user
+
+router = APIRouter(prefix="/cafe/{cafe_id}/availability", tags=["Доступность"])
+
+
+@router.get("", response_model=AvailabilityResponse)
+async def get_availability(
+    cafe_id: int,
+    booking_date: date = Query(..., alias="date"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Матрица свободных столов по слотам кафе на дату
+
+    Заменяет поочередные запросы списков столов и слотов с booking_date:
+    занятость всех столов во всех слотах считается одним сгруппированным
+    запросом по бронированиям.
+    """
+    cafe = await db.get(Cafe, cafe_id)
+    user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
+    if not cafe or (user_role == "user" and not cafe.active):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Кафе не найдено"
+        )
+    
+    result = await db.execute(
+        select(Table.id, Table.seats_count).where(
+            Table.cafe_id == cafe_id,
+            Table.active == True
+        ).order_by(Table.id)
+    )
+    tables = result.all()
+    
+    result = await db.execute(
+        select(Slot.id, Slot.start_time, Slot.end_time).where(
+            Slot.cafe_id == cafe_id,
+            Slot.active == True
+        ).order_by(Slot.start_time, Slot.id)
+    )
+    slots = result.all()
+    
+    # Занятые пары (стол, слот) на дату
+    result = await db.execute(
+        select(Booking.table_id, Booking.slot_id).where(
+            Booking.cafe_id == cafe_id,
+            Booking.date == booking_date,
+            Booking.status != BookingStatus.CANCELLED,
+            Booking.active == True
+        ).group_by(Booking.table_id, Booking.slot_id)
+    )
+    booked = set(result.tuples())
+    
+    free = [
+        "".join("0" if (table.id, slot.id) in booked else "1" for slot in slots)
+        for table in tables
+    ]
+    
+    return AvailabilityResponse(
+        cafe_id=cafe_id,
+        date=booking_date,
+        tables=[{"id": t.id, "seats_count": t.seats_count} for t in tables],
+        slots=[{"id": s.id, "start_time": s.start_time, "end_time": s.end_time} for s in slots],
+        free=free
+    )
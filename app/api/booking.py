@@ -1,86 +1,99 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from datetime import date
-from app.database import get_db
+from app.database import get_async_db
 from app.models.booking import Booking, BookingStatus
 from app.models.booking_dish import BookingDish
 from app.models.user import User, UserRole
 from app.models.cafe import Cafe
 from app.models.table import Table
 from app.models.slot import Slot
-from app.schemas.booking import BookingCreate, BookingUpdate, BookingResponse, BookingDishResponse
+from app.schemas.booking import (
+    BookingCreate,
+    BookingUpdate,
+    BookingResponse,
+    BookingBulkCreate,
+    BookingBulkResponse,
+    BookingBulkItemResult
+)
 from app.core.auth import get_current_active_user, require_role
 from app.services.booking_service import (
-    check_booking_conflicts,
+    insert_booking,
+    insert_bookings,
+    validate_bookings_bulk,
+    flush_booking_changes,
     validate_booking_date,
     validate_booking_status,
-    create_booking_dishes
+    create_booking_dishes,
+    create_bookings_dishes,
+    select_bookings_with_dishes,
+    get_booking_with_dishes,
+    booking_to_response,
+    bookings_to_response
 )
+from app.services.outbox import enqueue_task
 from app.utils.logger import logger
+from app.utils.query_stats import query_budget
+from app.utils.pagination import paginate_keyset_async, NEXT_CURSOR_HEADER, MAX_PAGE_LIMIT
 
 router = APIRouter(prefix="/booking", tags=["Бронирования"])
 
 
 @router.get("", response_model=List[BookingResponse])
+@query_budget(4)
 async def get_bookings(
+    response: Response,
     user_id: int = None,
     cafe_id: int = None,
     booking_date: date = None,
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = None,  # Курсор keyset-пагинации (пустой - первая страница)
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Получение списка бронирований"""
-    query = db.query(Booking)
+    """Получение списка бронирований
+
+    При переданном cursor используется keyset-пагинация по (date, id),
+    курсор следующей страницы возвращается в заголовке X-Next-Cursor.
+    """
+    query = select_bookings_with_dishes()
     
     # Пользователь видит только свои бронирования, админы и менеджеры - все
     user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
     if user_role == "user":
-        query = query.filter(Booking.user_id == current_user.id)
+        query = query.where(Booking.user_id == current_user.id)
     elif user_id:
-        query = query.filter(Booking.user_id == user_id)
+        query = query.where(Booking.user_id == user_id)
     
     if cafe_id:
-        query = query.filter(Booking.cafe_id == cafe_id)
+        query = query.where(Booking.cafe_id == cafe_id)
     
     if booking_date:
-        query = query.filter(Booking.date == booking_date)
-    
-    bookings = query.offset(skip).limit(limit).all()
-    
-    # Преобразование для response
-    result = []
-    for booking in bookings:
-        dishes_response = [
-            BookingDishResponse(
-                id=bd.id,
-                dish_id=bd.dish_id,
-                dish_name=bd.dish.name,
-                quantity=bd.quantity,
-                price=float(bd.price)
-            )
-            for bd in booking.dishes
-        ]
-        
-        booking_dict = {
-            **{c.name: getattr(booking, c.name) for c in booking.__table__.columns},
-            "dishes": dishes_response
-        }
-        result.append(BookingResponse(**booking_dict))
-    
-    return result
+        query = query.where(Booking.date == booking_date)
+    
+    if cursor is not None:
+        bookings, next_cursor = await paginate_keyset_async(db, query, [Booking.date, Booking.id], cursor, limit)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    else:
+        result = await db.execute(query.offset(skip).limit(limit))
+        bookings = result.scalars().all()
+    
+    return bookings_to_response(bookings)
 
 
 @router.get("/{booking_id}", response_model=BookingResponse)
+@query_budget(4)
 async def get_booking(
     booking_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Получение бронирования по ID"""
-    booking = db.query(Booking).filter(Booking.id == booking_id).first()
+    booking = await get_booking_with_dishes(db, booking_id)
     if not booking:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -95,28 +108,14 @@ async def get_booking(
             detail="Not enough permissions"
         )
     
-    dishes_response = [
-        BookingDishResponse(
-            id=bd.id,
-            dish_id=bd.dish_id,
-            dish_name=bd.dish.name,
-            quantity=bd.quantity,
-            price=float(bd.price)
-        )
-        for bd in booking.dishes
-    ]
-    
-    booking_dict = {
-        **{c.name: getattr(booking, c.name) for c in booking.__table__.columns},
-        "dishes": dishes_response
-    }
-    return BookingResponse(**booking_dict)
+    return booking_to_response(booking)
 
 
 @router.post("", response_model=BookingResponse, status_code=status.HTTP_201_CREATED)
+@query_budget(10)
 async def create_booking(
     booking_data: BookingCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Создание нового бронирования"""
@@ -124,14 +123,14 @@ async def create_booking(
     validate_booking_date(booking_data.date)
     
     # Проверка существования кафе, стола и слота
-    cafe = db.query(Cafe).filter(Cafe.id == booking_data.cafe_id).first()
+    cafe = await db.get(Cafe, booking_data.cafe_id)
     if not cafe or not cafe.active:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Cafe not found or inactive"
         )
     
-    table = db.query(Table).filter(Table.id == booking_data.table_id).first()
+    table = await db.get(Table, booking_data.table_id)
     if not table or not table.active:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -144,7 +143,7 @@ async def create_booking(
             detail="Table does not belong to this cafe"
         )
     
-    slot = db.query(Slot).filter(Slot.id == booking_data.slot_id).first()
+    slot = await db.get(Slot, booking_data.slot_id)
     if not slot or not slot.active:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -157,72 +156,152 @@ async def create_booking(
             detail="Slot does not belong to this cafe"
         )
     
-    # Проверка пересечений
-    if check_booking_conflicts(
-        db, current_user.id, booking_data.table_id, booking_data.slot_id, booking_data.date
-    ):
+    # Создание бронирования (пересечения отсекаются уникальным индексом в БД)
+    booking_id = await insert_booking(db, {
+        "user_id": current_user.id,
+        "cafe_id": booking_data.cafe_id,
+        "table_id": booking_data.table_id,
+        "slot_id": booking_data.slot_id,
+        "date": booking_data.date,
+        "note": booking_data.note,
+        "status": BookingStatus.PENDING
+    })
+    if booking_id is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Этот стол и временной слот уже забронированы"
         )
     
-    # Создание бронирования
-    new_booking = Booking(
-        user_id=current_user.id,
-        cafe_id=booking_data.cafe_id,
-        table_id=booking_data.table_id,
-        slot_id=booking_data.slot_id,
-        date=booking_data.date,
-        note=booking_data.note,
-        status=BookingStatus.PENDING
-    )
-    
-    db.add(new_booking)
-    db.flush()
-    
     # Добавление блюд если есть
     if booking_data.dishes:
         dishes_data = [{"dish_id": d.dish_id, "quantity": d.quantity} for d in booking_data.dishes]
-        create_booking_dishes(db, new_booking.id, dishes_data)
-    
-    db.commit()
-    db.refresh(new_booking)
+        await create_booking_dishes(db, booking_id, dishes_data)
     
-    logger.info(f"User {current_user.username} (id: {current_user.id}) created booking {new_booking.id}")
+    # Уведомление администратору сохраняется в outbox вместе с бронированием
+    enqueue_task(db, "send_booking_notification", booking_id, "created")
+    await db.commit()
     
-    # Отправка уведомления администратору (через Celery)
-    from app.tasks.notifications import send_booking_notification
-    send_booking_notification.delay(new_booking.id, "created")
+    logger.info(f"User {current_user.username} (id: {current_user.id}) created booking {booking_id}")
     
     # Получение полной информации для response
-    booking = db.query(Booking).filter(Booking.id == new_booking.id).first()
-    dishes_response = [
-        BookingDishResponse(
-            id=bd.id,
-            dish_id=bd.dish_id,
-            dish_name=bd.dish.name,
-            quantity=bd.quantity,
-            price=float(bd.price)
+    booking = await get_booking_with_dishes(db, booking_id)
+    return booking_to_response(booking)
+
+
+@router.post(
+    "/bulk",
+    response_model=BookingBulkResponse,
+    status_code=status.HTTP_201_CREATED,
+    responses={status.HTTP_207_MULTI_STATUS: {"model": BookingBulkResponse, "description": "Created partially"}}
+)
+@query_budget(12)
+async def create_bookings_bulk(
+    bulk_data: BookingBulkCreate,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Массовое создание бронирований (групповые и корпоративные заказы)
+
+    При atomic=True бронирования создаются только если корректны все,
+    иначе создаются корректные, а по остальным возвращаются ошибки.
+    Ответ 201 - созданы все, 207 - часть (статус каждой позиции в results),
+    400 - не создано ни одного.
+
+    Число запросов не зависит от размера группы: проверка, вставка
+    бронирований и блюд выполняются запросами на всю группу.
+    """
+    items = bulk_data.items
+    errors = await validate_bookings_bulk(db, items)
+    
+    if errors and bulk_data.atomic:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=[{"index": index, "detail": detail} for index, detail in sorted(errors.items())]
         )
-        for bd in booking.dishes
-    ]
-    
-    booking_dict = {
-        **{c.name: getattr(booking, c.name) for c in booking.__table__.columns},
-        "dishes": dishes_response
-    }
-    return BookingResponse(**booking_dict)
+    
+    valid = [(index, item) for index, item in enumerate(items) if index not in errors]
+    booking_ids = {}
+    if valid:
+        # Создание бронирований одним INSERT (пересечения отсекаются уникальным индексом в БД)
+        booking_ids = await insert_bookings(db, [
+            {
+                "user_id": current_user.id,
+                "cafe_id": item.cafe_id,
+                "table_id": item.table_id,
+                "slot_id": item.slot_id,
+                "date": item.date,
+                "note": item.note,
+                "status": BookingStatus.PENDING
+            }
+            for _, item in valid
+        ])
+    
+    created_ids = []
+    dishes_by_booking = {}
+    for index, item in valid:
+        booking_id = booking_ids.get((item.table_id, item.slot_id, item.date))
+        if booking_id is None:
+            # Стол и слот заняты параллельным запросом после проверки
+            errors[index] = "Этот стол и временной слот уже забронированы"
+            continue
+        created_ids.append(booking_id)
+        if item.dishes:
+            dishes_by_booking[booking_id] = [{"dish_id": d.dish_id, "quantity": d.quantity} for d in item.dishes]
+    
+    # Блюда всех бронирований группы одним INSERT
+    if dishes_by_booking:
+        await create_bookings_dishes(db, dishes_by_booking)
+    
+    if errors and (bulk_data.atomic or not created_ids):
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=[{"index": index, "detail": detail} for index, detail in sorted(errors.items())]
+        )
+    
+    # Одно сводное уведомление на всю группу
+    if created_ids:
+        enqueue_task(db, "send_bulk_booking_notification", created_ids, "created")
+    await db.commit()
+    
+    logger.info(
+        f"User {current_user.username} (id: {current_user.id}) created {len(created_ids)} bookings in bulk, "
+        f"rejected {len(errors)}"
+    )
+    
+    result = await db.execute(
+        select_bookings_with_dishes().where(Booking.id.in_(created_ids)).order_by(Booking.id)
+    )
+    bookings = result.scalars().all()
+    
+    results = []
+    for index, item in enumerate(items):
+        if index in errors:
+            results.append(BookingBulkItemResult(index=index, status=status.HTTP_400_BAD_REQUEST, detail=errors[index]))
+        else:
+            booking_id = booking_ids[(item.table_id, item.slot_id, item.date)]
+            results.append(BookingBulkItemResult(index=index, status=status.HTTP_201_CREATED, booking_id=booking_id))
+    if errors:
+        response.status_code = status.HTTP_207_MULTI_STATUS
+    
+    return BookingBulkResponse(
+        created=bookings_to_response(bookings),
+        errors=[{"index": index, "detail": detail} for index, detail in sorted(errors.items())],
+        results=results
+    )
 
 
 @router.patch("/{booking_id}", response_model=BookingResponse)
+@query_budget(8)
 async def update_booking(
     booking_id: int,
     booking_data: BookingUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Обновление бронирования"""
-    booking = db.query(Booking).filter(Booking.id == booking_id).first()
+    booking = await db.get(Booking, booking_id)
     if not booking:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -246,68 +325,41 @@ async def update_booking(
     if "date" in update_data:
         validate_booking_date(update_data["date"])
     
-    # Проверка пересечений если меняются стол, слот или дата
-    if any(key in update_data for key in ["table_id", "slot_id", "date"]):
-        table_id = update_data.get("table_id", booking.table_id)
-        slot_id = update_data.get("slot_id", booking.slot_id)
-        booking_date = update_data.get("date", booking.date)
-        
-        if check_booking_conflicts(db, booking.user_id, table_id, slot_id, booking_date, booking_id):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="This table and time slot are already booked"
-            )
-    
     # Обновление полей
     for field, value in update_data.items():
         setattr(booking, field, value)
     
+    # Пересечения со столом, слотом и датой отсекаются уникальным индексом в БД
+    await flush_booking_changes(db, "This table and time slot are already booked")
+    
     # Обновление блюд если они указаны
     if booking_data.dishes is not None:
         # Удаление старых блюд
-        db.query(BookingDish).filter(BookingDish.booking_id == booking_id).delete()
+        await db.execute(delete(BookingDish).where(BookingDish.booking_id == booking_id))
         # Добавление новых
         if booking_data.dishes:
             dishes_data = [{"dish_id": d.dish_id, "quantity": d.quantity} for d in booking_data.dishes]
-            create_booking_dishes(db, booking_id, dishes_data)
-    
-    db.commit()
-    db.refresh(booking)
+            await create_booking_dishes(db, booking_id, dishes_data)
     
-    logger.info(f"User {current_user.username} (id: {current_user.id}) updated booking {booking.id}")
+    # Уведомление администратору сохраняется в outbox вместе с изменением
+    enqueue_task(db, "send_booking_notification", booking_id, "updated")
+    await db.commit()
     
-    # Отправка уведомления администратору
-    from app.tasks.notifications import send_booking_notification
-    send_booking_notification.delay(booking.id, "updated")
+    logger.info(f"User {current_user.username} (id: {current_user.id}) updated booking {booking_id}")
     
     # Получение полной информации для response
-    booking = db.query(Booking).filter(Booking.id == booking_id).first()
-    dishes_response = [
-        BookingDishResponse(
-            id=bd.id,
-            dish_id=bd.dish_id,
-            dish_name=bd.dish.name,
-            quantity=bd.quantity,
-            price=float(bd.price)
-        )
-        for bd in booking.dishes
-    ]
-    
-    booking_dict = {
-        **{c.name: getattr(booking, c.name) for c in booking.__table__.columns},
-        "dishes": dishes_response
-    }
-    return BookingResponse(**booking_dict)
+    booking = await get_booking_with_dishes(db, booking_id)
+    return booking_to_response(booking)
 
 
 @router.delete("/{booking_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def cancel_booking(
     booking_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Отмена бронирования"""
-    booking = db.query(Booking).filter(Booking.id == booking_id).first()
+    booking = await db.get(Booking, booking_id)
     if not booking:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -325,13 +377,11 @@ async def cancel_booking(
     validate_booking_status(booking)
     
     booking.status = BookingStatus.CANCELLED
-    db.commit()
-    
-    logger.info(f"User {current_user.username} (id: {current_user.id}) cancelled booking {booking.id}")
+    # Уведомление администратору сохраняется в outbox вместе с отменой
+    enqueue_task(db, "send_booking_notification", booking_id, "cancelled")
+    await db.commit()
     
-    # Отправка уведомления администратору
-    from app.tasks.notifications import send_booking_notification
-    send_booking_notification.delay(booking.id, "cancelled")
+    logger.info(f"User {current_user.username} (id: {current_user.id}) cancelled booking {booking_id}")
     
     return None
 
@@ -1,39 +1,74 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import List, Optional
+from app.config import settings
+from app.database import get_async_db
 from app.models.cafe import Cafe
 from app.models.user import User
 from app.schemas.cafe import CafeCreate, CafeUpdate, CafeResponse
 from app.core.auth import get_current_active_user, require_role
 from app.utils.logger import logger
+from app.utils.query_stats import query_budget
+from app.utils.pagination import paginate_keyset_async, NEXT_CURSOR_HEADER, MAX_PAGE_LIMIT
+from app.utils.response_cache import ResponseCache, invalidate_responses
+from app.services.recipients import invalidate_recipients
 
 router = APIRouter(prefix="/cafes", tags=["Кафе"])
 
 
+async def get_cafe_with_managers(db: AsyncSession, cafe_id: int) -> Optional[Cafe]:
+    """Получение кафе по ID вместе с менеджерами (с перечитыванием из БД)"""
+    result = await db.execute(
+        select(Cafe)
+        .options(selectinload(Cafe.managers))
+        .where(Cafe.id == cafe_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one_or_none()
+
+
 @router.get("", response_model=List[CafeResponse])
+@query_budget(3)
 async def get_cafes(
-    skip: int = 0,
-    limit: int = 100,
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_LIMIT),
     show_all: bool = False,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,  # Курсор keyset-пагинации (пустой - первая страница)
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Получение списка кафе"""
-    query = db.query(Cafe)
+    user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
+    # Менеджеру отдается свой список кафе, остальным - общий для роли
+    scope = f"manager:{current_user.id}" if user_role == "manager" else user_role
+    cache = ResponseCache(request, "cafes", scope)
+    cached = await cache.lookup()
+    if cached is not None:
+        return cached
+    
+    query = select(Cafe).options(selectinload(Cafe.managers))
     
     # Менеджер видит только свои кафе
-    user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
     if user_role == "manager":
-        query = query.filter(Cafe.managers.any(User.id == current_user.id))
+        query = query.where(Cafe.managers.any(User.id == current_user.id))
     # Пользователь видит только активные
     elif user_role == "user":
-        query = query.filter(Cafe.active == True)
+        query = query.where(Cafe.active == True)
     # Админ видит все или только активные в зависимости от show_all
     elif not show_all:
-        query = query.filter(Cafe.active == True)
+        query = query.where(Cafe.active == True)
     
-    cafes = query.offset(skip).limit(limit).all()
+    if cursor is not None:
+        cafes, next_cursor = await paginate_keyset_async(db, query, [Cafe.id], cursor, limit)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    else:
+        result = await db.execute(query.offset(skip).limit(limit))
+        cafes = result.scalars().all()
     
     # Преобразование для response (соответствует OpenAPI)
     result = []
@@ -51,23 +86,25 @@ async def get_cafes(
             "description": cafe.description,
             "photo_id": cafe.photo,  # photo -> photo_id
             "is_active": cafe.active,  # active -> is_active
+            "timezone": cafe.timezone,
             "managers": managers_list,  # manager_ids -> managers (список объектов)
             "created_at": cafe.created_at,
             "updated_at": cafe.updated_at
         }
         result.append(CafeResponse(**cafe_dict))
     
-    return result
+    return await cache.store(result, response)
 
 
 @router.get("/{cafe_id}", response_model=CafeResponse)
+@query_budget(3)
 async def get_cafe(
     cafe_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Получение кафе по ID"""
-    cafe = db.query(Cafe).filter(Cafe.id == cafe_id).first()
+    cafe = await get_cafe_with_managers(db, cafe_id)
     if not cafe:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -76,7 +113,7 @@ async def get_cafe(
     
     # Менеджер может видеть только свои кафе
     user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
-    if user_role == "manager" and current_user not in cafe.managers:
+    if user_role == "manager" and current_user.id not in [m.id for m in cafe.managers]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
@@ -103,6 +140,7 @@ async def get_cafe(
         "description": cafe.description,
         "photo_id": cafe.photo,  # photo -> photo_id
         "is_active": cafe.active,  # active -> is_active
+        "timezone": cafe.timezone,
         "managers": managers_list,  # manager_ids -> managers (список объектов)
         "created_at": cafe.created_at,
         "updated_at": cafe.updated_at
@@ -113,7 +151,7 @@ async def get_cafe(
 @router.post("", response_model=CafeResponse, status_code=status.HTTP_201_CREATED)
 async def create_cafe(
     cafe_data: CafeCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_role("admin"))  # Только админ может создавать кафе
 ):
     """Создание нового кафе"""
@@ -125,17 +163,21 @@ async def create_cafe(
         photo=cafe_data.photo_id,  # Используем photo_id из схемы
         work_start_time=cafe_data.work_start_time,
         work_end_time=cafe_data.work_end_time,
-        slot_duration_minutes=cafe_data.slot_duration_minutes
+        slot_duration_minutes=cafe_data.slot_duration_minutes,
+        timezone=cafe_data.timezone or settings.DEFAULT_CAFE_TIMEZONE
     )
     
     # Добавление менеджеров (используем managers_id из схемы)
     if cafe_data.managers_id:
-        managers = db.query(User).filter(User.id.in_(cafe_data.managers_id)).all()
-        new_cafe.managers = managers
+        result = await db.execute(select(User).where(User.id.in_(cafe_data.managers_id)))
+        new_cafe.managers = list(result.scalars())
     
     db.add(new_cafe)
-    db.commit()
-    db.refresh(new_cafe)
+    await db.commit()
+    await invalidate_responses("cafes")
+    if cafe_data.managers_id:
+        await invalidate_recipients(new_cafe.id)
+    new_cafe = await get_cafe_with_managers(db, new_cafe.id)
     
     logger.info(f"User {current_user.username} (id: {current_user.id}) created cafe {new_cafe.name} (id: {new_cafe.id})")
     
@@ -152,6 +194,7 @@ async def create_cafe(
         "description": new_cafe.description,
         "photo_id": new_cafe.photo,  # photo -> photo_id
         "is_active": new_cafe.active,  # active -> is_active
+        "timezone": new_cafe.timezone,
         "managers": managers_list,  # manager_ids -> managers (список объектов)
         "created_at": new_cafe.created_at,
         "updated_at": new_cafe.updated_at
@@ -163,11 +206,11 @@ async def create_cafe(
 async def update_cafe(
     cafe_id: int,
     cafe_data: CafeUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_role("admin", "manager"))
 ):
     """Обновление кафе"""
-    cafe = db.query(Cafe).filter(Cafe.id == cafe_id).first()
+    cafe = await get_cafe_with_managers(db, cafe_id)
     if not cafe:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -176,7 +219,7 @@ async def update_cafe(
     
     # Проверка прав (менеджер может управлять только своими кафе)
     user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
-    if user_role == "manager" and current_user not in cafe.managers:
+    if user_role == "manager" and current_user.id not in [m.id for m in cafe.managers]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
@@ -195,11 +238,14 @@ async def update_cafe(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Только администратор может назначать менеджеров"
             )
-        managers = db.query(User).filter(User.id.in_(cafe_data.manager_ids)).all()
-        cafe.managers = managers
+        result = await db.execute(select(User).where(User.id.in_(cafe_data.manager_ids)))
+        cafe.managers = list(result.scalars())
     
-    db.commit()
-    db.refresh(cafe)
+    await db.commit()
+    await invalidate_responses("cafes")
+    if cafe_data.manager_ids is not None:
+        await invalidate_recipients(cafe_id)
+    cafe = await get_cafe_with_managers(db, cafe_id)
     
     logger.info(f"User {current_user.username} (id: {current_user.id}) updated cafe {cafe.name} (id: {cafe.id})")
     
@@ -216,6 +262,7 @@ async def update_cafe(
         "description": cafe.description,
         "photo_id": cafe.photo,  # photo -> photo_id
         "is_active": cafe.active,  # active -> is_active
+        "timezone": cafe.timezone,
         "managers": managers_list,  # manager_ids -> managers (список объектов)
         "created_at": cafe.created_at,
         "updated_at": cafe.updated_at
@@ -226,11 +273,11 @@ async def update_cafe(
 @router.delete("/{cafe_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_cafe(
     cafe_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_role("admin"))  # Только админ может удалять кафе
 ):
     """Удаление кафе (деактивация)"""
-    cafe = db.query(Cafe).filter(Cafe.id == cafe_id).first()
+    cafe = await get_cafe_with_managers(db, cafe_id)
     if not cafe:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -238,14 +285,15 @@ async def delete_cafe(
         )
     
     user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
-    if user_role == "manager" and current_user not in cafe.managers:
+    if user_role == "manager" and current_user.id not in [m.id for m in cafe.managers]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
         )
     
     cafe.active = False
-    db.commit()
+    await db.commit()
+    await invalidate_responses("cafes")
     
     logger.info(f"User {current_user.username} (id: {current_user.id}) deactivated cafe {cafe.name} (id: {cafe.id})")
     
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Optional
 from app.database import get_db
 from app.models.dish import Dish
 from app.models.cafe import Cafe
@@ -8,20 +8,32 @@ from app.models.user import User
 from app.schemas.dish import DishCreate, DishUpdate, DishResponse
 from app.core.auth import get_current_active_user, require_role
 from app.utils.logger import logger
+from app.utils.query_stats import query_budget
+from app.utils.pagination import paginate_keyset, NEXT_CURSOR_HEADER, MAX_PAGE_LIMIT
+from app.utils.response_cache import ResponseCache, invalidate_responses
 
 router = APIRouter(prefix="/dishes", tags=["Блюда"])
 
 
 @router.get("", response_model=List[DishResponse])
+@query_budget(3)
 async def get_dishes(
+    request: Request,
+    response: Response,
     cafe_id: int = None,
-    skip: int = 0,
-    limit: int = 100,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_LIMIT),
     active_only: bool = True,
+    cursor: Optional[str] = None,  # Курсор keyset-пагинации (пустой - первая страница)
     db: Session = Depends(get_db)
 ):
     """Получение списка блюд"""
-    query = db.query(Dish)
+    cache = ResponseCache(request, "dishes")
+    cached = await cache.lookup()
+    if cached is not None:
+        return cached
+    
+    query = db.query(Dish).options(selectinload(Dish.cafes))
     
     if cafe_id:
         query = query.join(Cafe.dishes).filter(Cafe.id == cafe_id)
@@ -29,7 +41,12 @@ async def get_dishes(
     if active_only:
         query = query.filter(Dish.active == True)
     
-    dishes = query.offset(skip).limit(limit).all()
+    if cursor is not None:
+        dishes, next_cursor = paginate_keyset(query, [Dish.id], cursor, limit)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    else:
+        dishes = query.offset(skip).limit(limit).all()
     
     # Преобразование для response
     result = []
@@ -40,7 +57,7 @@ async def get_dishes(
         }
         result.append(DishResponse(**dish_dict))
     
-    return result
+    return await cache.store(result, response)
 
 
 @router.get("/{dish_id}", response_model=DishResponse)
@@ -81,8 +98,9 @@ async def create_dish(
     if dish_data.cafe_ids:
         cafes = db.query(Cafe).filter(Cafe.id.in_(dish_data.cafe_ids)).all()
         # Менеджер может привязывать только к своим кафе
-        if current_user.role.value == "manager":
-            user_cafe_ids = [c.id for c in current_user.managed_cafes]
+        user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
+        if user_role == "manager":
+            user_cafe_ids = [row.id for row in db.query(Cafe.id).filter(Cafe.managers.any(User.id == current_user.id))]
             for cafe in cafes:
                 if cafe.id not in user_cafe_ids:
                     raise HTTPException(
@@ -93,6 +111,7 @@ async def create_dish(
     
     db.add(new_dish)
     db.commit()
+    await invalidate_responses("dishes")
     db.refresh(new_dish)
     
     logger.info(f"User {current_user.username} (id: {current_user.id}) created dish {new_dish.name} (id: {new_dish.id})")
@@ -120,8 +139,9 @@ async def update_dish(
         )
     
     # Менеджер может обновлять только блюда своих кафе
-    if current_user.role.value == "manager":
-        user_cafe_ids = [c.id for c in current_user.managed_cafes]
+    user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
+    if user_role == "manager":
+        user_cafe_ids = [row.id for row in db.query(Cafe.id).filter(Cafe.managers.any(User.id == current_user.id))]
         dish_cafe_ids = [c.id for c in dish.cafes]
         if not any(cid in user_cafe_ids for cid in dish_cafe_ids):
             raise HTTPException(
@@ -138,8 +158,9 @@ async def update_dish(
     if dish_data.cafe_ids is not None:
         cafes = db.query(Cafe).filter(Cafe.id.in_(dish_data.cafe_ids)).all()
         # Менеджер может привязывать только к своим кафе
-        if current_user.role.value == "manager":
-            user_cafe_ids = [c.id for c in current_user.managed_cafes]
+        user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
+        if user_role == "manager":
+            user_cafe_ids = [row.id for row in db.query(Cafe.id).filter(Cafe.managers.any(User.id == current_user.id))]
             for cafe in cafes:
                 if cafe.id not in user_cafe_ids:
                     raise HTTPException(
@@ -149,6 +170,7 @@ async def update_dish(
         dish.cafes = cafes
     
     db.commit()
+    await invalidate_responses("dishes")
     db.refresh(dish)
     
     logger.info(f"User {current_user.username} (id: {current_user.id}) updated dish {dish.name} (id: {dish.id})")
@@ -175,8 +197,9 @@ async def delete_dish(
         )
     
     # Менеджер может удалять только блюда своих кафе
-    if current_user.role.value == "manager":
-        user_cafe_ids = [c.id for c in current_user.managed_cafes]
+    user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
+    if user_role == "manager":
+        user_cafe_ids = [row.id for row in db.query(Cafe.id).filter(Cafe.managers.any(User.id == current_user.id))]
         dish_cafe_ids = [c.id for c in dish.cafes]
         if not any(cid in user_cafe_ids for cid in dish_cafe_ids):
             raise HTTPException(
@@ -186,6 +209,7 @@ async def delete_dish(
     
     dish.active = False
     db.commit()
+    await invalidate_responses("dishes")
     
     logger.info(f"User {current_user.username} (id: {current_user.id}) deactivated dish {dish.name} (id: {dish.id})")
     
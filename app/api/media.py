@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, Request, status
 from pathlib import Path
-from app.database import get_db
+from typing import Literal, Optional
+import time
+from app.config import settings
 from app.models.user import User
 from app.core.auth import require_role
-from app.utils.media import save_image, get_image_path
+from app.utils.media import save_image, get_image_path, image_response, not_modified_response, resolve_image_id
+from app.utils.image_pool import upload_stats
+from app.utils.resize_cache import open_resized_image, resized_path, snap_dimension
 from app.utils.logger import logger
 
 router = APIRouter(prefix="/media", tags=["Медиа"])
@@ -17,10 +19,18 @@ async def upload_image(
     current_user: User = Depends(require_role("admin", "manager"))
 ):
     """Загрузка изображения (только для админов и менеджеров)"""
+    start = time.perf_counter()
     try:
         image_id = await save_image(file)
-        logger.info(f"User {current_user.username} (id: {current_user.id}) uploaded image {image_id}")
+        elapsed = time.perf_counter() - start
+        upload_stats.observe(elapsed)
+        logger.info(
+            f"User {current_user.username} (id: {current_user.id}) uploaded image {image_id} "
+            f"in {elapsed * 1000:.0f} ms"
+        )
         return {"image_id": image_id}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error uploading image: {str(e)}")
         raise HTTPException(
@@ -32,10 +42,29 @@ async def upload_image(
 @router.get("/{image_id}")
 async def get_image(
     image_id: str,
-    db: Session = Depends(get_db)
+    request: Request,
+    size: Optional[int] = Query(None, gt=0, description="Требуемая ширина, px"),
+    w: Optional[int] = Query(None, gt=0, le=settings.IMAGE_RESIZE_MAX_DIM, description="Ширина, px (округляется вверх до шага IMAGE_RESIZE_STEPS)"),
+    h: Optional[int] = Query(None, gt=0, le=settings.IMAGE_RESIZE_MAX_DIM, description="Высота, px (округляется вверх до шага IMAGE_RESIZE_STEPS)"),
+    fit: Literal["contain", "cover"] = "contain"
 ):
-    """Получение изображения по ID"""
-    image_path = get_image_path(image_id)
+    """Получение изображения по ID.
+    
+    size выбирает ближайший вариант не уже запрошенной ширины, формат
+    (WebP или JPEG) выбирается по заголовку Accept. Изображения, загруженные
+    до хранения по хэшу, доступны и по старому UUID.
+    w/h/fit запрашивают произвольный размер из фиксированного набора шагов:
+    он строится по запросу в отдельном от загрузок пуле и хранится
+    в дисковом LRU-кэше.
+    Ответ кэшируется клиентом навсегда, поддерживаются ETag/304 и Range.
+    """
+    image_key = await resolve_image_id(image_id)
+    accepts_webp = settings.IMAGE_WEBP_ENABLED and "image/webp" in request.headers.get("accept", "")
+    image_path = None
+    if image_key and accepts_webp and not (w or h):
+        image_path = get_image_path(image_key, size, "webp")
+    if image_key and not image_path:
+        image_path = get_image_path(image_key, size)
     
     if not image_path:
         raise HTTPException(
@@ -43,9 +72,15 @@ async def get_image(
             detail="Image not found"
         )
     
-    return FileResponse(
-        path=image_path,
-        media_type="image/jpeg",
-        filename=f"{image_id}.jpg"
-    )
+    content = None
+    if w or h:
+        ext = "webp" if accepts_webp else "jpg"
+        # ETag варианта задан хэшем и параметрами: 304 без чтения и построения варианта
+        variant_path = resized_path(image_key, snap_dimension(w), snap_dimension(h), fit, ext)
+        not_modified = not_modified_response(request, variant_path, image_id)
+        if not_modified is not None:
+            return not_modified
+        image_path, content = await open_resized_image(image_key, w, h, fit, ext)
+    
+    return await image_response(request, image_path, image_id, content)
 
@@ -1,52 +1,69 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List
-from datetime import time, timedelta
-from app.database import get_db
+from datetime import date, datetime, time, timedelta
+from app.database import get_async_db
 from app.models.slot import Slot
 from app.models.cafe import Cafe
 from app.models.user import User
 from app.schemas.slot import SlotCreate, SlotUpdate, SlotResponse
 from app.core.auth import get_current_active_user, require_role
 from app.utils.logger import logger
+from app.utils.query_stats import query_budget
+from app.utils.response_cache import ResponseCache, invalidate_responses
 
 router = APIRouter(prefix="/cafe/{cafe_id}/slots", tags=["Временные слоты"])
 
 
 @router.get("", response_model=List[SlotResponse])
+@query_budget(4)
 async def get_slots(
+    request: Request,
     cafe_id: int,
     show_all: bool = False,
     active_only: bool = False,
     booking_date: str = None,  # Дата для фильтрации забронированных слотов
     table_id: int = None,  # ID стола для фильтрации
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Список временных слотов в кафе"""
     from datetime import date
     from app.models.booking import Booking, BookingStatus
     
+    # Кэшируется список без фильтра по бронированиям (он меняется при каждой брони)
+    user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
+    cache = None
+    if not (user_role == "user" and booking_date and table_id):
+        scope = "staff" if user_role in ["admin", "manager"] else "user"
+        cache = ResponseCache(request, f"slots:{cafe_id}", scope)
+        cached = await cache.lookup()
+        if cached is not None:
+            return cached
+    
     # Проверка существования кафе
-    cafe = db.query(Cafe).filter(Cafe.id == cafe_id).first()
+    cafe = await db.get(Cafe, cafe_id)
     if not cafe:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Кафе не найдено"
         )
     
-    query = db.query(Slot).filter(Slot.cafe_id == cafe_id)
+    query = select(Slot).where(Slot.cafe_id == cafe_id)
     
     # Фильтрация по active_only (приоритет над show_all)
     if active_only:
-        query = query.filter(Slot.active == True)
+        query = query.where(Slot.active == True)
     elif not show_all:
         # Для пользователей показываем только активные, для админов и менеджеров - все если show_all=True
         user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
         if user_role not in ["admin", "manager"]:
-            query = query.filter(Slot.active == True)
+            query = query.where(Slot.active == True)
     
-    slots = query.all()
+    result = await db.execute(query)
+    slots = result.scalars().all()
     
     # Для пользователей фильтруем забронированные слоты на указанную дату и стол
     user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
@@ -54,29 +71,33 @@ async def get_slots(
         try:
             booking_date_obj = date.fromisoformat(booking_date)
             # Получаем ID забронированных слотов
-            booked_slot_ids = db.query(Booking.slot_id).filter(
-                Booking.cafe_id == cafe_id,
-                Booking.table_id == table_id,
-                Booking.date == booking_date_obj,
-                Booking.status != BookingStatus.CANCELLED,
-                Booking.active == True
-            ).distinct().all()
-            booked_ids = [row[0] for row in booked_slot_ids]
+            result = await db.execute(
+                select(Booking.slot_id).where(
+                    Booking.cafe_id == cafe_id,
+                    Booking.table_id == table_id,
+                    Booking.date == booking_date_obj,
+                    Booking.status != BookingStatus.CANCELLED,
+                    Booking.active == True
+                ).distinct()
+            )
+            booked_ids = set(result.scalars())
             # Фильтруем слоты, исключая забронированные
             slots = [s for s in slots if s.id not in booked_ids]
         except ValueError:
             pass  # Неверный формат даты, возвращаем все слоты
     
+    if cache is not None:
+        return await cache.store([SlotResponse.model_validate(s) for s in slots])
     return slots
 
 
 @router.get("/{slot_id}", response_model=SlotResponse)
 async def get_slot(
     slot_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Получение слота по ID"""
-    slot = db.query(Slot).filter(Slot.id == slot_id).first()
+    slot = await db.get(Slot, slot_id)
     if not slot:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -89,12 +110,12 @@ async def get_slot(
 async def create_slot(
     cafe_id: int,
     slot_data: SlotCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_role("admin", "manager"))
 ):
     """Новый временной слот в кафе"""
     # Проверка существования кафе
-    cafe = db.query(Cafe).filter(Cafe.id == cafe_id).first()
+    cafe = await db.get(Cafe, cafe_id, options=[selectinload(Cafe.managers)])
     if not cafe:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -103,7 +124,7 @@ async def create_slot(
     
     # Проверка прав менеджера
     user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
-    if user_role == "manager" and current_user not in cafe.managers:
+    if user_role == "manager" and current_user.id not in [m.id for m in cafe.managers]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Недостаточно прав"
@@ -123,8 +144,9 @@ async def create_slot(
     )
     
     db.add(new_slot)
-    db.commit()
-    db.refresh(new_slot)
+    await db.commit()
+    await invalidate_responses(f"slots:{cafe.id}")
+    await db.refresh(new_slot)
     
     logger.info(f"User {current_user.username} (id: {current_user.id}) created slot {new_slot.id} for cafe {cafe.name}")
     
@@ -134,11 +156,11 @@ async def create_slot(
 @router.post("/generate", response_model=List[SlotResponse], status_code=status.HTTP_201_CREATED)
 async def generate_slots(
     cafe_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_role("admin", "manager"))
 ):
     """Автоматическое создание слотов на основе рабочего времени кафе"""
-    cafe = db.query(Cafe).filter(Cafe.id == cafe_id).first()
+    cafe = await db.get(Cafe, cafe_id, options=[selectinload(Cafe.managers)])
     if not cafe:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -147,7 +169,7 @@ async def generate_slots(
     
     # Проверка прав менеджера
     user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
-    if user_role == "manager" and current_user not in cafe.managers:
+    if user_role == "manager" and current_user.id not in [m.id for m in cafe.managers]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Недостаточно прав"
@@ -177,11 +199,14 @@ async def generate_slots(
             slot_end_time = end_time
         
         # Проверяем, не существует ли уже такой слот
-        existing = db.query(Slot).filter(
-            Slot.cafe_id == cafe_id,
-            Slot.start_time == current_time,
-            Slot.end_time == slot_end_time
-        ).first()
+        result = await db.execute(
+            select(Slot.id).where(
+                Slot.cafe_id == cafe_id,
+                Slot.start_time == current_time,
+                Slot.end_time == slot_end_time
+            ).limit(1)
+        )
+        existing = result.first()
         
         if not existing:
             new_slot = Slot(
@@ -196,11 +221,12 @@ async def generate_slots(
         current_datetime = end_datetime
         current_time = current_datetime.time()
     
-    db.commit()
+    await db.commit()
+    await invalidate_responses(f"slots:{cafe.id}")
     
     # Обновляем объекты для возврата
     for slot in slots:
-        db.refresh(slot)
+        await db.refresh(slot)
     
     logger.info(f"User {current_user.username} (id: {current_user.id}) generated {len(slots)} slots for cafe {cafe.name}")
     
@@ -212,22 +238,22 @@ async def update_slot(
     slot_id: int,
     slot_data: SlotUpdate,
     cafe_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_role("admin", "manager"))
 ):
     """Обновление слота"""
-    slot = db.query(Slot).filter(Slot.id == slot_id).first()
+    slot = await db.get(Slot, slot_id)
     if not slot:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Слот не найден"
         )
     
-    cafe = db.query(Cafe).filter(Cafe.id == slot.cafe_id).first()
+    cafe = await db.get(Cafe, slot.cafe_id, options=[selectinload(Cafe.managers)])
     
     # Проверка прав менеджера
     user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
-    if user_role == "manager" and current_user not in cafe.managers:
+    if user_role == "manager" and current_user.id not in [m.id for m in cafe.managers]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Недостаточно прав"
@@ -235,13 +261,13 @@ async def update_slot(
     
     # Проверка cafe_id если он обновляется
     if slot_data.cafe_id is not None:
-        new_cafe = db.query(Cafe).filter(Cafe.id == slot_data.cafe_id).first()
+        new_cafe = await db.get(Cafe, slot_data.cafe_id, options=[selectinload(Cafe.managers)])
         if not new_cafe:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Кафе не найдено"
             )
-        if user_role == "manager" and current_user not in new_cafe.managers:
+        if user_role == "manager" and current_user.id not in [m.id for m in new_cafe.managers]:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Недостаточно прав"
@@ -260,8 +286,9 @@ async def update_slot(
     for field, value in update_data.items():
         setattr(slot, field, value)
     
-    db.commit()
-    db.refresh(slot)
+    await db.commit()
+    await invalidate_responses(*{f"slots:{cafe.id}", f"slots:{slot.cafe_id}"})
+    await db.refresh(slot)
     
     logger.info(f"User {current_user.username} (id: {current_user.id}) updated slot {slot.id}")
     
@@ -272,22 +299,22 @@ async def update_slot(
 async def delete_slot(
     slot_id: int,
     cafe_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_role("admin", "manager"))
 ):
     """Удаление слота (деактивация)"""
-    slot = db.query(Slot).filter(Slot.id == slot_id).first()
+    slot = await db.get(Slot, slot_id)
     if not slot:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Слот не найден"
         )
     
-    cafe = db.query(Cafe).filter(Cafe.id == slot.cafe_id).first()
+    cafe = await db.get(Cafe, slot.cafe_id, options=[selectinload(Cafe.managers)])
     
     # Проверка прав менеджера
     user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
-    if user_role == "manager" and current_user not in cafe.managers:
+    if user_role == "manager" and current_user.id not in [m.id for m in cafe.managers]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Недостаточно прав"
@@ -295,6 +322,7 @@ async def delete_slot(
     
     # Деактивируем слот вместо удаления
     slot.active = False
-    db.commit()
+    await db.commit()
+    await invalidate_responses(f"slots:{cafe.id}")
     
     logger.info(f"User {current_user.username} (id: {current_user.id}) deleted (deactivated) slot {slot.id}")
@@ -1,51 +1,68 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List
-from app.database import get_db
+from app.database import get_async_db
 from app.models.table import Table
 from app.models.cafe import Cafe
 from app.models.user import User
 from app.schemas.table import TableCreate, TableUpdate, TableResponse, TableBulkCreate
 from app.core.auth import get_current_active_user, require_role
 from app.utils.logger import logger
+from app.utils.query_stats import query_budget
+from app.utils.response_cache import ResponseCache, invalidate_responses
 
 router = APIRouter(prefix="/cafe/{cafe_id}/tables", tags=["Столы"])
 
 
 @router.get("", response_model=List[TableResponse])
+@query_budget(4)
 async def get_tables(
+    request: Request,
     cafe_id: int,
     show_all: bool = False,
     active_only: bool = False,
     booking_date: str = None,  # Дата для фильтрации забронированных столов
     slot_id: int = None,  # ID слота для фильтрации
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Список столов в кафе"""
     from datetime import date
     from app.models.booking import Booking, BookingStatus
     
+    # Кэшируется список без фильтра по бронированиям (он меняется при каждой брони)
+    user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
+    cache = None
+    if not (user_role == "user" and booking_date and slot_id):
+        scope = "staff" if user_role in ["admin", "manager"] else "user"
+        cache = ResponseCache(request, f"tables:{cafe_id}", scope)
+        cached = await cache.lookup()
+        if cached is not None:
+            return cached
+    
     # Проверка существования кафе
-    cafe = db.query(Cafe).filter(Cafe.id == cafe_id).first()
+    cafe = await db.get(Cafe, cafe_id)
     if not cafe:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Кафе не найдено"
         )
     
-    query = db.query(Table).filter(Table.cafe_id == cafe_id)
+    query = select(Table).where(Table.cafe_id == cafe_id)
     
     # Фильтрация по active_only (приоритет над show_all)
     if active_only:
-        query = query.filter(Table.active == True)
+        query = query.where(Table.active == True)
     elif not show_all:
         # Для пользователей показываем только активные, для админов и менеджеров - все если show_all=True
         user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
         if user_role not in ["admin", "manager"]:
-            query = query.filter(Table.active == True)
+            query = query.where(Table.active == True)
     
-    tables = query.all()
+    result = await db.execute(query)
+    tables = result.scalars().all()
     
     # Для пользователей фильтруем забронированные столы на указанную дату и слот
     user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
@@ -53,29 +70,33 @@ async def get_tables(
         try:
             booking_date_obj = date.fromisoformat(booking_date)
             # Получаем ID забронированных столов
-            booked_table_ids = db.query(Booking.table_id).filter(
-                Booking.cafe_id == cafe_id,
-                Booking.slot_id == slot_id,
-                Booking.date == booking_date_obj,
-                Booking.status != BookingStatus.CANCELLED,
-                Booking.active == True
-            ).distinct().all()
-            booked_ids = [row[0] for row in booked_table_ids]
+            result = await db.execute(
+                select(Booking.table_id).where(
+                    Booking.cafe_id == cafe_id,
+                    Booking.slot_id == slot_id,
+                    Booking.date == booking_date_obj,
+                    Booking.status != BookingStatus.CANCELLED,
+                    Booking.active == True
+                ).distinct()
+            )
+            booked_ids = set(result.scalars())
             # Фильтруем столы, исключая забронированные
             tables = [t for t in tables if t.id not in booked_ids]
         except ValueError:
             pass  # Неверный формат даты, возвращаем все столы
     
+    if cache is not None:
+        return await cache.store([TableResponse.model_validate(t) for t in tables])
     return tables
 
 
 @router.get("/{table_id}", response_model=TableResponse)
 async def get_table(
     table_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Получение стола по ID"""
-    table = db.query(Table).filter(Table.id == table_id).first()
+    table = await db.get(Table, table_id)
     if not table:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -88,12 +109,12 @@ async def get_table(
 async def create_table(
     cafe_id: int,
     table_data: TableCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_role("admin", "manager"))
 ):
     """Новый стол в кафе"""
     # Проверка существования кафе
-    cafe = db.query(Cafe).filter(Cafe.id == cafe_id).first()
+    cafe = await db.get(Cafe, cafe_id, options=[selectinload(Cafe.managers)])
     if not cafe:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -102,7 +123,7 @@ async def create_table(
     
     # Проверка прав менеджера
     user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
-    if user_role == "manager" and current_user not in cafe.managers:
+    if user_role == "manager" and current_user.id not in [m.id for m in cafe.managers]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Недостаточно прав"
@@ -115,8 +136,9 @@ async def create_table(
     )
     
     db.add(new_table)
-    db.commit()
-    db.refresh(new_table)
+    await db.commit()
+    await invalidate_responses(f"tables:{cafe.id}")
+    await db.refresh(new_table)
     
     logger.info(f"User {current_user.username} (id: {current_user.id}) created table {new_table.id} for cafe {cafe.name}")
     
@@ -127,22 +149,22 @@ async def create_table(
 async def update_table(
     table_id: int,
     table_data: TableUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_role("admin", "manager"))
 ):
     """Обновление стола"""
-    table = db.query(Table).filter(Table.id == table_id).first()
+    table = await db.get(Table, table_id)
     if not table:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Стол не найден"
         )
     
-    cafe = db.query(Cafe).filter(Cafe.id == table.cafe_id).first()
+    cafe = await db.get(Cafe, table.cafe_id, options=[selectinload(Cafe.managers)])
     
     # Проверка прав менеджера
     user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
-    if user_role == "manager" and current_user not in cafe.managers:
+    if user_role == "manager" and current_user.id not in [m.id for m in cafe.managers]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Недостаточно прав"
@@ -150,14 +172,14 @@ async def update_table(
     
     # Проверка cafe_id если он обновляется
     if table_data.cafe_id is not None:
-        new_cafe = db.query(Cafe).filter(Cafe.id == table_data.cafe_id).first()
+        new_cafe = await db.get(Cafe, table_data.cafe_id, options=[selectinload(Cafe.managers)])
         if not new_cafe:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Cafe not found"
             )
         user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
-        if user_role == "manager" and current_user not in new_cafe.managers:
+        if user_role == "manager" and current_user.id not in [m.id for m in new_cafe.managers]:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Недостаточно прав"
@@ -168,8 +190,9 @@ async def update_table(
     for field, value in update_data.items():
         setattr(table, field, value)
     
-    db.commit()
-    db.refresh(table)
+    await db.commit()
+    await invalidate_responses(*{f"tables:{cafe.id}", f"tables:{table.cafe_id}"})
+    await db.refresh(table)
     
     logger.info(f"User {current_user.username} (id: {current_user.id}) updated table {table.id}")
     
@@ -179,27 +202,29 @@ async def update_table(
 @router.delete("/{table_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_table(
     table_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_role("admin", "manager"))
 ):
     """Удаление стола (деактивация)"""
-    table = db.query(Table).filter(Table.id == table_id).first()
+    table = await db.get(Table, table_id)
     if not table:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Стол не найден"
         )
     
-    cafe = db.query(Cafe).filter(Cafe.id == table.cafe_id).first()
+    cafe = await db.get(Cafe, table.cafe_id, options=[selectinload(Cafe.managers)])
     
-    if current_user.role.value == "manager" and current_user not in cafe.managers:
+    user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
+    if user_role == "manager" and current_user.id not in [m.id for m in cafe.managers]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Недостаточно прав"
         )
     
     table.active = False
-    db.commit()
+    await db.commit()
+    await invalidate_responses(f"tables:{cafe.id}")
     
     logger.info(f"User {current_user.username} (id: {current_user.id}) deactivated table {table.id}")
     
@@ -211,12 +236,12 @@ async def delete_table(
 async def create_tables_bulk(
     cafe_id: int,
     bulk_data: TableBulkCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_role("admin", "manager"))
 ):
     """Массовое создание столов (например, 20 столов по 2 места)"""
     # Проверка существования кафе
-    cafe = db.query(Cafe).filter(Cafe.id == cafe_id).first()
+    cafe = await db.get(Cafe, cafe_id, options=[selectinload(Cafe.managers)])
     if not cafe:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -225,7 +250,7 @@ async def create_tables_bulk(
     
     # Проверка прав менеджера
     user_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
-    if user_role == "manager" and current_user not in cafe.managers:
+    if user_role == "manager" and current_user.id not in [m.id for m in cafe.managers]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Недостаточно прав"
@@ -242,11 +267,12 @@ async def create_tables_bulk(
         db.add(new_table)
         tables.append(new_table)
     
-    db.commit()
+    await db.commit()
+    await invalidate_responses(f"tables:{cafe.id}")
     
     # Обновляем объекты для возврата
     for table in tables:
-        db.refresh(table)
+        await db.refresh(table)
     
     logger.info(f"User {current_user.username} (id: {current_user.id}) created {bulk_data.count} tables for cafe {cafe.name}")
     
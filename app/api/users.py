@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Security
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status, Security
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.orm import Session
 from typing import List, Optional
@@ -6,8 +6,11 @@ from app.database import get_db
 from app.models.user import User, UserRole
 from app.schemas.user import UserCreate, UserUpdate, UserResponse
 from app.core.auth import get_current_active_user, require_role, get_current_user
+from app.core.user_cache import invalidate_user
+from app.services.recipients import invalidate_recipients
 from app.core.security import get_password_hash, decode_access_token
 from app.utils.logger import logger
+from app.utils.pagination import paginate_keyset, NEXT_CURSOR_HEADER, MAX_PAGE_LIMIT
 
 security = HTTPBearer(auto_error=False)
 
@@ -34,10 +37,12 @@ router = APIRouter(prefix="/users", tags=["Пользователи"])
 
 @router.get("", response_model=List[UserResponse])
 async def get_users(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_LIMIT),
     active_only: bool = False,
     role: str = None,  # Фильтр по роли (admin, manager, user)
+    cursor: Optional[str] = None,  # Курсор keyset-пагинации (пустой - первая страница)
     db: Session = Depends(get_db),
     current_user: User = Depends(require_role("admin", "manager"))
 ):
@@ -52,17 +57,30 @@ async def get_users(
     if role and user_role == "admin":
         query = query.filter(User.role == role)
     
-    users = query.offset(skip).limit(limit).all()
+    if cursor is not None:
+        users, next_cursor = paginate_keyset(query, [User.id], cursor, limit)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    else:
+        users = query.offset(skip).limit(limit).all()
     logger.info(f"User {current_user.username} (id: {current_user.id}) retrieved users list")
     return users
 
 
 @router.get("/me", response_model=UserResponse)
 async def get_me(
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Получение информации о текущем пользователе"""
-    return current_user
+    # current_user содержит только закэшированные поля, полный профиль читаем из БД
+    user = db.query(User).filter(User.id == current_user.id).first()
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    return user
 
 
 @router.patch("/me", response_model=UserResponse)
@@ -72,6 +90,13 @@ async def update_me(
     current_user: User = Depends(get_current_active_user)
 ):
     """Обновление информации о текущем пользователе"""
+    # current_user не связан с сессией, изменяем запись в сессии этого запроса
+    user = db.query(User).filter(User.id == current_user.id).first()
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
     update_data = user_data.model_dump(exclude_unset=True)
     
     # Пользователь не может менять роль и активность через /me
@@ -108,14 +133,18 @@ async def update_me(
         update_data["password_hash"] = get_password_hash(update_data.pop("password"))
     
     for field, value in update_data.items():
-        setattr(current_user, field, value)
+        setattr(user, field, value)
     
+    # Роль и активность через /me не меняются, поэтому ошибка Redis не отменяет изменение
+    await invalidate_user(user.id, fail_closed=False)
     db.commit()
-    db.refresh(current_user)
+    db.refresh(user)
+    # Пользователь может быть получателем уведомлений (менеджер или администратор)
+    await invalidate_recipients()
     
-    logger.info(f"User {current_user.username} (id: {current_user.id}) updated their profile")
+    logger.info(f"User {user.username} (id: {user.id}) updated their profile")
     
-    return current_user
+    return user
 
 
 @router.get("/{user_id}", response_model=UserResponse)
@@ -150,7 +179,10 @@ async def create_user(
 ):
     """Регистрация нового пользователя (доступно всем, включая неавторизированных)"""
     # Если пользователь авторизирован и админ - может задать роль, иначе только user
-    if current_user and current_user.role.value == "admin":
+    current_role = None
+    if current_user:
+        current_role = current_user.role if isinstance(current_user.role, str) else current_user.role.value
+    if current_role == "admin":
         user_role = user_data.role if user_data.role else UserRole.USER
     else:
         user_role = UserRole.USER  # Неавторизированные и обычные пользователи создают только user
@@ -186,6 +218,8 @@ async def create_user(
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    if new_user.role == UserRole.ADMIN.value:
+        await invalidate_recipients()
     
     if current_user:
         logger.info(f"User {current_user.username} (id: {current_user.id}) created user {new_user.username} (id: {new_user.id})")
@@ -249,8 +283,12 @@ async def update_user(
     for field, value in update_data.items():
         setattr(user, field, value)
     
+    # Кэш сбрасывается до commit: без подтверждения Redis изменение не сохраняется
+    await invalidate_user(user.id)
     db.commit()
     db.refresh(user)
+    # Пользователь может быть получателем уведомлений (менеджер или администратор)
+    await invalidate_recipients()
     
     logger.info(f"User {current_user.username} (id: {current_user.id}) updated user {user.username} (id: {user.id})")
     
@@ -272,7 +310,11 @@ async def delete_user(
         )
     
     user.active = False
+    # Кэш сбрасывается до commit: без подтверждения Redis блокировка не сохраняется
+    await invalidate_user(user.id)
     db.commit()
+    # Пользователь может быть получателем уведомлений (менеджер или администратор)
+    await invalidate_recipients()
     
     logger.info(f"User {current_user.username} (id: {current_user.id}) blocked user {user.username} (id: {user.id})")
     
@@ -1,12 +1,13 @@
 from celery import Celery
 from app.config import settings
 from app.celery_beat_schedule import beat_schedule
+from app.utils import celery_metrics, celery_tracing  # noqa: F401  метрики и трассировка задач воркера
 
 celery_app = Celery(
     "booking_app",
     broker=settings.CELERY_BROKER_URL,
     backend=settings.CELERY_RESULT_BACKEND,
-    include=["app.tasks.notifications", "app.tasks.reminders"]
+    include=["app.tasks.notifications", "app.tasks.reminders", "app.tasks.outbox", "app.tasks.cache"]
 )
 
 celery_app.conf.update(
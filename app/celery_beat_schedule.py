@@ -2,12 +2,24 @@
 Расписание периодических задач Celery Beat
 """
 from celery.schedules import crontab
+from app.config import settings
 
-# Расписание для отправки напоминаний (каждый день в 9:00)
 beat_schedule = {
+    # Напоминания отправляются скользящими окнами относительно начала слотов
     'send-booking-reminders': {
         'task': 'send_booking_reminders',
-        'schedule': crontab(hour=9, minute=0),  # Каждый день в 9:00
+        'schedule': settings.REMINDER_WINDOW_MINUTES * 60,
+        'options': {'expires': settings.REMINDER_WINDOW_MINUTES * 60},
+    },
+    # Публикация уведомлений из outbox (запуск не копится, если воркеры заняты)
+    'relay-outbox': {
+        'task': 'relay_outbox',
+        'schedule': settings.OUTBOX_RELAY_INTERVAL,
+        'options': {'expires': settings.OUTBOX_RELAY_INTERVAL},
+    },
+    'cleanup-outbox': {
+        'task': 'cleanup_outbox',
+        'schedule': crontab(hour=3, minute=30),  # Каждый день в 3:30
     },
 }
 
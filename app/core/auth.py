@@ -1,18 +1,24 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.models.user import User
 from app.core.security import decode_access_token
+from app.core.user_cache import get_cached_user, cache_user, user_from_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> User:
-    """Получение текущего пользователя из токена"""
+    """Получение текущего пользователя из токена.
+
+    Возвращается объект User, не связанный с сессией, с полями
+    id, username, email, role и active.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -34,9 +40,15 @@ async def get_current_user(
     except (ValueError, TypeError):
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
-        raise credentials_exception
+    # Пользователь берется из кэша; при промахе - из БД с сохранением в кэш
+    cached = await get_cached_user(user_id)
+    if cached is None:
+        result = await db.execute(select(User).where(User.id == user_id))
+        db_user = result.scalar_one_or_none()
+        if db_user is None:
+            raise credentials_exception
+        cached = await cache_user(db_user)
+    user = user_from_cache(cached)
     
     if not user.active:
         raise HTTPException(
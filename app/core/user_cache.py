@@ -0,0 +1,135 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Optional
+from fastapi import HTTPException, status
+from redis.exceptions import RedisError, WatchError
+from app.config import settings
+from app.models.user import User
+from app.utils.metrics import record_cache_lookup
+from app.utils.redis_client import get_redis, redis_unavailable
+
+# Поля пользователя, достаточные обработчикам (права, логи); полный профиль читается из БД
+CACHED_USER_FIELDS = ("id", "username", "email", "role", "active")
+REDIS_KEY_PREFIX = "auth:user:"
+
+# Блокировка кэширования пользователя на время записи его изменения в БД
+LOCK_KEY_PREFIX = "auth:user-lock:"
+
+_local_cache: "OrderedDict[int, tuple]" = OrderedDict()
+
+
+def _local_get(user_id: int) -> Optional[dict]:
+    entry = _local_cache.get(user_id)
+    if entry is None:
+        return None
+    expires_at, data = entry
+    if expires_at < time.monotonic():
+        _local_cache.pop(user_id, None)
+        return None
+    _local_cache.move_to_end(user_id)
+    return data
+
+
+def _local_set(user_id: int, data: dict):
+    _local_cache[user_id] = (time.monotonic() + settings.USER_CACHE_LOCAL_TTL, data)
+    _local_cache.move_to_end(user_id)
+    while len(_local_cache) > settings.USER_CACHE_LOCAL_SIZE:
+        _local_cache.popitem(last=False)
+
+
+def user_from_cache(data: dict) -> User:
+    """Несвязанный с сессией объект User из закэшированных полей"""
+    return User(**data)
+
+
+async def get_cached_user(user_id: int) -> Optional[dict]:
+    """Поиск пользователя в локальном LRU, затем в Redis"""
+    data = _local_get(user_id)
+    record_cache_lookup("user_local", data is not None)
+    if data is not None:
+        return data
+
+    redis = get_redis()
+    if redis is None:
+        return None
+    try:
+        raw = await redis.get(f"{REDIS_KEY_PREFIX}{user_id}")
+    except RedisError as e:
+        redis_unavailable(e, "User cache")
+        return None
+    record_cache_lookup("user", raw is not None)
+    if raw is None:
+        return None
+
+    data = json.loads(raw)
+    _local_set(user_id, data)
+    return data
+
+
+async def cache_user(user: User) -> dict:
+    """Сохранение полей пользователя в локальный LRU и Redis.
+
+    Пока действует блокировка invalidate_user, пользователь не кэшируется:
+    запрос мог прочитать из БД запись до commit изменения. SET выполняется
+    под WATCH ключа блокировки, поэтому блокировка, поставленная между
+    проверкой и записью, отменяет запись.
+    """
+    role = user.role if isinstance(user.role, str) else user.role.value
+    data = {field: getattr(user, field) for field in CACHED_USER_FIELDS}
+    data["role"] = role
+
+    redis = get_redis()
+    if redis is None:
+        _local_set(user.id, data)
+        return data
+    try:
+        async with redis.pipeline(transaction=True) as pipe:
+            await pipe.watch(f"{LOCK_KEY_PREFIX}{user.id}")
+            if await pipe.exists(f"{LOCK_KEY_PREFIX}{user.id}"):
+                return data
+            pipe.multi()
+            pipe.set(f"{REDIS_KEY_PREFIX}{user.id}", json.dumps(data), ex=settings.USER_CACHE_TTL)
+            await pipe.execute()
+    except WatchError:
+        return data
+    except RedisError as e:
+        redis_unavailable(e, "User cache")
+    _local_set(user.id, data)
+    return data
+
+
+async def invalidate_user(user_id: int, fail_closed: bool = True):
+    """Сброс закэшированного пользователя перед commit изменения или блокировки.
+
+    Вызывается до commit: если Redis не подтвердил удаление записи, изменение
+    не сохраняется (503), иначе другие воркеры продолжали бы авторизовать
+    заблокированного пользователя по записи в Redis до USER_CACHE_TTL.
+    fail_closed=False - для изменений, не влияющих на права (профиль через /me):
+    ошибка Redis только пишется в лог.
+    Вместе с удалением ставится блокировка на USER_CACHE_LOCK_SECONDS, чтобы
+    запрос, прочитавший запись до commit, не вернул ее в кэш.
+    Локальные LRU других воркеров истекают сами через USER_CACHE_LOCAL_TTL.
+    """
+    _local_cache.pop(user_id, None)
+    if not settings.REDIS_URL:
+        return
+
+    # Во время паузы после ошибки Redis (get_redis() is None) изменения тоже отклоняются
+    redis = get_redis()
+    if redis is not None:
+        try:
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.set(f"{LOCK_KEY_PREFIX}{user_id}", 1, ex=settings.USER_CACHE_LOCK_SECONDS)
+                pipe.delete(f"{REDIS_KEY_PREFIX}{user_id}")
+                await pipe.execute()
+            return
+        except RedisError as e:
+            redis_unavailable(e, "User cache")
+    if not fail_closed:
+        return
+    raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="User cache is unavailable, try again later",
+        headers={"Retry-After": "5"}
+    )
@@ -1,11 +1,37 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from uuid import uuid4
 from app.config import settings
+from app.utils.db_pool import engine_pool_options, pool_status
+from app.utils.query_stats import install_query_stats
 
-engine = create_engine(settings.DATABASE_URL)
+# Синхронный движок (Celery задачи, скрипты, alembic)
+engine = create_engine(settings.DATABASE_URL, **engine_pool_options())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Асинхронный движок (обработчики API, не блокирующие event loop)
+async_connect_args = {}
+if settings.DB_PGBOUNCER:
+    # PgBouncer в режиме transaction pooling не сохраняет prepared statements
+    # между транзакциями: отключаем кэши asyncpg и делаем имена уникальными
+    async_connect_args = {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+    }
+async_engine = create_async_engine(
+    settings.async_database_url,
+    connect_args=async_connect_args,
+    **engine_pool_options(is_async=True)
+)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+# Подсчет запросов и времени БД на запрос API (заголовки X-DB-Queries / X-DB-Time)
+install_query_stats(engine)
+install_query_stats(async_engine.sync_engine)
+
 Base = declarative_base()
 
 
@@ -17,3 +43,16 @@ def get_db():
     finally:
         db.close()
 
+
+async def get_async_db():
+    """Dependency для получения асинхронной сессии БД"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_pool_stats() -> dict:
+    """Состояние пулов соединений синхронного и асинхронного движков"""
+    return {
+        "sync": pool_status(engine.pool),
+        "async": pool_status(async_engine.pool),
+    }
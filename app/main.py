@@ -1,12 +1,20 @@
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import FileResponse, HTMLResponse, Response
 from fastapi.staticfiles import StaticFiles
 import os
-from app.api import auth, users, cafes, tables, slots, booking, media, dishes, actions
+from app.api import auth, users, cafes, tables, slots, booking, media, dishes, actions, availability
 from app.core.auth import get_current_user
 from app.utils.logger import logger
 from app.config import settings
+from app.database import async_engine, get_pool_stats
+from app.utils.image_pool import get_image_pool_stats, shutdown_image_pool
+from app.utils.resize_cache import get_resize_cache_stats
+from app.utils.upload_limit import UploadLimitMiddleware
+from app.utils.query_stats import QueryStatsMiddleware, QUERIES_HEADER, DB_TIME_HEADER
+from app.utils.profiling import ProfilingMiddleware
+from app.utils.tracing import TraceMiddleware, TRACE_HEADER
+from app.utils.metrics import AppStateCollector, MetricsMiddleware, build_registry, render_metrics
 
 app = FastAPI(
     title="Система бронирования мест в кафе",
@@ -16,13 +24,35 @@ app = FastAPI(
     redoc_url=None  # Отключаем встроенный ReDoc, используем кастомный
 )
 
-# CORS middleware
+# Ограничение размера тела загрузки изображений до разбора multipart
+app.add_middleware(
+    UploadLimitMiddleware,
+    paths=("/media/upload",),
+    max_bytes=settings.MAX_IMAGE_SIZE_MB * 1024 * 1024,
+)
+
+# Подсчет SQL-запросов и времени БД каждого запроса
+app.add_middleware(QueryStatsMiddleware)
+
+# Профиль запроса по требованию администратора (снаружи подсчета запросов:
+# проверка токена не входит в бюджет, а число и время SQL берутся из заголовков)
+app.add_middleware(ProfilingMiddleware)
+
+# Метрики Prometheus: задержки и статусы по маршрутам, запросы в обработке
+app.add_middleware(MetricsMiddleware)
+metrics_registry = build_registry(AppStateCollector())
+
+# Корреляционный ID запроса в логах, задачах Celery и заголовке ответа
+app.add_middleware(TraceMiddleware)
+
+# CORS middleware (добавлен последним - внешний, заголовки CORS есть и у ответа 413)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", QUERIES_HEADER, DB_TIME_HEADER, TRACE_HEADER],
 )
 
 # Подключение роутеров
@@ -31,6 +61,7 @@ app.include_router(users.router)
 app.include_router(cafes.router)
 app.include_router(tables.router)
 app.include_router(slots.router)
+app.include_router(availability.router)
 app.include_router(booking.router)
 app.include_router(media.router)
 app.include_router(dishes.router)
@@ -47,6 +78,8 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     """Очистка при остановке"""
+    await async_engine.dispose()
+    shutdown_image_pool()
     logger.info("Application shutdown")
 
 
@@ -66,6 +99,25 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/health/db")
+async def db_pool_health():
+    """Состояние пулов соединений с БД (занятые соединения, overflow, время ожидания)"""
+    return get_pool_stats()
+
+
+@app.get("/health/media")
+async def media_health():
+    """Состояние пула обработки изображений, время загрузки и кэш размеров"""
+    return {**get_image_pool_stats(), "resize_cache": get_resize_cache_stats()}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Метрики в текстовом формате Prometheus"""
+    content, media_type = render_metrics(metrics_registry)
+    return Response(content=content, headers={"Content-Type": media_type})
+
+
 @app.get("/openapi.json", include_in_schema=False)
 async def get_openapi_json():
     """Возвращает OpenAPI спецификацию в формате JSON"""
@@ -6,6 +6,8 @@ from app.models.booking import Booking
 from app.models.dish import Dish
 from app.models.action import Action
 from app.models.booking_dish import BookingDish
+from app.models.outbox import OutboxMessage
+from app.models.media import MediaAlias
 
 __all__ = [
     "User",
@@ -16,5 +18,7 @@ __all__ = [
     "Dish",
     "Action",
     "BookingDish",
+    "OutboxMessage",
+    "MediaAlias",
 ]
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Date, ForeignKey, String, Text, Boolean, DateTime, Enum as SQLEnum
+from sqlalchemy import Column, Integer, Date, ForeignKey, String, Text, Boolean, DateTime, Index, Enum as SQLEnum, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -12,8 +12,27 @@ class BookingStatus(str, enum.Enum):
     COMPLETED = "completed"
 
 
+# Условие "действующего" бронирования для частичного уникального индекса.
+# SQLEnum хранит в БД имена членов перечисления (PENDING, CANCELLED, ...)
+ACTIVE_BOOKING_WHERE = text("status <> 'CANCELLED' AND active")
+BOOKING_SLOT_UNIQUE_INDEX = "uq_bookings_table_slot_date_active"
+
+
 class Booking(Base):
     __tablename__ = "bookings"
+    __table_args__ = (
+        # Индексы для keyset-пагинации по (date, id)
+        Index("ix_bookings_date_id", "date", "id"),
+        Index("ix_bookings_user_id_date_id", "user_id", "date", "id"),
+        Index("ix_bookings_cafe_id_date_id", "cafe_id", "date", "id"),
+        # Один стол в одном слоте на дату может быть занят только одним действующим бронированием
+        Index(
+            BOOKING_SLOT_UNIQUE_INDEX,
+            "table_id", "slot_id", "date",
+            unique=True,
+            postgresql_where=ACTIVE_BOOKING_WHERE,
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
@@ -21,7 +40,8 @@ class Booking(Base):
     table_id = Column(Integer, ForeignKey("tables.id"), nullable=False, index=True)
     slot_id = Column(Integer, ForeignKey("slots.id"), nullable=False, index=True)
     date = Column(Date, nullable=False, index=True)
-    status = Column(SQLEnum(BookingStatus), default=BookingStatus.PENDING, nullable=False)
+    # В БД колонка VARCHAR(20): native_enum=False, чтобы asyncpg не приводил параметры к типу bookingstatus
+    status = Column(SQLEnum(BookingStatus, native_enum=False, length=20), default=BookingStatus.PENDING, nullable=False)
     note = Column(Text, nullable=True)
     reminder_sent = Column(Boolean, default=False, nullable=False)
     active = Column(Boolean, default=True, nullable=False)
@@ -2,6 +2,7 @@ from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, Table,
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
+from app.config import settings
 
 # Association table для связи many-to-many между Cafe и User (менеджеры)
 cafe_managers = Table(
@@ -25,6 +26,7 @@ class Cafe(Base):
     work_start_time = Column(Time, nullable=True)  # Время начала работы (например, 09:00)
     work_end_time = Column(Time, nullable=True)  # Время окончания работы (например, 22:00)
     slot_duration_minutes = Column(Integer, nullable=True, default=60)  # Длительность слота в минутах (30, 40, 60)
+    timezone = Column(String(64), nullable=False, default=lambda: settings.DEFAULT_CAFE_TIMEZONE)  # IANA, например Europe/Moscow
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
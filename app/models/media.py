@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class MediaAlias(Base):
+    """Соответствие UUID изображения (до перехода на хранение по хэшу) хэшу содержимого"""
+    __tablename__ = "media_aliases"
+
+    image_id = Column(String(36), primary_key=True)  # UUID изображения
+    content_hash = Column(String(64), nullable=False, index=True)  # sha256 содержимого
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, BigInteger, Integer, String, Text, DateTime, Index, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class OutboxMessage(Base):
+    """Задача Celery, записанная в одной транзакции с изменением данных.
+
+    Публикацией в брокер занимается задача relay_outbox; published_at
+    заполняется после успешной отправки, failed_at - когда сообщение
+    исчерпало OUTBOX_MAX_ATTEMPTS попыток и больше не отправляется.
+    """
+    __tablename__ = "outbox_messages"
+    __table_args__ = (
+        # Неотправленные сообщения выбираются по порядку id (отложенных
+        # после OUTBOX_MAX_ATTEMPTS единицы, поэтому failed_at в индекс не входит)
+        Index("ix_outbox_messages_pending", "id", postgresql_where=text("published_at IS NULL")),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    task = Column(String(100), nullable=False)  # Имя задачи Celery
+    args = Column(JSONB, nullable=False, default=list)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text, nullable=True)
+    trace_id = Column(String(64), nullable=True)  # trace_id запроса, поставившего задачу
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    published_at = Column(DateTime(timezone=True), nullable=True)
+    failed_at = Column(DateTime(timezone=True), nullable=True)
@@ -2,9 +2,10 @@ from app.schemas.user import UserCreate, UserUpdate, UserResponse, UserLogin
 from app.schemas.cafe import CafeCreate, CafeUpdate, CafeResponse
 from app.schemas.table import TableCreate, TableUpdate, TableResponse
 from app.schemas.slot import SlotCreate, SlotUpdate, SlotResponse
-from app.schemas.booking import BookingCreate, BookingUpdate, BookingResponse
+from app.schemas.booking import BookingCreate, BookingUpdate, BookingResponse, BookingBulkCreate, BookingBulkResponse
 from app.schemas.dish import DishCreate, DishUpdate, DishResponse
 from app.schemas.action import ActionCreate, ActionUpdate, ActionResponse
+from app.schemas.availability import AvailabilityResponse
 from app.schemas.token import Token, TokenData
 
 __all__ = [
@@ -24,12 +25,15 @@ __all__ = [
     "BookingCreate",
     "BookingUpdate",
     "BookingResponse",
+    "BookingBulkCreate",
+    "BookingBulkResponse",
     "DishCreate",
     "DishUpdate",
     "DishResponse",
     "ActionCreate",
     "ActionUpdate",
     "ActionResponse",
+    "AvailabilityResponse",
     "Token",
     "TokenData",
 ]
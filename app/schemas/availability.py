@@ -0,0 +1,29 @@
+from pydantic import BaseModel, Field
+from typing import List
+from datetime import date, time
+
+
+class AvailabilityTable(BaseModel):
+    id: int
+    seats_count: int
+
+
+class AvailabilitySlot(BaseModel):
+    id: int
+    start_time: time
+    end_time: time
+
+
+class AvailabilityResponse(BaseModel):
+    """Матрица занятости столов по слотам кафе на дату"""
+    cafe_id: int
+    date: date
+    tables: List[AvailabilityTable] = []
+    slots: List[AvailabilitySlot] = []
+    free: List[str] = Field(
+        default_factory=list,
+        description=(
+            "Строка на каждый стол в порядке tables, символ на каждый слот в порядке slots: "
+            "'1' - свободен, '0' - занят"
+        )
+    )
@@ -56,3 +56,26 @@ class BookingResponse(BookingBase):
     class Config:
         from_attributes = True
 
+
+
+class BookingBulkCreate(BaseModel):
+    items: List[BookingCreate] = Field(..., min_length=1, max_length=50)
+    atomic: bool = True  # True - все или ничего, False - создаются только корректные бронирования
+
+
+class BookingBulkItemError(BaseModel):
+    index: int  # Позиция бронирования в items
+    detail: str
+
+
+class BookingBulkItemResult(BaseModel):
+    index: int  # Позиция бронирования в items
+    status: int  # 201 - создано, 400 - отклонено
+    booking_id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class BookingBulkResponse(BaseModel):
+    created: List[BookingResponse] = []
+    errors: List[BookingBulkItemError] = []
+    results: List[BookingBulkItemResult] = []  # Статус каждой позиции items по порядку
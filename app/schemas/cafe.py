@@ -1,6 +1,18 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List
 from datetime import datetime, time
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+
+def validate_timezone(value: Optional[str]) -> Optional[str]:
+    """Проверка имени часового пояса IANA (например, Europe/Moscow)"""
+    if value is None:
+        raise ValueError("Timezone cannot be null")
+    try:
+        ZoneInfo(value)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone: {value}")
+    return value
 
 
 class CafeBase(BaseModel):
@@ -12,6 +24,7 @@ class CafeBase(BaseModel):
     work_start_time: Optional[time] = None  # Время начала работы (например, 09:00)
     work_end_time: Optional[time] = None  # Время окончания работы (например, 22:00)
     slot_duration_minutes: Optional[int] = Field(None, ge=15, le=240)  # Длительность слота в минутах (15-240)
+    timezone: Optional[str] = None  # Часовой пояс IANA (по умолчанию DEFAULT_CAFE_TIMEZONE)
 
 
 class CafeCreate(CafeBase):
@@ -19,6 +32,8 @@ class CafeCreate(CafeBase):
     photo_id: str = Field(..., min_length=1)  # Обязательное поле по OpenAPI
     managers_id: List[int] = Field(default_factory=list)  # Соответствует OpenAPI (managers_id)
 
+    _check_timezone = field_validator("timezone")(validate_timezone)
+
 
 class CafeUpdate(BaseModel):
     name: Optional[str] = Field(None, min_length=1, max_length=200)
@@ -31,6 +46,9 @@ class CafeUpdate(BaseModel):
     work_start_time: Optional[time] = None
     work_end_time: Optional[time] = None
     slot_duration_minutes: Optional[int] = Field(None, ge=15, le=240)
+    timezone: Optional[str] = None
+
+    _check_timezone = field_validator("timezone")(validate_timezone)
 
 
 class CafeResponse(CafeBase):
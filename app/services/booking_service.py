@@ -1,45 +1,200 @@
 from datetime import date, datetime
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from typing import Dict, List, Optional
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload, joinedload, load_only
+from sqlalchemy.sql import Select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, status
-from app.models.booking import Booking, BookingStatus
+from app.models.booking import Booking, BookingStatus, ACTIVE_BOOKING_WHERE, BOOKING_SLOT_UNIQUE_INDEX
+from app.models.cafe import Cafe
 from app.models.table import Table
 from app.models.slot import Slot
 from app.models.dish import Dish
 from app.models.booking_dish import BookingDish
+from app.schemas.booking import BookingResponse, BookingDishResponse
 
 
-def check_booking_conflicts(
-    db: Session,
-    user_id: int,
-    table_id: int,
-    slot_id: int,
-    booking_date: date,
-    exclude_booking_id: int = None
-) -> bool:
-    """Проверка пересечений бронирований"""
-    # Получение слота для проверки времени
-    slot = db.query(Slot).filter(Slot.id == slot_id).first()
-    if not slot:
-        return False
+def select_bookings_with_dishes() -> Select:
+    """Запрос бронирований с предзагрузкой блюд.
+
+    Блюда бронирований и их названия подгружаются одним дополнительным
+    SELECT ... WHERE booking_id IN (...) на всю выборку, поэтому число
+    запросов не зависит от количества бронирований и блюд в них.
+    """
+    return select(Booking).options(
+        selectinload(Booking.dishes)
+        .joinedload(BookingDish.dish)
+        .load_only(Dish.id, Dish.name)
+    )
+
+
+async def get_booking_with_dishes(db: AsyncSession, booking_id: int) -> Optional[Booking]:
+    """Получение бронирования по ID вместе с блюдами.
+
+    Объект перечитывается из БД даже если уже есть в сессии, чтобы после
+    изменений в ответ попали актуальные updated_at и состав блюд.
+    """
+    stmt = (
+        select_bookings_with_dishes()
+        .where(Booking.id == booking_id)
+        .execution_options(populate_existing=True)
+    )
+    result = await db.execute(stmt)
+    return result.scalar_one_or_none()
+
+
+def booking_to_response(booking: Booking) -> BookingResponse:
+    """Преобразование бронирования в BookingResponse"""
+    dishes_response = [
+        BookingDishResponse(
+            id=bd.id,
+            dish_id=bd.dish_id,
+            dish_name=bd.dish.name,
+            quantity=bd.quantity,
+            price=float(bd.price)
+        )
+        for bd in booking.dishes
+    ]
+    
+    booking_dict = {
+        **{c.name: getattr(booking, c.name) for c in booking.__table__.columns},
+        "dishes": dishes_response
+    }
+    return BookingResponse(**booking_dict)
+
+
+def bookings_to_response(bookings: List[Booking]) -> List[BookingResponse]:
+    """Преобразование списка бронирований в список BookingResponse"""
+    return [booking_to_response(booking) for booking in bookings]
+
+
+def _insert_bookings_statement(values):
+    """INSERT бронирований, пропускающий строки с занятыми столом и слотом"""
+    return (
+        pg_insert(Booking)
+        .values(values)
+        .on_conflict_do_nothing(
+            index_elements=[Booking.table_id, Booking.slot_id, Booking.date],
+            index_where=ACTIVE_BOOKING_WHERE
+        )
+    )
+
+
+async def insert_booking(db: AsyncSession, values: dict) -> Optional[int]:
+    """Создание бронирования с проверкой пересечений на стороне БД.
+
+    Выполняется одним INSERT ... ON CONFLICT DO NOTHING RETURNING id по
+    частичному уникальному индексу (table_id, slot_id, date), поэтому
+    проверка корректна и при параллельных запросах. Возвращает ID нового
+    бронирования или None, если стол и слот на эту дату уже заняты.
+    """
+    stmt = _insert_bookings_statement(values).returning(Booking.id)
+    result = await db.execute(stmt)
+    return result.scalar()
+
+
+async def insert_bookings(db: AsyncSession, values: List[dict]) -> Dict[tuple, int]:
+    """Создание группы бронирований одним INSERT.
+
+    Возвращает ID созданных бронирований по ключу (table_id, slot_id, date);
+    бронирования, чьи стол и слот уже заняты, в результат не попадают.
+    """
+    stmt = _insert_bookings_statement(values).returning(
+        Booking.id, Booking.table_id, Booking.slot_id, Booking.date
+    )
+    result = await db.execute(stmt)
+    return {
+        (row.table_id, row.slot_id, row.date): row.id
+        for row in result
+    }
+
+
+async def validate_bookings_bulk(db: AsyncSession, items: list) -> Dict[int, str]:
+    """Проверка группы бронирований набором запросов на всю группу.
+
+    Кафе, столы, слоты, блюда и существующие бронирования загружаются
+    одним запросом каждый. Возвращает ошибки по позициям в items.
+    """
+    errors = {}
+    
+    result = await db.execute(
+        select(Cafe.id, Cafe.active).where(Cafe.id.in_({item.cafe_id for item in items}))
+    )
+    cafes = {row.id: row for row in result}
+    result = await db.execute(
+        select(Table.id, Table.cafe_id, Table.active).where(Table.id.in_({item.table_id for item in items}))
+    )
+    tables = {row.id: row for row in result}
+    result = await db.execute(
+        select(Slot.id, Slot.cafe_id, Slot.active).where(Slot.id.in_({item.slot_id for item in items}))
+    )
+    slots = {row.id: row for row in result}
+    dish_ids = {dish.dish_id for item in items for dish in (item.dishes or [])}
+    existing_dish_ids = set()
+    if dish_ids:
+        result = await db.execute(select(Dish.id).where(Dish.id.in_(dish_ids)))
+        existing_dish_ids = set(result.scalars())
     
-    # Поиск существующих бронирований на тот же стол, дату и время
-    query = db.query(Booking).filter(
-        and_(
-            Booking.table_id == table_id,
-            Booking.slot_id == slot_id,
-            Booking.date == booking_date,
+    keys = {(item.table_id, item.slot_id, item.date) for item in items}
+    result = await db.execute(
+        select(Booking.table_id, Booking.slot_id, Booking.date).where(
+            tuple_(Booking.table_id, Booking.slot_id, Booking.date).in_(keys),
             Booking.status != BookingStatus.CANCELLED,
             Booking.active == True
         )
     )
+    booked = set(result.tuples())
     
-    if exclude_booking_id:
-        query = query.filter(Booking.id != exclude_booking_id)
-    
-    existing_booking = query.first()
+    today = date.today()
+    seen_keys = set()
+    for index, item in enumerate(items):
+        cafe = cafes.get(item.cafe_id)
+        table = tables.get(item.table_id)
+        slot = slots.get(item.slot_id)
+        key = (item.table_id, item.slot_id, item.date)
+        missing_dishes = [d.dish_id for d in (item.dishes or []) if d.dish_id not in existing_dish_ids]
+        
+        if item.date < today:
+            errors[index] = "Нельзя забронировать стол на прошедшую дату"
+        elif not cafe or not cafe.active:
+            errors[index] = "Cafe not found or inactive"
+        elif not table or not table.active:
+            errors[index] = "Table not found or inactive"
+        elif table.cafe_id != item.cafe_id:
+            errors[index] = "Table does not belong to this cafe"
+        elif not slot or not slot.active:
+            errors[index] = "Slot not found or inactive"
+        elif slot.cafe_id != item.cafe_id:
+            errors[index] = "Slot does not belong to this cafe"
+        elif missing_dishes:
+            errors[index] = f"Dish {missing_dishes[0]} not found"
+        elif key in booked or key in seen_keys:
+            errors[index] = "Этот стол и временной слот уже забронированы"
+        else:
+            seen_keys.add(key)
     
-    return existing_booking is not None
+    return errors
+
+
+def is_booking_conflict(error: IntegrityError) -> bool:
+    """Проверка что ошибка вызвана пересечением бронирований"""
+    return BOOKING_SLOT_UNIQUE_INDEX in str(error.orig)
+
+
+async def flush_booking_changes(db: AsyncSession, detail: str) -> None:
+    """Сохранение изменений бронирования с преобразованием пересечения в ошибку 400"""
+    try:
+        await db.flush()
+    except IntegrityError as e:
+        await db.rollback()
+        if is_booking_conflict(e):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=detail
+            )
+        raise
 
 
 def validate_booking_date(booking_date: date) -> None:
@@ -68,30 +223,61 @@ def validate_booking_status(booking: Booking) -> None:
         )
 
 
-def create_booking_dishes(
-    db: Session,
-    booking_id: int,
-    dishes_data: list
+async def create_bookings_dishes(
+    db: AsyncSession,
+    dishes_by_booking: Dict[int, list]
 ) -> list:
-    """Создание записей о блюдах в бронировании"""
-    booking_dishes = []
+    """Создание записей о блюдах для одного или нескольких бронирований.
+
+    Повторяющиеся dish_id в бронировании объединяются в одну строку,
+    блюда загружаются одним запросом IN (все отсутствующие блюда
+    возвращаются в одной ошибке), строки вставляются одним INSERT.
+    """
+    quantities_by_booking = {}
+    for booking_id, dishes_data in dishes_by_booking.items():
+        quantities = {}
+        for dish_data in dishes_data:
+            dish_id = dish_data["dish_id"]
+            quantities[dish_id] = quantities.get(dish_id, 0) + dish_data["quantity"]
+        quantities_by_booking[booking_id] = quantities
     
-    for dish_data in dishes_data:
-        dish = db.query(Dish).filter(Dish.id == dish_data["dish_id"]).first()
-        if not dish:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Dish {dish_data['dish_id']} not found"
-            )
-        
-        booking_dish = BookingDish(
-            booking_id=booking_id,
-            dish_id=dish.id,
-            quantity=dish_data["quantity"],
-            price=dish.price
+    dish_ids = {dish_id for quantities in quantities_by_booking.values() for dish_id in quantities}
+    if not dish_ids:
+        return []
+    
+    result = await db.execute(select(Dish.id, Dish.price).where(Dish.id.in_(dish_ids)))
+    prices = dict(result.tuples().all())
+    missing = sorted(dish_ids - prices.keys())
+    if len(missing) == 1:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Dish {missing[0]} not found"
+        )
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Dishes {', '.join(str(dish_id) for dish_id in missing)} not found"
         )
-        booking_dishes.append(booking_dish)
-        db.add(booking_dish)
+    
+    booking_dishes = [
+        {
+            "booking_id": booking_id,
+            "dish_id": dish_id,
+            "quantity": quantity,
+            "price": prices[dish_id]
+        }
+        for booking_id, quantities in quantities_by_booking.items()
+        for dish_id, quantity in quantities.items()
+    ]
+    await db.execute(insert(BookingDish), booking_dishes)
     
     return booking_dishes
 
+
+async def create_booking_dishes(
+    db: AsyncSession,
+    booking_id: int,
+    dishes_data: list
+) -> list:
+    """Создание записей о блюдах в бронировании"""
+    return await create_bookings_dishes(db, {booking_id: dishes_data})
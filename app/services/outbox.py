@@ -0,0 +1,16 @@
+from typing import Union
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.models.outbox import OutboxMessage
+from app.utils.tracing import get_trace_id
+
+
+def enqueue_task(db: Union[Session, AsyncSession], task: str, *args):
+    """Постановка задачи Celery в outbox.
+
+    Сообщение сохраняется тем же commit, что и изменение данных, поэтому
+    обработчик запроса не обращается к брокеру, а при откате транзакции
+    уведомление не уходит. Аргументы должны сериализоваться в JSON.
+    trace_id запроса сохраняется и передается задаче при публикации.
+    """
+    db.add(OutboxMessage(task=task, args=list(args), trace_id=get_trace_id()))
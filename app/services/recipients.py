@@ -0,0 +1,69 @@
+import json
+from typing import List, Optional
+from redis.exceptions import RedisError
+from sqlalchemy.orm import Session, selectinload
+from app.config import settings
+from app.models.cafe import Cafe
+from app.models.user import User, UserRole
+from app.utils.cache_versions import bump_versions
+from app.utils.metrics import record_cache_lookup
+from app.utils.redis_client import get_sync_redis, redis_unavailable
+
+RECIPIENTS_KEY_PREFIX = "notify:recipients:"
+# Версия всех наборов получателей (меняется при изменении администраторов)
+ALL_VERSION_KEY = "notify:recipients-version"
+# Версия набора получателей одного кафе (меняется при изменении его менеджеров)
+CAFE_VERSION_PREFIX = "notify:recipients-version:"
+
+RECIPIENT_FIELDS = ("id", "username", "email", "tg_id")
+
+
+def _load_cafe_recipients(db: Session, cafe_id: int) -> Optional[List[dict]]:
+    """Менеджеры кафе и активные администраторы из БД (None, если кафе нет)"""
+    cafe = db.query(Cafe).options(selectinload(Cafe.managers)).filter(Cafe.id == cafe_id).first()
+    if not cafe:
+        return None
+    admins = db.query(User).filter(User.role == UserRole.ADMIN, User.active == True).all()
+    
+    recipients = {}
+    for user in list(cafe.managers) + admins:
+        recipients[user.id] = {field: getattr(user, field) for field in RECIPIENT_FIELDS}
+    return list(recipients.values())
+
+
+def get_cafe_recipients(db: Session, cafe_id: int) -> Optional[List[dict]]:
+    """Получатели уведомлений о бронированиях кафе (кэшируются в Redis)"""
+    redis = get_sync_redis()
+    key = None
+    if redis is not None:
+        try:
+            all_version, cafe_version = redis.mget(ALL_VERSION_KEY, f"{CAFE_VERSION_PREFIX}{cafe_id}")
+            key = f"{RECIPIENTS_KEY_PREFIX}{cafe_id}:{int(all_version or 0)}:{int(cafe_version or 0)}"
+            raw = redis.get(key)
+            record_cache_lookup("recipients", raw is not None)
+            if raw is not None:
+                return json.loads(raw)
+        except RedisError as e:
+            redis_unavailable(e, "Recipients cache")
+            key = None
+    
+    recipients = _load_cafe_recipients(db, cafe_id)
+    if recipients is not None and key is not None:
+        try:
+            redis.set(key, json.dumps(recipients), ex=settings.RECIPIENTS_CACHE_TTL)
+        except RedisError as e:
+            redis_unavailable(e, "Recipients cache")
+    return recipients
+
+
+async def invalidate_recipients(cafe_id: Optional[int] = None):
+    """Сброс кэша получателей: одного кафе (изменились менеджеры) или всех (изменились администраторы).
+
+    Неудавшийся сброс повторяет задача bump_cache_versions из outbox, поэтому
+    удаленный менеджер не получает уведомления до RECIPIENTS_CACHE_TTL.
+    """
+    await bump_versions(
+        [ALL_VERSION_KEY if cafe_id is None else f"{CAFE_VERSION_PREFIX}{cafe_id}"],
+        settings.RECIPIENTS_CACHE_TTL,
+        "Recipients cache"
+    )
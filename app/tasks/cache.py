@@ -0,0 +1,34 @@
+import time
+from redis.exceptions import RedisError
+from app.celery_app import celery_app
+from app.config import settings
+from app.utils.cache_versions import BUMP_TASK
+from app.utils.logger import logger
+from app.utils.redis_client import get_sync_redis, redis_unavailable
+
+
+@celery_app.task(name=BUMP_TASK, bind=True, max_retries=None)
+def bump_cache_versions(self, keys: list, expires_at: float):
+    """Увеличение версий кэша, которое не удалось выполнить в запросе API.
+    
+    Повторяется каждые CACHE_INVALIDATION_RETRY_DELAY секунд, пока Redis
+    недоступен, но не дольше expires_at: затем старые записи истекли сами.
+    """
+    if not settings.REDIS_URL:
+        return
+    redis = get_sync_redis()
+    try:
+        if redis is None:
+            raise RedisError("Redis is in reconnect back-off")
+        with redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.incr(key)
+            pipe.execute()
+        logger.info(f"Cache versions bumped after Redis recovery: {keys}")
+    except RedisError as e:
+        if redis is not None:
+            redis_unavailable(e, "Cache invalidation")
+        if time.time() + settings.CACHE_INVALIDATION_RETRY_DELAY >= expires_at:
+            logger.warning(f"Cache invalidation {keys} dropped: entries have expired")
+            return
+        raise self.retry(countdown=settings.CACHE_INVALIDATION_RETRY_DELAY)
@@ -1,9 +1,57 @@
+import json
+from collections import defaultdict
+from redis.exceptions import RedisError
 from app.celery_app import celery_app
+from app.config import settings
 from app.database import SessionLocal
 from app.models.booking import Booking
-from app.models.cafe import Cafe
-from app.models.user import User, UserRole
+from app.services.recipients import get_cafe_recipients
 from app.utils.logger import logger
+from app.utils.redis_client import get_sync_redis, redis_unavailable
+
+DIGEST_EVENTS_PREFIX = "notify:digest:"
+DIGEST_SCHEDULED_PREFIX = "notify:digest-scheduled:"
+
+
+def _send(recipient: dict, message: str):
+    """Отправка сообщения получателю"""
+    # Здесь должна быть реальная отправка уведомления (email, telegram и т.д.)
+    # Для примера просто логируем
+    logger.info(f"Notification sent to {recipient['username']} (id: {recipient['id']}) {message}")
+
+
+def _queue_digest(recipient: dict, event: str) -> bool:
+    """Добавление события в дайджест получателя.
+    
+    Первое событие окна планирует отправку дайджеста через
+    NOTIFICATION_DIGEST_WINDOW секунд. Возвращает False, если дайджест
+    выключен или Redis недоступен - тогда событие отправляется сразу.
+    """
+    window = settings.NOTIFICATION_DIGEST_WINDOW
+    redis = get_sync_redis()
+    if window <= 0 or redis is None:
+        return False
+    
+    try:
+        # Событие и отметка о запланированной отправке пишутся атомарно
+        # относительно выборки событий в flush_notification_digest
+        with redis.pipeline() as pipe:
+            pipe.rpush(f"{DIGEST_EVENTS_PREFIX}{recipient['id']}", json.dumps({"recipient": recipient, "event": event}))
+            pipe.set(f"{DIGEST_SCHEDULED_PREFIX}{recipient['id']}", 1, nx=True, ex=window * 10)
+            _, first_in_window = pipe.execute()
+    except RedisError as e:
+        redis_unavailable(e, "Notification digest")
+        return False
+    
+    if first_in_window:
+        flush_notification_digest.apply_async(args=[recipient["id"]], countdown=window)
+    return True
+
+
+def _notify(recipient: dict, event: str):
+    """Отправка события получателю сразу или в составе дайджеста"""
+    if not _queue_digest(recipient, event):
+        _send(recipient, event)
 
 
 @celery_app.task(name="send_booking_notification")
@@ -16,32 +64,92 @@ def send_booking_notification(booking_id: int, action: str):
             logger.error(f"Booking {booking_id} not found for notification")
             return
         
-        cafe = db.query(Cafe).filter(Cafe.id == booking.cafe_id).first()
-        if not cafe:
+        # Менеджеры кафе и админы (из кэша получателей)
+        recipients = get_cafe_recipients(db, booking.cafe_id)
+        if recipients is None:
             logger.error(f"Cafe {booking.cafe_id} not found for notification")
             return
         
-        # Получение менеджеров кафе и админов
-        managers = cafe.managers
-        admins = db.query(User).filter(User.role == UserRole.ADMIN, User.active == True).all()
-        
-        recipients = list(set(managers + admins))
-        
-        # Здесь должна быть реальная отправка уведомления (email, telegram и т.д.)
-        # Для примера просто логируем
         for recipient in recipients:
-            logger.info(
-                f"Notification sent to {recipient.username} (id: {recipient.id}) "
-                f"about booking {booking_id} {action} by user {booking.user_id}"
-            )
+            _notify(recipient, f"about booking {booking_id} {action} by user {booking.user_id}")
         
         logger.info(
             f"Booking notification sent: booking_id={booking_id}, action={action}, "
             f"recipients={len(recipients)}"
         )
-        
+    
     except Exception as e:
         logger.error(f"Error sending booking notification: {str(e)}")
     finally:
         db.close()
 
+
+
+@celery_app.task(name="send_bulk_booking_notification")
+def send_bulk_booking_notification(booking_ids: list, action: str):
+    """Отправка одного сводного уведомления о группе бронирований"""
+    db = SessionLocal()
+    try:
+        bookings = db.query(Booking).filter(Booking.id.in_(booking_ids)).all()
+        if not bookings:
+            logger.error(f"Bookings {booking_ids} not found for notification")
+            return
+        
+        recipients_by_cafe = {
+            cafe_id: get_cafe_recipients(db, cafe_id) or []
+            for cafe_id in {b.cafe_id for b in bookings}
+        }
+        
+        # Каждый получатель получает одно сообщение со всеми бронированиями своих кафе
+        recipients = {}
+        recipient_bookings = defaultdict(list)
+        for booking in bookings:
+            for recipient in recipients_by_cafe[booking.cafe_id]:
+                recipients[recipient["id"]] = recipient
+                recipient_bookings[recipient["id"]].append(booking.id)
+        
+        for recipient_id, ids in recipient_bookings.items():
+            _notify(recipients[recipient_id], f"about {len(ids)} bookings {action}: {ids}")
+        
+        logger.info(
+            f"Bulk booking notification sent: bookings={len(bookings)}, action={action}, "
+            f"recipients={len(recipient_bookings)}"
+        )
+    
+    except Exception as e:
+        logger.error(f"Error sending bulk booking notification: {str(e)}")
+    finally:
+        db.close()
+
+
+@celery_app.task(name="flush_notification_digest")
+def flush_notification_digest(recipient_id: int):
+    """Отправка накопленных за окно событий получателю одним сообщением"""
+    redis = get_sync_redis()
+    if redis is None:
+        logger.error(f"Redis unavailable, digest for recipient {recipient_id} postponed")
+        raise flush_notification_digest.retry(countdown=settings.NOTIFICATION_DIGEST_WINDOW)
+    
+    try:
+        # События забираются вместе со снятием отметки: следующее событие откроет новое окно
+        with redis.pipeline() as pipe:
+            pipe.lrange(f"{DIGEST_EVENTS_PREFIX}{recipient_id}", 0, -1)
+            pipe.delete(f"{DIGEST_EVENTS_PREFIX}{recipient_id}")
+            pipe.delete(f"{DIGEST_SCHEDULED_PREFIX}{recipient_id}")
+            raw_events, _, _ = pipe.execute()
+    except RedisError as e:
+        redis_unavailable(e, "Notification digest")
+        raise flush_notification_digest.retry(countdown=settings.NOTIFICATION_DIGEST_WINDOW)
+    
+    if not raw_events:
+        return
+    
+    events = [json.loads(raw) for raw in raw_events]
+    # Данные получателя берутся из последнего события окна
+    recipient = events[-1]["recipient"]
+    if len(events) == 1:
+        _send(recipient, events[0]["event"])
+    else:
+        _send(recipient, f"digest of {len(events)} events: " + "; ".join(e["event"] for e in events))
+    
+    logger.info(f"Notification digest sent: recipient_id={recipient_id}, events={len(events)}")
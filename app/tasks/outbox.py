@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta, timezone
+from kombu.exceptions import OperationalError
+from app.celery_app import celery_app
+from app.config import settings
+from app.database import SessionLocal
+from app.models.outbox import OutboxMessage
+from app.utils.logger import logger
+from app.utils.tracing import task_trace_headers
+
+
+@celery_app.task(name="relay_outbox")
+def relay_outbox():
+    """Публикация неотправленных сообщений outbox в брокер пачками.
+
+    Пачка блокируется FOR UPDATE SKIP LOCKED, поэтому параллельные запуски
+    не отправляют одно сообщение дважды. Ошибка публикации одного сообщения
+    не задерживает остальные: попытка засчитывается, а после
+    OUTBOX_MAX_ATTEMPTS сообщение откладывается (failed_at) и больше не
+    отправляется. При недоступности брокера отправленная часть пачки
+    фиксируется, остальные сообщения ждут следующего запуска без
+    засчитанной попытки.
+    Доставка "как минимум один раз": при падении между отправкой и commit
+    сообщение будет отправлено повторно.
+    """
+    db = SessionLocal()
+    published = 0
+    last_id = 0
+    try:
+        for _ in range(settings.OUTBOX_MAX_BATCHES):
+            # Сообщения после last_id: не отправленные в этом запуске не выбираются повторно
+            messages = (
+                db.query(OutboxMessage)
+                .filter(
+                    OutboxMessage.published_at.is_(None),
+                    OutboxMessage.failed_at.is_(None),
+                    OutboxMessage.id > last_id
+                )
+                .order_by(OutboxMessage.id)
+                .limit(settings.OUTBOX_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            if not messages:
+                break
+            last_id = messages[-1].id
+            
+            broker_failed = False
+            # Одно соединение с брокером на всю пачку
+            with celery_app.producer_or_acquire() as producer:
+                connection_errors = (OperationalError,) + tuple(producer.connection.connection_errors)
+                for message in messages:
+                    try:
+                        # Задача связывается с запросом, а задержка считается от записи в outbox
+                        celery_app.send_task(
+                            message.task,
+                            args=message.args,
+                            producer=producer,
+                            headers=task_trace_headers(message.trace_id, message.created_at.timestamp()),
+                        )
+                    except connection_errors as e:
+                        message.last_error = str(e)
+                        logger.error(f"Broker unavailable, outbox message {message.id} ({message.task}) not published: {str(e)}")
+                        broker_failed = True
+                        break
+                    except Exception as e:
+                        message.attempts += 1
+                        message.last_error = str(e)
+                        if message.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                            message.failed_at = datetime.now(timezone.utc)
+                            logger.error(
+                                f"Outbox message {message.id} ({message.task}) failed {message.attempts} times "
+                                f"and will not be published: {str(e)}"
+                            )
+                        else:
+                            logger.error(f"Error publishing outbox message {message.id} ({message.task}): {str(e)}")
+                        continue
+                    message.published_at = datetime.now(timezone.utc)
+                    published += 1
+            db.commit()
+            
+            if broker_failed or len(messages) < settings.OUTBOX_BATCH_SIZE:
+                break
+        
+        if published:
+            logger.info(f"Outbox relay published {published} messages")
+        
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error in relay_outbox task: {str(e)}")
+    finally:
+        db.close()
+
+
+@celery_app.task(name="cleanup_outbox")
+def cleanup_outbox():
+    """Удаление давно отправленных сообщений outbox"""
+    db = SessionLocal()
+    try:
+        threshold = datetime.now(timezone.utc) - timedelta(days=settings.OUTBOX_RETENTION_DAYS)
+        deleted = db.query(OutboxMessage).filter(
+            OutboxMessage.published_at < threshold
+        ).delete(synchronize_session=False)
+        db.commit()
+        logger.info(f"Outbox cleanup removed {deleted} published messages")
+    except Exception as e:
+        logger.error(f"Error in cleanup_outbox task: {str(e)}")
+    finally:
+        db.close()
@@ -1,41 +1,72 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, update
 from app.celery_app import celery_app
+from app.config import settings
 from app.database import SessionLocal
 from app.models.booking import Booking, BookingStatus
+from app.models.cafe import Cafe
+from app.models.slot import Slot
 from app.utils.logger import logger
 
 
+def _reminder_candidates():
+    """Условия бронирования, которому нужно отправить напоминание"""
+    return (
+        Booking.status == BookingStatus.CONFIRMED,
+        Booking.reminder_sent == False,
+        Booking.active == True
+    )
+
+
+def _slot_start_at():
+    """Начало слота бронирования (дата + время слота в часовом поясе кафе) как timestamptz"""
+    return func.timezone(Cafe.timezone, Booking.date + Slot.start_time)
+
+
 @celery_app.task(name="send_booking_reminders")
 def send_booking_reminders():
-    """Отправка напоминаний о предстоящих бронированиях"""
+    """Отправка напоминаний о бронированиях, слот которых скоро начнется.
+
+    Задача запускается каждые REMINDER_WINDOW_MINUTES минут и берет
+    бронирования, слот которых начинается не позже чем через
+    REMINDER_LEAD_HOURS часов плюс окно. Напоминание приходит примерно
+    за REMINDER_LEAD_HOURS до начала по местному времени кафе, а нагрузка
+    распределяется по дню вслед за слотами. Пропущенные после сбоя
+    бронирования подхватываются следующим запуском, пока слот не начался.
+
+    Кандидаты читаются порциями по id и раздаются задачам
+    send_booking_reminders_chunk.
+    """
     db = SessionLocal()
     try:
-        # Находим бронирования на завтра, которым еще не отправляли напоминание
-        tomorrow = datetime.now().date() + timedelta(days=1)
+        now = datetime.now(timezone.utc)
+        horizon = now + timedelta(hours=settings.REMINDER_LEAD_HOURS, minutes=settings.REMINDER_WINDOW_MINUTES)
+        start_at = _slot_start_at()
         
-        bookings = db.query(Booking).filter(
-            Booking.date == tomorrow,
-            Booking.status == BookingStatus.CONFIRMED,
-            Booking.reminder_sent == False,
-            Booking.active == True
-        ).all()
+        query = db.query(Booking.id).join(Slot, Slot.id == Booking.slot_id).join(Cafe, Cafe.id == Booking.cafe_id).filter(
+            # Грубый фильтр по дате для индекса (date, id): часовой пояс сдвигает дату не больше чем на сутки
+            Booking.date.between(now.date() - timedelta(days=1), horizon.date() + timedelta(days=1)),
+            *_reminder_candidates(),
+            start_at > now,
+            start_at <= horizon
+        )
         
-        for booking in bookings:
-            try:
-                # Здесь должна быть реальная отправка напоминания (email, telegram и т.д.)
-                # Для примера просто логируем
-                logger.info(
-                    f"Reminder sent to user {booking.user_id} "
-                    f"about booking {booking.id} on {booking.date}"
-                )
-                
-                booking.reminder_sent = True
-                db.commit()
-                
-            except Exception as e:
-                logger.error(f"Error sending reminder for booking {booking.id}: {str(e)}")
+        last_id = 0
+        chunks = 0
+        total = 0
+        while True:
+            ids = [
+                row.id for row in query.filter(Booking.id > last_id).order_by(Booking.id).limit(settings.REMINDER_CHUNK_SIZE)
+            ]
+            if not ids:
+                break
+            
+            send_booking_reminders_chunk.delay(ids)
+            last_id = ids[-1]
+            chunks += 1
+            total += len(ids)
         
-        logger.info(f"Sent reminders for {len(bookings)} bookings")
+        logger.info(f"Scheduled reminders for {total} bookings in {chunks} chunks")
         
     except Exception as e:
         logger.error(f"Error in send_booking_reminders task: {str(e)}")
@@ -43,6 +74,51 @@ def send_booking_reminders():
         db.close()
 
 
+@celery_app.task(
+    name="send_booking_reminders_chunk",
+    acks_late=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=5
+)
+def send_booking_reminders_chunk(booking_ids: list):
+    """Отправка напоминаний по порции бронирований.
+
+    Порция захватывается одним UPDATE ... RETURNING: бронирования, уже
+    отмеченные другой задачей, не возвращаются, поэтому параллельные и
+    повторные запуски не дублируют напоминания. Отметка фиксируется
+    commit после отправки - при сбое она откатывается и задача
+    выполняется заново (acks_late при падении воркера, autoretry при ошибке).
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            update(Booking)
+            .where(Booking.id.in_(booking_ids), *_reminder_candidates())
+            .values(reminder_sent=True)
+            .returning(Booking.id, Booking.user_id, Booking.date)
+        )
+        claimed = result.all()
+        
+        for booking in claimed:
+            # Здесь должна быть реальная отправка напоминания (email, telegram и т.д.)
+            # Для примера просто логируем
+            logger.info(
+                f"Reminder sent to user {booking.user_id} "
+                f"about booking {booking.id} on {booking.date}"
+            )
+        
+        db.commit()
+        logger.info(f"Sent reminders for {len(claimed)} of {len(booking_ids)} bookings in chunk")
+        
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error sending reminders for chunk of {len(booking_ids)} bookings from {booking_ids[0]}: {str(e)}")
+        raise
+    finally:
+        db.close()
+
+
 @celery_app.task(name="send_booking_reminder")
 def send_booking_reminder(booking_id: int):
     """Отправка напоминания о конкретном бронировании"""
@@ -0,0 +1,74 @@
+import time
+from typing import Iterable
+from redis.exceptions import RedisError
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.services.outbox import enqueue_task
+from app.utils.logger import logger
+from app.utils.redis_client import get_redis, redis_unavailable
+
+# Задача Celery, повторяющая увеличение версий до восстановления Redis
+BUMP_TASK = "bump_cache_versions"
+
+# Ключи версий, которые не удалось увеличить: ключ -> момент (monotonic), после
+# которого старые записи истекли сами
+_pending: dict = {}
+
+
+async def _persist(keys: list, ttl: int):
+    """Сохранение неудавшегося сброса в outbox: его повторит воркер Celery"""
+    try:
+        async with AsyncSessionLocal() as db:
+            enqueue_task(db, BUMP_TASK, keys, time.time() + ttl)
+            await db.commit()
+    except Exception as e:
+        logger.error(f"Failed to persist cache invalidation {keys}: {str(e)}")
+
+
+async def bump_versions(keys: Iterable[str], ttl: int, purpose: str):
+    """Увеличение версий кэша (сброс всех записей с этими версиями).
+    
+    Если Redis не подтвердил увеличение, ключи запоминаются: этот процесс
+    не читает кэш, пока не повторит увеличение (flush_pending), а задача
+    в outbox повторяет его для остальных процессов до истечения ttl секунд -
+    к этому времени старые записи истекают сами.
+    """
+    keys = list(keys)
+    if not settings.REDIS_URL or not keys:
+        return
+    redis = get_redis()
+    if redis is not None:
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.incr(key)
+                await pipe.execute()
+            return
+        except RedisError as e:
+            redis_unavailable(e, purpose)
+    expires_at = time.monotonic() + ttl
+    for key in keys:
+        _pending[key] = max(_pending.get(key, 0.0), expires_at)
+    await _persist(keys, ttl)
+
+
+async def flush_pending(redis, purpose: str) -> bool:
+    """Повтор неудавшихся увеличений версий; False, если кэшу пока нельзя верить"""
+    now = time.monotonic()
+    for key, expires_at in list(_pending.items()):
+        if expires_at <= now:
+            _pending.pop(key, None)
+    if not _pending:
+        return True
+    keys = list(_pending)
+    try:
+        async with redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.incr(key)
+            await pipe.execute()
+    except RedisError as e:
+        redis_unavailable(e, purpose)
+        return False
+    for key in keys:
+        _pending.pop(key, None)
+    return True
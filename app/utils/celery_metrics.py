@@ -0,0 +1,83 @@
+import os
+import time
+from celery.signals import task_postrun, task_prerun, worker_init, worker_process_shutdown
+from prometheus_client import Counter, Histogram, start_http_server
+from prometheus_client import multiprocess
+from prometheus_client.core import GaugeMetricFamily
+from app.config import settings
+from app.utils.celery_tracing import task_queue_delay
+from app.utils.logger import logger
+from app.utils.metrics import build_registry, multiprocess_enabled
+
+TASK_RUNTIME = Histogram(
+    "celery_task_runtime_seconds",
+    "Время выполнения задачи Celery",
+    ["task"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+TASK_QUEUE_DELAY = Histogram(
+    "celery_task_queue_delay_seconds",
+    "Время от постановки задачи до начала выполнения",
+    ["task"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+TASKS = Counter("celery_tasks_total", "Завершенные задачи Celery по состоянию", ["task", "state"])
+
+# Время старта выполняемых задач процесса: task_id -> perf_counter
+_started_at = {}
+
+
+@task_prerun.connect
+def _on_task_prerun(task_id=None, task=None, **kwargs):
+    _started_at[task_id] = time.perf_counter()
+    queue_delay = task_queue_delay(task)
+    if queue_delay is not None:
+        TASK_QUEUE_DELAY.labels(task.name).observe(queue_delay)
+
+
+@task_postrun.connect
+def _on_task_postrun(task_id=None, task=None, state=None, **kwargs):
+    started_at = _started_at.pop(task_id, None)
+    if started_at is not None:
+        TASK_RUNTIME.labels(task.name).observe(time.perf_counter() - started_at)
+    TASKS.labels(task.name, state or "UNKNOWN").inc()
+
+
+class QueueDepthCollector:
+    """Число сообщений и потребителей очередей брокера на момент опроса"""
+
+    def __init__(self, app):
+        self.app = app
+
+    def collect(self):
+        messages = GaugeMetricFamily("celery_queue_messages", "Сообщения в очереди брокера", labels=["queue"])
+        consumers = GaugeMetricFamily("celery_queue_consumers", "Потребители очереди брокера", labels=["queue"])
+        try:
+            with self.app.connection_for_read(connect_timeout=2) as connection:
+                # Без повторных подключений: опрос метрик не должен ждать брокер
+                connection.ensure_connection(max_retries=1)
+                channel = connection.default_channel
+                for queue in self.app.amqp.queues:
+                    _, message_count, consumer_count = channel.queue_declare(queue, passive=True)
+                    messages.add_metric([queue], message_count)
+                    consumers.add_metric([queue], consumer_count)
+        except Exception as e:
+            logger.warning(f"Celery queue depth unavailable: {str(e)}")
+        yield messages
+        yield consumers
+
+
+@worker_init.connect
+def _start_metrics_server(sender=None, **kwargs):
+    """HTTP-сервер метрик в главном процессе воркера (CELERY_METRICS_PORT)"""
+    if not settings.CELERY_METRICS_PORT:
+        return
+    registry = build_registry(QueueDepthCollector(sender.app))
+    start_http_server(settings.CELERY_METRICS_PORT, registry=registry)
+    logger.info(f"Celery metrics exposed on port {settings.CELERY_METRICS_PORT}")
+
+
+@worker_process_shutdown.connect
+def _mark_process_dead(pid=None, **kwargs):
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(pid or os.getpid())
@@ -0,0 +1,77 @@
+import time
+from datetime import datetime
+from typing import Optional
+from celery.signals import before_task_publish, task_postrun, task_prerun
+from app.utils.logger import logger
+from app.utils.tracing import (
+    TASK_ENQUEUED_AT_HEADER,
+    TASK_TRACE_HEADER,
+    get_trace_id,
+    new_trace_id,
+    reset_trace_id,
+    set_trace_id,
+    task_trace_headers,
+)
+
+# Выполняемые задачи процесса: task_id -> (токен trace_id, задержка в очереди, perf_counter старта)
+_running = {}
+
+
+@before_task_publish.connect
+def _add_trace_headers(headers=None, **kwargs):
+    """trace_id текущего запроса или задачи и время постановки в заголовки сообщения.
+    
+    Заданные явно заголовки (relay_outbox передает trace_id и время записи
+    в outbox) не перезаписываются.
+    """
+    if headers is None:
+        return
+    for key, value in task_trace_headers().items():
+        headers.setdefault(key, value)
+
+
+def task_queue_delay(task) -> Optional[float]:
+    """Время от постановки задачи до начала выполнения (секунды) или None.
+    
+    Для отложенных задач (countdown/eta) отсчитывается от назначенного времени.
+    """
+    enqueued_at = task.request.get(TASK_ENQUEUED_AT_HEADER)
+    if enqueued_at is None:
+        return None
+    ready_at = float(enqueued_at)
+    eta = task.request.get("eta")
+    if eta:
+        if isinstance(eta, str):
+            eta = datetime.fromisoformat(eta)
+        ready_at = max(ready_at, eta.timestamp())
+    return max(time.time() - ready_at, 0.0)
+
+
+@task_prerun.connect
+def _start_task_span(task_id=None, task=None, **kwargs):
+    # Eager-задачи продолжают трассировку вызвавшего кода, задачи без
+    # trace_id (из beat) начинают свою
+    trace_id = task.request.get(TASK_TRACE_HEADER) or get_trace_id() or new_trace_id()
+    token = set_trace_id(trace_id)
+    _running[task_id] = (token, task_queue_delay(task), time.perf_counter())
+
+
+@task_postrun.connect
+def _finish_task_span(task_id=None, task=None, state=None, **kwargs):
+    running = _running.pop(task_id, None)
+    if running is None:
+        return
+    token, queue_delay, started_at = running
+    runtime = time.perf_counter() - started_at
+    queue_delay_ms = f"{queue_delay * 1000:.1f}" if queue_delay is not None else "-"
+    logger.bind(
+        span="celery.task",
+        task=task.name,
+        task_id=task_id,
+        queue_delay=queue_delay,
+        runtime=runtime,
+    ).info(
+        f"Task span {task.name} ({task_id}) {state}: "
+        f"queue {queue_delay_ms} ms, run {runtime * 1000:.1f} ms"
+    )
+    reset_trace_id(token)
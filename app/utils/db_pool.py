@@ -0,0 +1,102 @@
+import time
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+from app.config import settings
+from app.utils.logger import logger
+
+
+class PoolMetrics:
+    """Счетчики получения соединений из пула"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def observe(self, wait: float):
+        self.checkouts += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+
+
+class _TimedPoolMixin:
+    """Замер времени получения соединения из пула.
+
+    Pool.connect() блокируется, пока в пуле нет свободного соединения,
+    поэтому время вызова - это ожидание при исчерпании пула (плюс
+    установка нового соединения, если пул его открывает).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def recreate(self):
+        # dispose() пересоздает пул - счетчики сохраняем
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            self.metrics.timeouts += 1
+            logger.error(f"Database pool exhausted: {pool_status(self)}")
+            raise
+        wait = time.perf_counter() - start
+        self.metrics.observe(wait)
+        if wait * 1000 >= settings.DB_POOL_SLOW_CHECKOUT_MS:
+            logger.warning(f"Slow database connection checkout: {wait * 1000:.0f} ms, {pool_status(self)}")
+        return connection
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+class TimedNullPool(_TimedPoolMixin, NullPool):
+    pass
+
+
+def engine_pool_options(is_async: bool = False) -> dict:
+    """Параметры пула для create_engine / create_async_engine из настроек"""
+    if settings.DB_PGBOUNCER:
+        # Пулингом занимается PgBouncer: каждое соединение открывается заново
+        return {"poolclass": TimedNullPool}
+    return {
+        "poolclass": TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def pool_status(pool) -> dict:
+    """Текущее состояние пула и накопленные метрики ожидания"""
+    status = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+        })
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        status.update({
+            "checkouts": metrics.checkouts,
+            "timeouts": metrics.timeouts,
+            "wait_avg_ms": round(metrics.wait_total / metrics.checkouts * 1000, 2) if metrics.checkouts else 0.0,
+            "wait_max_ms": round(metrics.wait_max * 1000, 2),
+        })
+    return status
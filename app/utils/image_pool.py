@@ -0,0 +1,128 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from fastapi import HTTPException, status
+from app.config import settings
+from app.utils.logger import logger
+
+
+class LatencyStats:
+    """Количество, среднее и максимальное время операции"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 2),
+        }
+
+
+class ImageTaskPool:
+    """Пул процессов обработки изображений с ограничением очереди.
+    
+    Декодирование и кодирование изображений не блокируют event loop.
+    Если в работе и в очереди уже workers + queue_limit задач, новая
+    отклоняется с 503, а не копится в памяти.
+    
+    Процессы запускаются через spawn: fork копировал бы воркер приложения
+    вместе с event loop, пулами соединений БД и Redis и потоками. Функции
+    пула должны импортироваться без app.main (см. image_processing).
+    """
+
+    def __init__(self, name: str, workers: int, queue_limit: int):
+        self.name = name
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = None
+        # Задачи в работе и в очереди пула (меняется только из event loop)
+        self.in_flight = 0
+        self.rejected = 0
+        self.processing_stats = LatencyStats()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def run(self, fn, *args):
+        """Выполнение функции в процессе пула"""
+        if self.in_flight >= self.workers + self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Image processing queue is full, try again later",
+                headers={"Retry-After": "1"}
+            )
+        
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        except BrokenProcessPool:
+            # Процесс пула упал (например, по памяти) - пул пересоздается при следующем запросе
+            logger.error(f"Image {self.name} pool is broken, recreating")
+            self._executor = None
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Image processing is temporarily unavailable",
+                headers={"Retry-After": "1"}
+            )
+        finally:
+            self.in_flight -= 1
+            self.processing_stats.observe(time.perf_counter() - start)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "processing": self.processing_stats.as_dict(),
+        }
+
+
+# Загрузки и изображения произвольного размера (публичный GET) обрабатываются
+# в разных пулах: поток запросов размеров не отклоняет загрузки администраторов
+upload_pool = ImageTaskPool("upload", settings.IMAGE_WORKERS, settings.IMAGE_QUEUE_LIMIT)
+resize_pool = ImageTaskPool("resize", settings.IMAGE_RESIZE_WORKERS, settings.IMAGE_RESIZE_QUEUE_LIMIT)
+upload_stats = LatencyStats()
+
+
+async def run_image_task(fn, *args):
+    """Обработка загруженного изображения в пуле загрузок"""
+    return await upload_pool.run(fn, *args)
+
+
+def shutdown_image_pool():
+    """Остановка пулов процессов при завершении приложения"""
+    upload_pool.shutdown()
+    resize_pool.shutdown()
+
+
+def get_image_pool_stats() -> dict:
+    """Состояние пулов обработки изображений и время загрузок"""
+    return {
+        **upload_pool.stats(),
+        "upload": upload_stats.as_dict(),
+        "resize_pool": resize_pool.stats(),
+    }
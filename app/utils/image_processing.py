@@ -0,0 +1,162 @@
+import math
+import os
+import uuid
+from pathlib import Path
+from typing import List, Optional, Tuple
+from PIL import Image, ImageOps
+
+# Функции модуля выполняются в процессах пула (image_pool), запущенных через
+# spawn: модуль не должен импортировать настройки, БД и остальное приложение
+
+JPEG_QUALITY = 95
+VARIANT_JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+
+# Форматы вариантов: расширение файла -> (формат Pillow, MIME-тип)
+FORMATS = {
+    "jpg": ("JPEG", "image/jpeg"),
+    "webp": ("WEBP", "image/webp"),
+}
+
+
+def variant_name(image_id: str, width: int = None, ext: str = "jpg") -> str:
+    """Имя файла варианта изображения (без width - исходный размер)"""
+    if width:
+        return f"{image_id}_{width}.{ext}"
+    return f"{image_id}.{ext}"
+
+
+def shard_dir(media_dir, content_hash: str) -> Path:
+    """Каталог изображения: два уровня по первым символам хэша (ab/cd/abcd...)"""
+    return Path(media_dir) / content_hash[:2] / content_hash[2:4]
+
+
+def image_file(media_dir, content_hash: str, width: int = None, ext: str = "jpg") -> Path:
+    """Путь к варианту изображения в шардированном хранилище"""
+    return shard_dir(media_dir, content_hash) / variant_name(content_hash, width, ext)
+
+
+def read_image_header(path: str) -> Tuple[str, int, int]:
+    """Формат и размеры изображения по заголовку файла (без декодирования пикселей)"""
+    with Image.open(path) as image:
+        return image.format, image.width, image.height
+
+
+def _draft(image: Image.Image, scale: float) -> Image.Image:
+    """JPEG при scale < 1 декодируется сразу в уменьшенном масштабе
+    (1/2..1/8, не меньше требуемого размера)"""
+    if scale < 1 and image.format == "JPEG":
+        image.draft("RGB", (math.ceil(image.width * scale), math.ceil(image.height * scale)))
+    return image
+
+
+def _to_rgb(image: Image.Image) -> Image.Image:
+    # Конвертация RGBA в RGB если необходимо
+    if image.mode in ("RGBA", "LA", "P"):
+        rgb_image = Image.new("RGB", image.size, (255, 255, 255))
+        if image.mode == "P":
+            image = image.convert("RGBA")
+        rgb_image.paste(image, mask=image.split()[-1] if image.mode in ("RGBA", "LA") else None)
+        return rgb_image
+    if image.mode != "RGB":
+        return image.convert("RGB")
+    return image
+
+
+def _save(image: Image.Image, path: Path, ext: str, quality: int):
+    image_format = FORMATS[ext][0]
+    options = {"quality": quality}
+    if image_format == "JPEG":
+        options.update(optimize=True, progressive=True)
+    else:
+        options["method"] = 4
+    # Запись через временный файл: одновременная загрузка того же содержимого
+    # или чтение не увидят недописанный файл
+    tmp_path = path.with_name(f".{uuid.uuid4().hex}.tmp")
+    try:
+        image.save(tmp_path, image_format, **options)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def process_image(
+    source_path: str,
+    media_dir: str,
+    content_hash: str,
+    widths: List[int],
+    webp: bool,
+    max_dimension: Optional[int] = None
+) -> None:
+    """Декодирование изображения и сохранение исходника и уменьшенных вариантов.
+
+    Файлы кладутся в каталог шарда хэша: уменьшенные копии как
+    {hash}_{width}.jpg/.webp для каждой ширины меньше исходной, исходник -
+    как {hash}.webp и последним {hash}.jpg (его наличие означает, что
+    изображение обработано полностью). Исходник больше max_dimension по
+    длинной стороне уменьшается до него.
+    Выполняется в процессе пула обработки изображений (см. image_pool),
+    поэтому модуль импортирует только Pillow и стандартную библиотеку.
+    При ошибке удаляются только файлы, созданные этим вызовом, и только
+    если одновременная загрузка того же содержимого не завершилась.
+    """
+    original = image_file(media_dir, content_hash)
+    created = []
+    
+    def save(image: Image.Image, path: Path, ext: str, quality: int):
+        existed = path.exists()
+        _save(image, path, ext, quality)
+        if not existed:
+            created.append(path)
+    
+    try:
+        image = Image.open(source_path)
+        scale = min(1.0, max_dimension / max(image.size)) if max_dimension else 1.0
+        image = _to_rgb(_draft(image, scale))
+        if scale < 1:
+            image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+        shard_dir(media_dir, content_hash).mkdir(parents=True, exist_ok=True)
+        extensions = ["webp", "jpg"] if webp else ["jpg"]
+        
+        # Уменьшенные варианты (без увеличения маленьких изображений)
+        for width in sorted(set(widths)):
+            if width >= image.width:
+                continue
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS)
+            for ext in extensions:
+                quality = VARIANT_JPEG_QUALITY if ext == "jpg" else WEBP_QUALITY
+                save(resized, image_file(media_dir, content_hash, width, ext), ext, quality)
+        
+        for ext in extensions:
+            quality = JPEG_QUALITY if ext == "jpg" else WEBP_QUALITY
+            save(image, image_file(media_dir, content_hash, ext=ext), ext, quality)
+    except BaseException:
+        if not original.exists():
+            for path in created:
+                path.unlink(missing_ok=True)
+        raise
+
+
+def resize_image(source_path: str, target_path: str, width: int, height: int, fit: str, ext: str) -> int:
+    """Уменьшенная копия изображения произвольного размера, возврат размера файла.
+
+    fit="contain" вписывает изображение в width x height (без увеличения),
+    fit="cover" заполняет рамку целиком с обрезкой краев. Если задана
+    только одна сторона, вторая вычисляется по пропорциям.
+    """
+    image = Image.open(source_path)
+    if width and height and fit == "cover":
+        scale = max(width / image.width, height / image.height)
+    else:
+        scale = min(width / image.width if width else 1.0, height / image.height if height else 1.0)
+    image = _to_rgb(_draft(image, scale))
+    if width and height and fit == "cover":
+        image = ImageOps.fit(image, (width, height), Image.LANCZOS)
+    else:
+        image.thumbnail((width or image.width, height or image.height), Image.LANCZOS)
+    
+    target_path = Path(target_path)
+    target_path.parent.mkdir(parents=True, exist_ok=True)
+    _save(image, target_path, ext, VARIANT_JPEG_QUALITY if ext == "jpg" else WEBP_QUALITY)
+    return target_path.stat().st_size
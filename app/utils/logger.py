@@ -1,14 +1,18 @@
 import sys
 from loguru import logger
 from app.config import settings
+from app.utils.tracing import add_trace_id
 
 # Удаление стандартного обработчика
 logger.remove()
 
+# trace_id запроса API или задачи Celery в каждой записи
+logger.configure(patcher=add_trace_id)
+
 # Добавление обработчика для консоли
 logger.add(
     sys.stdout,
-    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> | <level>{message}</level>",
+    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <magenta>{extra[trace_id]}</magenta> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> | <level>{message}</level>",
     level=settings.LOG_LEVEL,
     colorize=True
 )
@@ -16,7 +20,7 @@ logger.add(
 # Добавление обработчика для файла
 logger.add(
     settings.LOG_FILE,
-    format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} | {message}",
+    format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {extra[trace_id]} | {name}:{function}:{line} | {message}",
     level=settings.LOG_LEVEL,
     rotation=settings.LOG_ROTATION,
     retention=settings.LOG_RETENTION,
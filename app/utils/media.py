@@ -1,83 +1,306 @@
-import uuid
+import hashlib
 import os
+import re
+import tempfile
 from pathlib import Path
-from typing import Optional
-from fastapi import UploadFile, HTTPException
-from PIL import Image
-import io
+from typing import Optional, Tuple
+import anyio
+from fastapi import Request, Response, UploadFile, HTTPException
+from fastapi.responses import FileResponse
+from sqlalchemy import select
 from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.media import MediaAlias
+from app.utils.image_pool import run_image_task
+from app.utils.image_processing import FORMATS, process_image, image_file, read_image_header
 
 MAX_SIZE_MB = settings.MAX_IMAGE_SIZE_MB
 MAX_SIZE_BYTES = MAX_SIZE_MB * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 256 * 1024
 MEDIA_DIR = Path(settings.MEDIA_DIR)
 MEDIA_DIR.mkdir(parents=True, exist_ok=True)
 
+# ID изображения - sha256 содержимого; UUID - ID изображений, загруженных до хранения по хэшу
+CONTENT_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+LEGACY_ID_RE = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+ALIAS_CACHE_SIZE = 10000
 
-def generate_image_id() -> str:
-    """Генерация UUID4 для ID изображения"""
-    return str(uuid.uuid4())
+# Файлы не меняются после загрузки (имя определяется содержимым)
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
 
+# UUID -> хэш (соответствие не меняется, поэтому кэшируется в процессе без TTL)
+_alias_cache: dict = {}
 
-async def save_image(file: UploadFile) -> str:
-    """Сохранение изображения и возврат его ID"""
-    # Проверка типа файла
-    if file.content_type not in ["image/jpeg", "image/jpg", "image/png"]:
+
+def content_hash(contents: bytes) -> str:
+    """ID изображения по его содержимому (sha256)"""
+    return hashlib.sha256(contents).hexdigest()
+
+
+async def _spool_upload(file: UploadFile) -> Tuple[Path, str]:
+    """Потоковая запись загрузки во временный файл с подсчетом хэша.
+    
+    В памяти находится не больше одного блока; запись прерывается, как
+    только размер превышает MAX_IMAGE_SIZE_MB.
+    """
+    digest = hashlib.sha256()
+    received = 0
+    fd, tmp_name = tempfile.mkstemp(dir=MEDIA_DIR, prefix=".upload-")
+    tmp_path = Path(tmp_name)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                received += len(chunk)
+                if received > MAX_SIZE_BYTES:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Image size exceeds {MAX_SIZE_MB}MB limit"
+                    )
+                digest.update(chunk)
+                await anyio.to_thread.run_sync(out.write, chunk)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return tmp_path, digest.hexdigest()
+
+
+async def _check_image_header(tmp_path: Path):
+    """Проверка формата и размеров по заголовку до полного декодирования"""
+    try:
+        image_format, width, height = await anyio.to_thread.run_sync(read_image_header, str(tmp_path))
+    except Exception:
+        raise HTTPException(
+            status_code=400,
+            detail="Error processing image: unrecognized image file"
+        )
+    if image_format not in ("JPEG", "PNG"):
         raise HTTPException(
             status_code=400,
             detail="Only JPG and PNG images are supported"
         )
-    
-    # Чтение файла
-    contents = await file.read()
-    
-    # Проверка размера
-    if len(contents) > MAX_SIZE_BYTES:
+    if width * height > settings.IMAGE_MAX_PIXELS:
         raise HTTPException(
             status_code=400,
-            detail=f"Image size exceeds {MAX_SIZE_MB}MB limit"
+            detail=f"Image dimensions {width}x{height} exceed the allowed limit"
         )
+
+
+async def save_image(file: UploadFile) -> str:
+    """Сохранение изображения и возврат его ID.
     
-    # Генерация ID
-    image_id = generate_image_id()
+    Повторная загрузка того же файла возвращает существующий ID без
+    повторной обработки.
+    """
+    # Проверка типа файла
+    if file.content_type not in ["image/jpeg", "image/jpg", "image/png"]:
+        raise HTTPException(
+            status_code=400,
+            detail="Only JPG and PNG images are supported"
+        )
     
-    # Конвертация в JPG
+    # Запись во временный файл с проверкой размера; ID по содержимому:
+    # одинаковые файлы хранятся один раз
+    tmp_path, image_id = await _spool_upload(file)
     try:
-        image = Image.open(io.BytesIO(contents))
-        # Конвертация RGBA в RGB если необходимо
-        if image.mode in ("RGBA", "LA", "P"):
-            rgb_image = Image.new("RGB", image.size, (255, 255, 255))
-            if image.mode == "P":
-                image = image.convert("RGBA")
-            rgb_image.paste(image, mask=image.split()[-1] if image.mode in ("RGBA", "LA") else None)
-            image = rgb_image
-        elif image.mode != "RGB":
-            image = image.convert("RGB")
+        if image_file(MEDIA_DIR, image_id).exists():
+            return image_id
         
-        # Сохранение в JPG
-        image_path = MEDIA_DIR / f"{image_id}.jpg"
-        image.save(image_path, "JPEG", quality=95)
+        await _check_image_header(tmp_path)
         
+        # Исходник и уменьшенные варианты в пуле процессов (не блокирует event loop)
+        try:
+            await run_image_task(
+                process_image,
+                str(tmp_path),
+                str(MEDIA_DIR),
+                image_id,
+                settings.IMAGE_VARIANT_WIDTHS,
+                settings.IMAGE_WEBP_ENABLED,
+                settings.IMAGE_MAX_DIMENSION
+            )
+            return image_id
+        except HTTPException:
+            # 503 при заполненной очереди - обработка не начиналась
+            raise
+        except Exception as e:
+            # Свои недописанные файлы process_image удаляет сам; файлы
+            # одновременной загрузки того же содержимого не трогаются
+            raise HTTPException(
+                status_code=400,
+                detail=f"Error processing image: {str(e)}"
+            )
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def media_file(image_key: str, width: Optional[int] = None, ext: str = "jpg") -> Path:
+    """Путь к варианту изображения по хэшу (шардированное хранилище) или по
+    старому UUID (плоский каталог {uuid}.jpg, {uuid}_{width}.jpg до migrate_media.py)"""
+    if LEGACY_ID_RE.match(image_key):
+        return MEDIA_DIR / (f"{image_key}_{width}.{ext}" if width else f"{image_key}.{ext}")
+    return image_file(MEDIA_DIR, image_key, width, ext)
+
+
+async def resolve_image_id(image_id: str) -> Optional[str]:
+    """Ключ файлов изображения (см. media_file) по ID: хэшу или старому UUID.
+    
+    UUID, файлы которого еще лежат в плоском каталоге (scripts/migrate_media.py
+    не запускался), отдается как есть; остальные UUID переводятся в хэш по
+    media_aliases. Сессия БД открывается только для UUID, отсутствующих в кэше.
+    """
+    if CONTENT_HASH_RE.match(image_id):
         return image_id
-    except Exception as e:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Error processing image: {str(e)}"
-        )
+    if not LEGACY_ID_RE.match(image_id):
+        return None
+    
+    if image_id in _alias_cache:
+        return _alias_cache[image_id]
+    if media_file(image_id).exists():
+        return image_id
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(MediaAlias.content_hash).where(MediaAlias.image_id == image_id))
+        resolved = result.scalar_one_or_none()
+    if resolved is not None:
+        if len(_alias_cache) >= ALIAS_CACHE_SIZE:
+            _alias_cache.clear()
+        _alias_cache[image_id] = resolved
+    return resolved
 
 
-def get_image_path(image_id: str) -> Optional[Path]:
-    """Получение пути к изображению по ID"""
-    image_path = MEDIA_DIR / f"{image_id}.jpg"
+def get_image_path(image_key: str, size: Optional[int] = None, ext: str = "jpg") -> Optional[Path]:
+    """Получение пути к изображению по ключу (хэшу содержимого или старому UUID).
+    
+    При заданном size выбирается наименьший вариант шириной не меньше size;
+    если такого нет (изображение уже или загружено до появления вариантов),
+    отдается исходник.
+    """
+    if size:
+        for width in sorted(set(settings.IMAGE_VARIANT_WIDTHS)):
+            if width < size:
+                continue
+            image_path = media_file(image_key, width, ext)
+            if image_path.exists():
+                return image_path
+    
+    image_path = media_file(image_key, ext=ext)
     if image_path.exists():
         return image_path
     return None
 
 
-def delete_image(image_id: str) -> bool:
-    """Удаление изображения"""
-    image_path = MEDIA_DIR / f"{image_id}.jpg"
-    if image_path.exists():
-        image_path.unlink()
-        return True
-    return False
+def _parse_range(header: str, file_size: int) -> Optional[Tuple[int, int]]:
+    """Границы одного диапазона из заголовка Range (None - отдать файл целиком)"""
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        # Несколько диапазонов и прочие формы не поддерживаются - отдается весь файл
+        return None
+    
+    first, last = match.groups()
+    if first == "":
+        # Суффикс: последние N байт
+        start, end = max(0, file_size - int(last)), file_size - 1
+        if int(last) == 0:
+            start = file_size
+    else:
+        start = int(first)
+        end = min(int(last), file_size - 1) if last else file_size - 1
+    
+    if start >= file_size or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{file_size}"}
+        )
+    return start, end
+
+
+def _read_range(image_path: Path, start: int, end: int) -> bytes:
+    with open(image_path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start + 1)
+
 
+def _image_headers(image_path: Path, image_id: str) -> dict:
+    """Заголовки ответа с изображением; ETag определяется именем файла (хэш и параметры варианта)"""
+    ext = image_path.suffix.lstrip(".")
+    return {
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+        "ETag": f'"{image_path.stem}-{ext}"',
+        "Vary": "Accept",
+        "Content-Disposition": f'inline; filename="{image_id}.{ext}"',
+    }
+
+
+def not_modified_response(request: Request, image_path: Path, image_id: str) -> Optional[Response]:
+    """Ответ 304, если If-None-Match совпадает с ETag файла image_path.
+    
+    Файл не читается и может еще не существовать (вариант не построен).
+    """
+    headers = _image_headers(image_path, image_id)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or headers["ETag"] in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+    return None
+
+
+async def image_response(
+    request: Request,
+    image_path: Path,
+    image_id: str,
+    content: Optional[bytes] = None
+) -> Response:
+    """Ответ с файлом изображения: неизменяемый кэш, ETag/304, Range.
+    
+    При заданном MEDIA_ACCEL_REDIRECT файл отдает nginx (X-Accel-Redirect),
+    Python передает только заголовки. content - уже прочитанный файл
+    (варианты из кэша размеров, которые может удалить другой воркер).
+    """
+    not_modified = not_modified_response(request, image_path, image_id)
+    if not_modified is not None:
+        return not_modified
+    
+    ext = image_path.suffix.lstrip(".")
+    media_type = FORMATS[ext][1]
+    headers = _image_headers(image_path, image_id)
+    etag = headers["ETag"]
+    
+    if settings.MEDIA_ACCEL_REDIRECT and content is None:
+        # nginx сам обрабатывает Range и отдает файл из internal-location
+        location = settings.MEDIA_ACCEL_REDIRECT.rstrip("/") + "/" + image_path.relative_to(MEDIA_DIR).as_posix()
+        return Response(media_type=media_type, headers={**headers, "X-Accel-Redirect": location})
+    
+    headers["Accept-Ranges"] = "bytes"
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == etag):
+        file_size = len(content) if content is not None else image_path.stat().st_size
+        byte_range = _parse_range(range_header, file_size)
+        if byte_range is not None:
+            start, end = byte_range
+            if content is not None:
+                part = content[start:end + 1]
+            else:
+                part = await anyio.to_thread.run_sync(_read_range, image_path, start, end)
+            headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+            return Response(content=part, status_code=206, media_type=media_type, headers=headers)
+    
+    if content is not None:
+        return Response(content=content, media_type=media_type, headers=headers)
+    return FileResponse(path=image_path, media_type=media_type, headers=headers)
+
+
+def delete_image(image_hash: str) -> bool:
+    """Удаление изображения вместе со всеми вариантами.
+    
+    Файлы общие для всех ссылок на то же содержимое - удалять можно
+    только изображение, на которое больше никто не ссылается.
+    """
+    if not CONTENT_HASH_RE.match(image_hash):
+        return False
+    deleted = False
+    directory = image_file(MEDIA_DIR, image_hash).parent
+    for image_path in directory.glob(f"{image_hash}*"):
+        image_path.unlink(missing_ok=True)
+        deleted = True
+    return deleted
@@ -0,0 +1,136 @@
+import os
+import time
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Gauge с multiprocess_mode открывает файл в PROMETHEUS_MULTIPROC_DIR при создании,
+# поэтому каталог создается до первой метрики. Файлы прошлого запуска удаляет
+# команда запуска контейнера: модуль импортируют и процессы, уже пишущие в каталог
+if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Время обработки запроса API",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS = Counter("http_requests_total", "Запросы API по статусу ответа", ["method", "route", "status"])
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Запросы API в обработке",
+    multiprocess_mode="livesum",
+)
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Обращения к кэшам: hit / miss", ["cache", "result"])
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    """Учет попадания или промаха кэша (доля попаданий - hit / (hit + miss))"""
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+class MetricsMiddleware:
+    """Гистограмма задержек, счетчик статусов и число запросов в обработке.
+
+    Метка route - шаблон пути (/cafe/{cafe_id}/slots), а не сам путь, чтобы
+    число временных рядов не зависело от ID в запросах.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        status_code = 500
+        
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        REQUESTS_IN_PROGRESS.inc()
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+            # Роутер дописывает найденный маршрут в scope
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_LATENCY.labels(scope["method"], route).observe(time.perf_counter() - started_at)
+            REQUESTS.labels(scope["method"], route, str(status_code)).inc()
+
+
+class AppStateCollector:
+    """Состояние процесса API на момент опроса: пулы соединений БД,
+    пул обработки изображений и кэш вариантов изображений"""
+
+    def collect(self):
+        from app.database import async_engine, engine
+        from app.utils.image_pool import get_image_pool_stats
+        from app.utils.resize_cache import get_resize_cache_stats
+        
+        connections = GaugeMetricFamily("db_pool_connections", "Соединения пула БД", labels=["engine", "state"])
+        checkouts = CounterMetricFamily("db_pool_checkouts", "Выдачи соединений из пула", labels=["engine"])
+        timeouts = CounterMetricFamily("db_pool_timeouts", "Таймауты ожидания соединения", labels=["engine"])
+        wait = CounterMetricFamily("db_pool_checkout_wait_seconds", "Суммарное ожидание соединения", labels=["engine"])
+        wait_max = GaugeMetricFamily("db_pool_checkout_wait_max_seconds", "Максимальное ожидание соединения", labels=["engine"])
+        for name, pool in (("sync", engine.pool), ("async", async_engine.pool)):
+            if hasattr(pool, "checkedout"):
+                connections.add_metric([name, "checked_out"], pool.checkedout())
+                connections.add_metric([name, "checked_in"], pool.checkedin())
+                connections.add_metric([name, "overflow"], max(pool.overflow(), 0))
+            metrics = getattr(pool, "metrics", None)
+            if metrics is not None:
+                checkouts.add_metric([name], metrics.checkouts)
+                timeouts.add_metric([name], metrics.timeouts)
+                wait.add_metric([name], metrics.wait_total)
+                wait_max.add_metric([name], metrics.wait_max)
+        yield from (connections, checkouts, timeouts, wait, wait_max)
+        
+        image_pool = get_image_pool_stats()
+        in_flight = GaugeMetricFamily("image_pool_in_flight", "Изображения в обработке и в очереди", labels=["pool"])
+        rejected = CounterMetricFamily("image_pool_rejected", "Задачи, отклоненные из-за очереди", labels=["pool"])
+        for pool, stats in (("upload", image_pool), ("resize", image_pool["resize_pool"])):
+            in_flight.add_metric([pool], stats["in_flight"])
+            rejected.add_metric([pool], stats["rejected"])
+        yield in_flight
+        yield rejected
+        
+        resize_cache = get_resize_cache_stats()
+        lookups = CounterMetricFamily("media_resize_cache_lookups", "Обращения к кэшу размеров изображений", labels=["result"])
+        for result in ("hits", "misses", "collapsed"):
+            lookups.add_metric([result], resize_cache[result])
+        yield lookups
+        yield CounterMetricFamily("media_resize_cache_evictions", "Вытеснения из кэша размеров", value=resize_cache["evictions"])
+        yield GaugeMetricFamily("media_resize_cache_bytes", "Размер кэша размеров изображений", value=resize_cache["size_mb"] * 1024 * 1024)
+
+
+def multiprocess_enabled() -> bool:
+    """Несколько процессов (воркеры uvicorn, prefork Celery) пишут метрики в PROMETHEUS_MULTIPROC_DIR"""
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def build_registry(*collectors) -> CollectorRegistry:
+    """Реестр для отдачи метрик: общий по процессам в multiprocess-режиме,
+    иначе реестр процесса; collectors описывают состояние текущего процесса"""
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    for collector in collectors:
+        registry.register(collector)
+    return registry
+
+
+def render_metrics(registry: CollectorRegistry) -> tuple:
+    """Тело и Content-Type ответа в текстовом формате Prometheus"""
+    return generate_latest(registry), CONTENT_TYPE_LATEST
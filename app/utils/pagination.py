@@ -0,0 +1,92 @@
+import base64
+import json
+from datetime import date
+from typing import List, Optional, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Query
+from sqlalchemy.sql import Select
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Наибольший размер страницы списков (параметр limit)
+MAX_PAGE_LIMIT = 1000
+
+
+def encode_cursor(values: list) -> str:
+    """Кодирование значений ключа сортировки в непрозрачный курсор"""
+    payload = [v.isoformat() if isinstance(v, date) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: list) -> list:
+    """Декодирование курсора в значения ключа сортировки"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(payload, list) or len(payload) != len(columns):
+            raise ValueError("Cursor does not match sort key")
+
+        values = []
+        for column, value in zip(columns, payload):
+            python_type = column.type.python_type
+            if python_type is date:
+                value = date.fromisoformat(value)
+            elif not isinstance(value, python_type):
+                raise ValueError("Cursor value has wrong type")
+            values.append(value)
+        return values
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def _keyset_query(query, columns: list, cursor: str, limit: int):
+    """Ограничение запроса страницей после курсора (Query или Select)"""
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        query = query.where(tuple_(*columns) > tuple_(*values))
+    return query.order_by(*columns).limit(limit + 1)
+
+
+def _keyset_page(items: list, columns: list, limit: int) -> Tuple[List, Optional[str]]:
+    """Отделение страницы от лишней строки и построение курсора следующей страницы"""
+    next_cursor = None
+    if limit > 0 and len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in columns])
+    return items, next_cursor
+
+
+def paginate_keyset(
+    query: Query,
+    columns: list,
+    cursor: str,
+    limit: int
+) -> Tuple[List, Optional[str]]:
+    """Keyset-пагинация запроса по набору колонок.
+
+    Вместо OFFSET выбираются строки, ключ которых больше ключа последней
+    строки предыдущей страницы, поэтому стоимость любой страницы равна
+    стоимости первой (при наличии индекса по тем же колонкам).
+    Пустой cursor означает первую страницу. Возвращает элементы страницы
+    и курсор следующей страницы (None, если страница последняя).
+    """
+    items = _keyset_query(query, columns, cursor, limit).all()
+    return _keyset_page(items, columns, limit)
+
+
+async def paginate_keyset_async(
+    db: AsyncSession,
+    stmt: Select,
+    columns: list,
+    cursor: str,
+    limit: int
+) -> Tuple[List, Optional[str]]:
+    """Keyset-пагинация select-запроса в асинхронной сессии (см. paginate_keyset)"""
+    result = await db.execute(_keyset_query(stmt, columns, cursor, limit))
+    return _keyset_page(result.scalars().all(), columns, limit)
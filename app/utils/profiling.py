@@ -0,0 +1,228 @@
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from fastapi import HTTPException
+from starlette.datastructures import Headers, QueryParams
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.config import settings
+from app.utils.logger import logger
+from app.utils.query_stats import DB_TIME_HEADER, QUERIES_HEADER
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_QUERY_PARAM = "profile"
+
+# Категории времени по файлу кадра: первый совпавший кадр от вершины стека
+SERIALIZATION_PATHS = (f"{os.sep}pydantic{os.sep}", f"{os.sep}pydantic_core{os.sep}", f"fastapi{os.sep}encoders.py")
+SQL_PATHS = (f"{os.sep}sqlalchemy{os.sep}", f"{os.sep}asyncpg{os.sep}", f"{os.sep}psycopg2{os.sep}")
+SERIALIZATION_FUNCTIONS = ("serialize_response",)
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Число профилируемых запросов и интервал переключения GIL до первого из них
+_active_profiles = 0
+_saved_switch_interval = None
+_switch_lock = threading.Lock()
+
+
+class _Sampler(threading.Thread):
+    """Снятие стека потока event loop с заданным интервалом.
+    
+    В выборку попадают только кадры обрабатываемого запроса (выше корневого
+    кадра middleware); моменты, когда loop ждет ввода-вывода или выполняет
+    другие запросы, учитываются как ожидание. Вес выборки - время с
+    предыдущей: при занятом GIL интервал растягивается, а доли остаются точными.
+    """
+
+    def __init__(self, thread_id: int, root_frame, interval: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.root_frame = root_frame
+        self.interval = interval
+        self.samples: List[Tuple[Optional[tuple], float]] = []
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Запуск выборки с уменьшенным интервалом переключения GIL.
+
+        Поток выборки получает GIL только когда его отпускает event loop:
+        с интервалом по умолчанию (5 мс) выборки смещаются к точкам ввода-вывода,
+        поэтому на время профилирования интервал сокращается до половины шага.
+        """
+        global _active_profiles, _saved_switch_interval
+        with _switch_lock:
+            if _active_profiles == 0:
+                _saved_switch_interval = sys.getswitchinterval()
+                sys.setswitchinterval(min(_saved_switch_interval, self.interval / 2))
+            _active_profiles += 1
+        super().start()
+
+    def run(self):
+        last = time.perf_counter()
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            self.samples.append((self._request_stack(frame), now - last))
+            last = now
+
+    def stop(self):
+        global _active_profiles
+        self._stopped.set()
+        self.join()
+        with _switch_lock:
+            _active_profiles -= 1
+            if _active_profiles == 0:
+                sys.setswitchinterval(_saved_switch_interval)
+
+    def _request_stack(self, frame) -> Optional[tuple]:
+        """Код кадров запроса от вершины стека до middleware или None"""
+        codes = []
+        while frame is not None:
+            if frame is self.root_frame:
+                return tuple(codes)
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        return None
+
+
+def _category(stack: tuple) -> str:
+    for code in stack:
+        if code.co_name in SERIALIZATION_FUNCTIONS or any(p in code.co_filename for p in SERIALIZATION_PATHS):
+            return "serialization"
+        if any(p in code.co_filename for p in SQL_PATHS):
+            return "sql"
+    return "python"
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    if f"site-packages{os.sep}" in filename:
+        filename = filename.split(f"site-packages{os.sep}", 1)[1]
+    elif filename.startswith(_PROJECT_ROOT):
+        filename = os.path.relpath(filename, _PROJECT_ROOT)
+    return f"{code.co_qualname} ({filename}:{code.co_firstlineno})"
+
+
+def _call_tree(samples: list, total: float, min_share: float) -> List[str]:
+    """Дерево вызовов в текстовом виде: время узла, доля от запроса, функция"""
+    root: Dict[str, list] = {}
+    for stack, weight in samples:
+        children = root
+        for code in reversed(stack):
+            node = children.setdefault(_frame_label(code), [0.0, {}])
+            node[0] += weight
+            children = node[1]
+    
+    lines = []
+
+    def walk(children: dict, depth: int):
+        for label, (weight, nested) in sorted(children.items(), key=lambda item: -item[1][0]):
+            if total and weight / total < min_share:
+                continue
+            lines.append(f"{'  ' * depth}{weight * 1000:8.1f} ms {weight / total * 100:5.1f}%  {label}")
+            walk(nested, depth + 1)
+    
+    walk(root, 0)
+    return lines
+
+
+def _profile_requested(scope: Scope) -> bool:
+    if Headers(scope=scope).get(PROFILE_HEADER, "").lower() in ("1", "true", "yes"):
+        return True
+    return PROFILE_QUERY_PARAM in QueryParams(scope.get("query_string", b""))
+
+
+async def _authorize_admin(scope: Scope):
+    """Проверка токена администратора теми же зависимостями, что и у эндпоинтов"""
+    from app.core.auth import get_current_active_user, get_current_user, require_role
+    from app.database import AsyncSessionLocal
+    
+    scheme, _, token = Headers(scope=scope).get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(
+            status_code=401,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    async with AsyncSessionLocal() as db:
+        current_user = await get_current_user(token=token, db=db)
+    current_user = await get_current_active_user(current_user=current_user)
+    return await require_role("admin")(current_user=current_user)
+
+
+class ProfilingMiddleware:
+    """Профилирование отдельного запроса по требованию администратора.
+    
+    Запрос с заголовком X-Profile: 1 (или параметром ?profile) выполняется
+    под сэмплирующим профайлером, а вместо ответа возвращается профиль:
+    дерево вызовов и разбивка времени на SQL, сериализацию Pydantic и Python.
+    Без флага запрос проходит без изменений.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not _profile_requested(scope):
+            await self.app(scope, receive, send)
+            return
+        
+        try:
+            user = await _authorize_admin(scope)
+        except HTTPException as e:
+            response = JSONResponse({"detail": e.detail}, status_code=e.status_code, headers=e.headers)
+            await response(scope, receive, send)
+            return
+        
+        profile = await self._run(scope, receive)
+        logger.info(
+            f"Profiled {scope['method']} {scope['path']} by {user.username} (id: {user.id}): "
+            f"{profile['duration_ms']} ms"
+        )
+        await JSONResponse(profile)(scope, receive, send)
+
+    async def _run(self, scope: Scope, receive: Receive) -> dict:
+        """Выполнение запроса под профайлером; ответ приложения отбрасывается"""
+        response_headers = Headers()
+        status_code = None
+        
+        async def capture(message: Message):
+            nonlocal response_headers, status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                response_headers = Headers(raw=message.get("headers", []))
+        
+        sampler = _Sampler(threading.get_ident(), sys._getframe(), settings.PROFILE_SAMPLE_INTERVAL_MS / 1000)
+        started_at = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            sampler.stop()
+        duration = time.perf_counter() - started_at
+        
+        breakdown = {"sql": 0.0, "serialization": 0.0, "python": 0.0, "waiting": 0.0}
+        request_samples = []
+        for stack, weight in sampler.samples:
+            if stack is None:
+                breakdown["waiting"] += weight
+            else:
+                breakdown[_category(stack)] += weight
+                request_samples.append((stack, weight))
+        
+        return {
+            "method": scope["method"],
+            "path": scope["path"],
+            "status_code": status_code,
+            "duration_ms": round(duration * 1000, 1),
+            "samples": len(sampler.samples),
+            "interval_ms": settings.PROFILE_SAMPLE_INTERVAL_MS,
+            # Время потока event loop по категориям; waiting - ожидание ввода-вывода
+            # (в основном ответов БД) и выполнение других запросов
+            "breakdown_ms": {name: round(value * 1000, 1) for name, value in breakdown.items()},
+            "db_queries": int(response_headers.get(QUERIES_HEADER, 0)),
+            "db_time_ms": float(response_headers.get(DB_TIME_HEADER, 0)),
+            "call_tree": _call_tree(request_samples, duration, settings.PROFILE_MIN_SHARE),
+        }
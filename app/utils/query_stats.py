@@ -0,0 +1,180 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+from urllib.parse import urlsplit
+from sqlalchemy import event
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.config import settings
+from app.utils.logger import logger
+
+QUERIES_HEADER = "X-DB-Queries"
+DB_TIME_HEADER = "X-DB-Time"
+# Сколько текстов запросов хранится для диагностики превышения бюджета
+MAX_RECORDED_STATEMENTS = 50
+
+
+class QueryStats:
+    """Число SQL-запросов и суммарное время БД в рамках запроса API"""
+
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0.0
+        self.statements: List[str] = []
+
+    def record(self, statement: str, duration: float):
+        self.queries += 1
+        self.duration += duration
+        if len(self.statements) < MAX_RECORDED_STATEMENTS:
+            self.statements.append(statement)
+
+
+# Статистика текущего запроса; изменяемый объект, поэтому запросы из
+# потоков (sync-сессии) и greenlet'ов async-движка попадают в тот же счетчик
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+# Счетчики assert_max_queries (считают запросы всех контекстов)
+_watchers: List[QueryStats] = []
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_started_at = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started_at = getattr(context, "_query_started_at", None)
+    duration = time.perf_counter() - started_at if started_at is not None else 0.0
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, duration)
+    for watcher in _watchers:
+        watcher.record(statement, duration)
+
+
+def install_query_stats(engine):
+    """Подключение подсчета запросов к движку (для async - к engine.sync_engine)"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def query_budget(limit: int):
+    """Объявление бюджета SQL-запросов эндпоинта.
+
+    Превышение пишется в лог, а при QUERY_BUDGET_STRICT (тесты) запрос
+    завершается ошибкой 500 со списком выполненных запросов.
+    """
+    def decorator(func):
+        func.__query_budget__ = limit
+        return func
+    return decorator
+
+
+class QueryStatsMiddleware:
+    """Подсчет SQL-запросов и времени БД каждого запроса API.
+
+    Результат добавляется в заголовки X-DB-Queries / X-DB-Time и в
+    access-лог, превышение объявленного бюджета (query_budget) - в лог
+    предупреждений.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+        started_at = time.perf_counter()
+        status_code = None
+        
+        replaced = False
+        
+        async def send_with_stats(message: Message):
+            nonlocal status_code, replaced
+            if replaced:
+                # Исходный ответ заменен ошибкой превышения бюджета
+                return
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                budget = getattr(scope.get("endpoint"), "__query_budget__", None)
+                if budget is not None and stats.queries > budget:
+                    logger.warning(
+                        f"Query budget exceeded: {scope['method']} {scope['path']} "
+                        f"ran {stats.queries} queries, budget {budget}"
+                    )
+                    if settings.QUERY_BUDGET_STRICT:
+                        replaced = True
+                        status_code = 500
+                        await self._budget_error(scope, receive, send, stats, budget)
+                        return
+                headers = list(message.get("headers", []))
+                headers.append((QUERIES_HEADER.lower().encode(), str(stats.queries).encode()))
+                headers.append((DB_TIME_HEADER.lower().encode(), f"{stats.duration * 1000:.1f}".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _current_stats.reset(token)
+            logger.info(
+                f'{scope["method"]} {scope["path"]} {status_code} '
+                f"{(time.perf_counter() - started_at) * 1000:.1f} ms, "
+                f"db {stats.queries} queries {stats.duration * 1000:.1f} ms"
+            )
+
+    async def _budget_error(self, scope: Scope, receive: Receive, send: Send, stats: QueryStats, budget: int):
+        response = JSONResponse(
+            status_code=500,
+            content={
+                "detail": f"Query budget exceeded: {stats.queries} queries, budget {budget}",
+                "statements": stats.statements,
+            }
+        )
+        await response(scope, receive, send)
+
+
+@contextmanager
+def assert_max_queries(limit: int):
+    """Проверка в тестах: блок выполняет не больше limit SQL-запросов.
+
+    Считаются запросы всех движков с подключенным install_query_stats,
+    в том числе выполненные приложением при вызове через TestClient.
+    """
+    stats = QueryStats()
+    _watchers.append(stats)
+    try:
+        yield stats
+    finally:
+        _watchers.remove(stats)
+    if stats.queries > limit:
+        statements = "\n".join(f"  {s}" for s in stats.statements)
+        raise AssertionError(f"Expected at most {limit} queries, got {stats.queries}:\n{statements}")
+
+
+def route_query_budget(app: ASGIApp, method: str, path: str) -> Optional[int]:
+    """Объявленный бюджет (query_budget) эндпоинта, обрабатывающего method и path"""
+    scope = {"type": "http", "method": method.upper(), "path": path, "root_path": ""}
+    for route in app.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(getattr(route, "endpoint", None), "__query_budget__", None)
+    return None
+
+
+def assert_route_queries(client, method: str, url: str, **kwargs):
+    """Вызов эндпоинта через TestClient с проверкой его объявленного бюджета.
+
+    Возвращает ответ; AssertionError, если у эндпоинта нет query_budget
+    или он выполнил больше запросов, чем объявлено.
+    """
+    budget = route_query_budget(client.app, method, urlsplit(url).path)
+    if budget is None:
+        raise AssertionError(f"{method.upper()} {url} has no declared query budget")
+    with assert_max_queries(budget):
+        return client.request(method, url, **kwargs)
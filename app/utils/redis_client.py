@@ -0,0 +1,48 @@
+import time
+from typing import Optional
+import redis
+from redis import asyncio as aioredis
+from app.config import settings
+from app.utils.logger import logger
+
+# Пауза перед повторным обращением к недоступному Redis, секунд
+REDIS_RETRY_DELAY = 30
+
+_redis = None
+_sync_redis = None
+_redis_retry_at = 0.0
+
+
+def get_redis() -> Optional[aioredis.Redis]:
+    """Общий асинхронный клиент Redis или None, если Redis не настроен или недавно был недоступен"""
+    global _redis
+    if not settings.REDIS_URL or time.monotonic() < _redis_retry_at:
+        return None
+    if _redis is None:
+        _redis = aioredis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=0.2,
+            socket_connect_timeout=0.2,
+        )
+    return _redis
+
+
+def get_sync_redis() -> Optional[redis.Redis]:
+    """Синхронный клиент Redis для Celery задач (с той же паузой после ошибок)"""
+    global _sync_redis
+    if not settings.REDIS_URL or time.monotonic() < _redis_retry_at:
+        return None
+    if _sync_redis is None:
+        _sync_redis = redis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=0.5,
+            socket_connect_timeout=0.5,
+        )
+    return _sync_redis
+
+
+def redis_unavailable(e: Exception, purpose: str):
+    """Отключение обращений к Redis на REDIS_RETRY_DELAY секунд после ошибки"""
+    global _redis_retry_at
+    _redis_retry_at = time.monotonic() + REDIS_RETRY_DELAY
+    logger.warning(f"{purpose}: Redis unavailable, falling back to database: {e}")
@@ -0,0 +1,218 @@
+import asyncio
+import fcntl
+import functools
+import os
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+from fastapi import HTTPException, status
+from app.config import settings
+from app.utils.image_pool import resize_pool
+from app.utils.image_processing import resize_image, shard_dir
+from app.utils.media import MEDIA_DIR, media_file
+
+# Каталог кэша общий для всех воркеров и переживает перезапуск, поэтому
+# состояние кэша - сами файлы: попадание - наличие файла, порядок LRU - atime
+# (обновляется при попадании), предел размера проверяется сканированием каталога.
+SWEEP_LOCK_NAME = ".sweep.lock"
+
+# Вычисляемые сейчас варианты: путь -> задача (одновременные запросы ждут одну)
+_in_progress: dict = {}
+_stats = {"hits": 0, "misses": 0, "collapsed": 0, "evictions": 0}
+# Результат последнего сканирования и байты, записанные этим процессом после него
+_last_sweep = {"at": 0.0, "files": 0, "bytes": 0}
+_written_since_sweep = 0
+_sweep_task: Optional[asyncio.Task] = None
+
+
+def cache_dir() -> Path:
+    return Path(settings.MEDIA_RESIZE_CACHE_DIR) if settings.MEDIA_RESIZE_CACHE_DIR else MEDIA_DIR / "resized"
+
+
+def _max_bytes() -> int:
+    return settings.MEDIA_RESIZE_CACHE_MAX_MB * 1024 * 1024
+
+
+def _scan(directory: Path) -> list:
+    """Файлы кэша на диске в порядке последнего доступа"""
+    files = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if name.startswith("."):  # недописанные временные файлы и блокировка
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_atime, path, stat.st_size))
+    return sorted(files)
+
+
+def _sweep(directory: Path, max_bytes: int, grace: float) -> tuple:
+    """Удаление давно использованных файлов сверх предела, возврат (файлов, байт, удалено).
+    
+    Каталог сканирует один воркер за раз (flock), остальные пропускают
+    проход. Файлы, к которым обращались за последние grace секунд, не
+    удаляются: их может сейчас отдавать другой воркер.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / SWEEP_LOCK_NAME, "a") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        files = _scan(directory)
+        total = sum(size for _, _, size in files)
+        evicted = 0
+        protected_since = time.time() - grace
+        for accessed_at, path, size in files:
+            if total <= max_bytes or accessed_at >= protected_since:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+        return len(files) - evicted, total, evicted
+
+
+async def _run_sweep():
+    global _written_since_sweep
+    result = await asyncio.to_thread(
+        _sweep, cache_dir(), _max_bytes(), settings.MEDIA_RESIZE_CACHE_GRACE_SECONDS
+    )
+    _last_sweep["at"] = time.monotonic()
+    _written_since_sweep = 0
+    if result is not None:
+        files, size, evicted = result
+        _last_sweep.update(files=files, bytes=size)
+        _stats["evictions"] += evicted
+
+
+def _maybe_sweep():
+    """Запуск прохода по каталогу, если кэш мог превысить предел.
+    
+    Оценка размера учитывает только записи этого процесса, поэтому проход
+    также выполняется не реже MEDIA_RESIZE_CACHE_SWEEP_INTERVAL секунд.
+    """
+    global _sweep_task
+    if _sweep_task is not None and not _sweep_task.done():
+        return
+    overdue = time.monotonic() - _last_sweep["at"] >= settings.MEDIA_RESIZE_CACHE_SWEEP_INTERVAL
+    if overdue or _last_sweep["bytes"] + _written_since_sweep > _max_bytes():
+        _sweep_task = asyncio.ensure_future(_run_sweep())
+
+
+def _touch(path: Path) -> bool:
+    """Отметка доступа (atime) для порядка LRU; False, если файла уже нет"""
+    try:
+        os.utime(path, (time.time(), path.stat().st_mtime))
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _done(path: str, task: asyncio.Task):
+    global _written_since_sweep
+    _in_progress.pop(path, None)
+    if task.cancelled() or task.exception() is not None:
+        return
+    _written_since_sweep += task.result()
+    _maybe_sweep()
+
+
+def snap_dimension(value: Optional[int]) -> Optional[int]:
+    """Округление запрошенной стороны вверх до шага IMAGE_RESIZE_STEPS.
+
+    Число вариантов одного изображения ограничено набором шагов, поэтому
+    перебор размеров не вытесняет кэш и не занимает пул обработки.
+    """
+    if not value:
+        return value
+    steps = sorted(settings.IMAGE_RESIZE_STEPS)
+    for step in steps:
+        if step >= value:
+            return step
+    return steps[-1]
+
+
+def resized_path(image_hash: str, width: Optional[int], height: Optional[int], fit: str, ext: str) -> Path:
+    """Путь к варианту произвольного размера в кэше"""
+    return shard_dir(cache_dir(), image_hash) / f"{image_hash}_{width or 0}x{height or 0}_{fit}.{ext}"
+
+
+async def get_resized_image(
+    image_hash: str,
+    width: Optional[int],
+    height: Optional[int],
+    fit: str,
+    ext: str
+) -> Path:
+    """Вариант изображения произвольного размера из дискового LRU-кэша.
+    
+    Размеры округляются до шагов IMAGE_RESIZE_STEPS. При промахе вариант строится в пуле обработки изображений из исходника;
+    одновременные запросы одного варианта ждут одно вычисление.
+    """
+    width, height = snap_dimension(width), snap_dimension(height)
+    path = resized_path(image_hash, width, height, fit, ext)
+    key = str(path)
+    
+    if await asyncio.to_thread(_touch, path):
+        _stats["hits"] += 1
+        _maybe_sweep()
+        return path
+    
+    task = _in_progress.get(key)
+    if task is not None:
+        _stats["collapsed"] += 1
+    else:
+        _stats["misses"] += 1
+        source = media_file(image_hash)
+        task = asyncio.ensure_future(
+            resize_pool.run(resize_image, str(source), key, width, height, fit, ext)
+        )
+        task.add_done_callback(functools.partial(_done, key))
+        _in_progress[key] = task
+    
+    # shield: отмена одного запроса (клиент ушел) не отменяет вычисление для остальных
+    await asyncio.shield(task)
+    return path
+
+
+async def open_resized_image(
+    image_hash: str,
+    width: Optional[int],
+    height: Optional[int],
+    fit: str,
+    ext: str
+) -> Tuple[Path, bytes]:
+    """Вариант из кэша вместе с содержимым для отдачи клиенту.
+    
+    Файл читается сразу: если другой воркер удалил его между попаданием
+    и чтением, это считается промахом и вариант строится заново.
+    """
+    for _ in range(2):
+        path = await get_resized_image(image_hash, width, height, fit, ext)
+        try:
+            return path, await asyncio.to_thread(path.read_bytes)
+        except FileNotFoundError:
+            continue
+    raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Resized image is temporarily unavailable",
+        headers={"Retry-After": "1"}
+    )
+
+
+def get_resize_cache_stats() -> dict:
+    """Попадания и вытеснения этого процесса и заполнение кэша по последнему проходу"""
+    lookups = _stats["hits"] + _stats["misses"] + _stats["collapsed"]
+    return {
+        **_stats,
+        "hit_rate": round((_stats["hits"] + _stats["collapsed"]) / lookups, 4) if lookups else 0.0,
+        "files": _last_sweep["files"],
+        "size_mb": round((_last_sweep["bytes"] + _written_since_sweep) / 1024 / 1024, 2),
+        "max_mb": settings.MEDIA_RESIZE_CACHE_MAX_MB,
+    }
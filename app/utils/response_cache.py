@@ -0,0 +1,102 @@
+import hashlib
+import json
+from typing import Any, Optional
+from urllib.parse import urlencode
+from fastapi import Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from redis.exceptions import RedisError
+from app.config import settings
+from app.utils.cache_versions import bump_versions, flush_pending
+from app.utils.metrics import record_cache_lookup
+from app.utils.pagination import NEXT_CURSOR_HEADER
+from app.utils.redis_client import get_redis, redis_unavailable
+
+KEY_PREFIX = "resp:"
+VERSION_PREFIX = "resp-version:"
+# Заголовки ответа, которые сохраняются вместе с телом
+CACHED_HEADERS = (NEXT_CURSOR_HEADER,)
+
+
+class ResponseCache:
+    """Кэш JSON-ответов GET-эндпоинтов в Redis с поддержкой ETag/If-None-Match.
+
+    Ключ строится из тега данных, его версии, области видимости (роль),
+    пути и отсортированных query-параметров. Изменение данных увеличивает
+    версию тега (invalidate_responses), поэтому старые записи больше не
+    читаются и истекают по TTL; ответ, вычисленный параллельно с записью,
+    сохраняется под старой версией и тоже не будет прочитан.
+    """
+
+    def __init__(self, request: Request, tag: str, scope: str = "public"):
+        self.request = request
+        self.tag = tag
+        self.scope = scope
+        self.key = None
+
+    async def lookup(self) -> Optional[Response]:
+        """Готовый ответ (200 или 304) из кэша или None при промахе"""
+        redis = get_redis()
+        # Пока не повторен неудавшийся сброс, версия тега может быть устаревшей
+        if redis is None or not await flush_pending(redis, "Response cache"):
+            return None
+        try:
+            version = await redis.get(f"{VERSION_PREFIX}{self.tag}")
+            query = urlencode(sorted(self.request.query_params.multi_items()))
+            self.key = (
+                f"{KEY_PREFIX}{self.tag}:{int(version or 0)}:{self.scope}:"
+                f"{self.request.url.path}?{query}"
+            )
+            raw = await redis.get(self.key)
+        except RedisError as e:
+            redis_unavailable(e, "Response cache")
+            self.key = None
+            return None
+        record_cache_lookup("response", raw is not None)
+        if raw is None:
+            return None
+
+        entry = json.loads(raw)
+        return self._build(entry["body"].encode("utf-8"), entry["etag"], entry["headers"])
+
+    async def store(self, content: Any, response: Optional[Response] = None) -> Response:
+        """Сериализация ответа, сохранение в кэш и ответ с ETag (или 304)"""
+        body = json.dumps(
+            jsonable_encoder(content),
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        headers = {}
+        if response is not None:
+            headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+
+        redis = get_redis()
+        if redis is not None and self.key is not None:
+            entry = {"body": body.decode("utf-8"), "etag": etag, "headers": headers}
+            try:
+                await redis.set(self.key, json.dumps(entry, ensure_ascii=False), ex=settings.RESPONSE_CACHE_TTL)
+            except RedisError as e:
+                redis_unavailable(e, "Response cache")
+
+        return self._build(body, etag, headers)
+
+    def _build(self, body: bytes, etag: str, headers: dict) -> Response:
+        headers = {**headers, "ETag": etag, "Cache-Control": "no-cache"}
+        if_none_match = self.request.headers.get("if-none-match", "")
+        if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def invalidate_responses(*tags: str):
+    """Сброс закэшированных ответов с указанными тегами (после записи в БД).
+    
+    Неудавшийся сброс повторяется (cache_versions.bump_versions), поэтому
+    после восстановления Redis старые ответы не отдаются до RESPONSE_CACHE_TTL.
+    """
+    await bump_versions(
+        (f"{VERSION_PREFIX}{tag}" for tag in tags),
+        settings.RESPONSE_CACHE_TTL,
+        "Response cache"
+    )
@@ -0,0 +1,82 @@
+import re
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Optional
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+TRACE_HEADER = "X-Request-ID"
+# Заголовки сообщения Celery: trace_id запроса и время постановки задачи (unix time)
+TASK_TRACE_HEADER = "trace_id"
+TASK_ENQUEUED_AT_HEADER = "enqueued_at"
+
+# Входящий X-Request-ID принимается, только если он безопасен для логов и заголовков
+_TRACE_ID_RE = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+_current_trace_id: ContextVar[Optional[str]] = ContextVar("trace_id", default=None)
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+def get_trace_id() -> Optional[str]:
+    """trace_id текущего запроса API или задачи Celery"""
+    return _current_trace_id.get()
+
+
+def set_trace_id(trace_id: Optional[str]):
+    """Установка trace_id контекста; возвращает токен для reset_trace_id"""
+    return _current_trace_id.set(trace_id)
+
+
+def reset_trace_id(token):
+    _current_trace_id.reset(token)
+
+
+def task_trace_headers(trace_id: Optional[str] = None, enqueued_at: Optional[float] = None) -> dict:
+    """Заголовки трассировки для публикации задачи Celery"""
+    return {
+        TASK_TRACE_HEADER: trace_id or get_trace_id() or new_trace_id(),
+        TASK_ENQUEUED_AT_HEADER: enqueued_at if enqueued_at is not None else time.time(),
+    }
+
+
+def add_trace_id(record: dict):
+    """Patcher loguru: trace_id контекста в record["extra"]"""
+    record["extra"]["trace_id"] = _current_trace_id.get() or "-"
+
+
+class TraceMiddleware:
+    """Корреляционный ID запроса API.
+    
+    ID берется из входящего X-Request-ID (от балансировщика или клиента)
+    или создается, попадает во все записи лога запроса, в заголовки задач
+    Celery, поставленных при его обработке, и возвращается в X-Request-ID.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        trace_id = Headers(scope=scope).get(TRACE_HEADER)
+        if trace_id is None or not _TRACE_ID_RE.match(trace_id):
+            trace_id = new_trace_id()
+        
+        async def send_with_trace_id(message: Message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((TRACE_HEADER.lower().encode(), trace_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+        
+        token = set_trace_id(trace_id)
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        finally:
+            reset_trace_id(token)
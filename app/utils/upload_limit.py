@@ -0,0 +1,63 @@
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Запас на заголовки и границы multipart сверх размера самого файла
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadLimitMiddleware:
+    """Отклонение слишком больших тел запросов загрузки до их разбора.
+
+    Запрос с Content-Length больше лимита отклоняется сразу, без чтения тела;
+    без Content-Length (chunked) чтение прерывается, как только принято
+    больше max_bytes. Иначе multipart-парсер Starlette целиком сохраняет
+    тело во временный файл до вызова обработчика.
+    """
+
+    def __init__(self, app: ASGIApp, paths: tuple, max_bytes: int):
+        self.app = app
+        self.paths = paths
+        self.max_bytes = max_bytes + MULTIPART_OVERHEAD_BYTES
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            await self._reject(scope, receive, send)
+            return
+        
+        received = 0
+        rejected = False
+        
+        async def limited_receive() -> Message:
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Ответ 413 отправляется сразу, приложение видит разрыв
+                    # соединения и прекращает разбор тела
+                    rejected = True
+                    await self._reject(scope, receive, send)
+                    return {"type": "http.disconnect"}
+            return message
+        
+        async def guarded_send(message: Message):
+            # После 413 ответ приложения (ошибка разбора тела) не отправляется
+            if not rejected:
+                await send(message)
+        
+        await self.app(scope, limited_receive, guarded_send)
+
+    async def _reject(self, scope: Scope, receive: Receive, send: Send):
+        response = JSONResponse(
+            status_code=413,
+            content={"detail": "Request body too large"},
+            headers={"Connection": "close"}
+        )
+        await response(scope, receive, send)
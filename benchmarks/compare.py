@@ -0,0 +1,67 @@
+"""
+Сравнение двух файлов результатов benchmarks/run.py.
+
+Код возврата 1, если в каком-либо сценарии p95 вырос или пропускная
+способность упала больше чем на --threshold процентов.
+"""
+import argparse
+import json
+import sys
+
+METRICS = [
+    # (метрика, больше - лучше)
+    ("throughput_rps", True),
+    ("p50_ms", False),
+    ("p95_ms", False),
+    ("p99_ms", False),
+]
+
+
+def change(old: float, new: float) -> float:
+    """Изменение в процентах"""
+    return (new - old) / old * 100 if old else 0.0
+
+
+def compare(base: dict, current: dict, threshold: float) -> bool:
+    """Печать таблицы изменений, True если найдена регрессия"""
+    for key in ("mode", "concurrency", "scale"):
+        if base["meta"].get(key) != current["meta"].get(key):
+            print(f"⚠️  {key} differs: {base['meta'].get(key)} -> {current['meta'].get(key)}")
+    
+    regression = False
+    print(f"{'scenario':<24}" + "".join(f"{metric:>26}" for metric, _ in METRICS))
+    for name in sorted(set(base["results"]) & set(current["results"])):
+        old, new = base["results"][name], current["results"][name]
+        cells = []
+        for metric, higher_is_better in METRICS:
+            delta = change(old[metric], new[metric])
+            worse = -delta if higher_is_better else delta
+            mark = ""
+            if metric in ("throughput_rps", "p95_ms") and worse > threshold:
+                mark = " !"
+                regression = True
+            cells.append(f"{old[metric]:>9.2f} -> {new[metric]:>9.2f} {delta:+6.1f}%{mark:2}")
+        print(f"{name:<24}" + "".join(f"{cell:>26}" for cell in cells))
+    
+    for name in sorted(set(base["results"]) ^ set(current["results"])):
+        print(f"{name:<24} only in {'base' if name in base['results'] else 'current'}")
+    return regression
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Сравнение результатов двух прогонов бенчмарка')
+    parser.add_argument('base', help='Результаты базовой версии')
+    parser.add_argument('current', help='Результаты проверяемой версии')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Допустимое ухудшение p95 и rps, %%')
+    
+    args = parser.parse_args()
+    
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    
+    if compare(base, current, args.threshold):
+        print(f"❌ Regression above {args.threshold}%")
+        sys.exit(1)
+    print("✅ No regressions")
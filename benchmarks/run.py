@@ -0,0 +1,163 @@
+"""
+Прогон сценариев бенчмарка против API и сохранение результатов в JSON.
+
+Режимы:
+  inprocess - приложение вызывается в том же процессе через ASGI (без сети и uvicorn);
+  http      - запросы к запущенному серверу по --base-url (токены подписываются
+              локально, поэтому SECRET_KEY должен совпадать с сервером).
+"""
+import sys
+import os
+import argparse
+import asyncio
+import json
+import math
+import platform
+import subprocess
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from benchmarks.scenarios import SCENARIOS, Context, Request, build_requests, cleanup_created_bookings, load_context
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Перцентиль методом ближайшего ранга"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+async def run_requests(client: httpx.AsyncClient, requests: List[Request], concurrency: int) -> dict:
+    """Выполнение запросов concurrency параллельными клиентами, статистика задержек"""
+    latencies = []
+    statuses = Counter()
+    pending = iter(requests)
+    
+    async def worker():
+        for method, url, body, headers in pending:
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, json=body, headers=headers)
+                statuses[str(response.status_code)] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - started)
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if not status.startswith(("2", "3")))
+    ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": dict(statuses),
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else 0.0,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1]) if latencies else 0.0,
+    }
+
+
+def make_client(mode: str, base_url: str) -> httpx.AsyncClient:
+    if mode == "inprocess":
+        from app.main import app
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+    return httpx.AsyncClient(base_url=base_url, timeout=60, limits=httpx.Limits(max_connections=None))
+
+
+def git_revision() -> dict:
+    root = Path(__file__).parent.parent
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=root, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root, capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+
+async def run_scenarios(client: httpx.AsyncClient, ctx: Context, args, results: dict):
+    """Прогрев и замер каждого сценария по очереди"""
+    for name in args.scenarios:
+        requests = build_requests(ctx, name, args.warmup + args.requests, args.seed)
+        if args.warmup:
+            await run_requests(client, requests[:args.warmup], args.concurrency)
+        stats = await run_requests(client, requests[args.warmup:], args.concurrency)
+        results[name] = stats
+        print(
+            f"{name:<24} {stats['throughput_rps']:>9.1f} rps  p50 {stats['p50_ms']:>8.2f}  "
+            f"p95 {stats['p95_ms']:>8.2f}  p99 {stats['p99_ms']:>8.2f} ms  errors {stats['errors']}"
+        )
+
+
+async def main(args) -> dict:
+    ctx = load_context()
+    results = {}
+    app = None
+    if args.mode == "inprocess":
+        # ASGITransport не вызывает lifespan: startup и shutdown приложения
+        # (закрытие пула async-движка и пулов изображений) выполняются здесь
+        from app.main import app
+        await app.router.startup()
+    try:
+        async with make_client(args.mode, args.base_url) as client:
+            try:
+                await run_scenarios(client, ctx, args, results)
+            finally:
+                if not args.keep_data:
+                    cleanup_created_bookings(ctx)
+    finally:
+        if app is not None:
+            await app.router.shutdown()
+    
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "mode": args.mode,
+            "base_url": args.base_url if args.mode == "http" else None,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "scale": ctx.scale(),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Бенчмарк API: пропускная способность и задержки')
+    parser.add_argument('--mode', choices=['inprocess', 'http'], default='inprocess', help='Как вызывать API')
+    parser.add_argument('--base-url', default='http://localhost:8000', help='Адрес сервера для режима http')
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS), help='Сценарии')
+    parser.add_argument('--requests', type=int, default=1000, help='Запросов на сценарий')
+    parser.add_argument('--warmup', type=int, default=50, help='Запросов прогрева (не учитываются)')
+    parser.add_argument('--concurrency', type=int, default=10, help='Параллельных клиентов')
+    parser.add_argument('--seed', type=int, default=42, help='Seed генератора запросов')
+    parser.add_argument('--keep-data', action='store_true', help='Не удалять созданные бронирования после прогона')
+    parser.add_argument('--output', help='Файл результатов (по умолчанию benchmarks/results/<время>-<режим>.json)')
+    
+    args = parser.parse_args()
+    
+    report = asyncio.run(main(args))
+    
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}-{args.mode}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"✅ Results saved to {output}")
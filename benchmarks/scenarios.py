@@ -0,0 +1,151 @@
+"""
+Сценарии бенчмарка: каждый строит последовательность запросов к API.
+
+Запросы генерируются заранее из генератора случайных чисел с фиксированным
+seed, поэтому при одинаковых данных прогоны выполняют одни и те же запросы.
+"""
+import random
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy import delete, func, select
+from app.core.security import create_access_token
+from app.database import SessionLocal
+from app.models.booking import Booking
+from app.models.booking_dish import BookingDish
+from app.models.cafe import Cafe
+from app.models.outbox import OutboxMessage
+from app.models.slot import Slot
+from app.models.table import Table
+from app.models.user import User
+
+# (метод, путь, тело JSON, заголовки)
+Request = Tuple[str, str, Optional[dict], dict]
+
+
+@dataclass
+class Context:
+    """Масштаб данных, определенный по БД, и токены пользователей"""
+    users: List[int]
+    admin_id: int
+    cafes: List[int]
+    tables: Dict[int, List[int]]
+    slots: Dict[int, List[int]]
+    first_date: date
+    last_date: date
+    _tokens: dict = field(default_factory=dict)
+
+    def auth(self, user_id: int) -> dict:
+        if user_id not in self._tokens:
+            token = create_access_token({"sub": str(user_id)})
+            self._tokens[user_id] = {"Authorization": f"Bearer {token}"}
+        return self._tokens[user_id]
+
+    def scale(self) -> dict:
+        return {
+            "users": len(self.users),
+            "cafes": len(self.cafes),
+            "tables": sum(len(t) for t in self.tables.values()),
+            "slots": sum(len(s) for s in self.slots.values()),
+            "first_date": self.first_date.isoformat(),
+            "last_date": self.last_date.isoformat(),
+        }
+
+
+def load_context() -> Context:
+    """Чтение ID и диапазона дат из заполненной БД (см. benchmarks/seed.py)"""
+    db = SessionLocal()
+    try:
+        users = list(db.scalars(select(User.id).where(User.role == "user", User.active == True).order_by(User.id)))
+        admin_id = db.scalar(select(User.id).where(User.role == "admin").order_by(User.id).limit(1))
+        cafes = list(db.scalars(select(Cafe.id).where(Cafe.active == True).order_by(Cafe.id)))
+        tables, slots = {c: [] for c in cafes}, {c: [] for c in cafes}
+        for cafe_id, table_id in db.execute(select(Table.cafe_id, Table.id).where(Table.active == True).order_by(Table.id)):
+            tables.setdefault(cafe_id, []).append(table_id)
+        for cafe_id, slot_id in db.execute(select(Slot.cafe_id, Slot.id).where(Slot.active == True).order_by(Slot.id)):
+            slots.setdefault(cafe_id, []).append(slot_id)
+        first_date, last_date = db.execute(select(func.min(Booking.date), func.max(Booking.date))).one()
+    finally:
+        db.close()
+    
+    if not users or admin_id is None or not cafes:
+        raise RuntimeError("Database is not seeded, run python -m benchmarks.seed first")
+    today = date.today()
+    return Context(users, admin_id, cafes, tables, slots, first_date or today, last_date or today)
+
+
+def cleanup_created_bookings(ctx: Context) -> int:
+    """Удаление бронирований, созданных сценарием create_booking (после last_date),
+    чтобы следующий прогон работал с теми же данными"""
+    db = SessionLocal()
+    try:
+        created = select(Booking.id).where(Booking.date > ctx.last_date)
+        db.execute(
+            delete(OutboxMessage).where(OutboxMessage.args[0].astext.cast(Booking.id.type).in_(created)),
+            execution_options={"synchronize_session": False}
+        )
+        db.execute(delete(BookingDish).where(BookingDish.booking_id.in_(created)), execution_options={"synchronize_session": False})
+        deleted = db.execute(delete(Booking).where(Booking.date > ctx.last_date), execution_options={"synchronize_session": False}).rowcount
+        db.commit()
+        return deleted
+    finally:
+        db.close()
+
+
+def get_bookings_user(ctx: Context, rng: random.Random, i: int) -> Request:
+    """Свои бронирования пользователя, первая страница"""
+    return "GET", "/booking?limit=20", None, ctx.auth(rng.choice(ctx.users))
+
+
+def get_bookings_cafe_date(ctx: Context, rng: random.Random, i: int) -> Request:
+    """Бронирования кафе на дату (админ)"""
+    cafe_id = rng.choice(ctx.cafes)
+    day = ctx.first_date + timedelta(days=rng.randint(0, (ctx.last_date - ctx.first_date).days))
+    return "GET", f"/booking?cafe_id={cafe_id}&booking_date={day}&limit=50", None, ctx.auth(ctx.admin_id)
+
+
+def get_bookings_cursor(ctx: Context, rng: random.Random, i: int) -> Request:
+    """Первая страница keyset-пагинации бронирований кафе (админ)"""
+    cafe_id = rng.choice(ctx.cafes)
+    return "GET", f"/booking?cafe_id={cafe_id}&cursor=&limit=50", None, ctx.auth(ctx.admin_id)
+
+
+def get_slots(ctx: Context, rng: random.Random, i: int) -> Request:
+    """Список слотов кафе (кэшируемый)"""
+    return "GET", f"/cafe/{rng.choice(ctx.cafes)}/slots", None, ctx.auth(rng.choice(ctx.users))
+
+
+def get_slots_for_table(ctx: Context, rng: random.Random, i: int) -> Request:
+    """Слоты с отметкой занятости стола на дату (не кэшируется)"""
+    cafe_id = rng.choice(ctx.cafes)
+    day = date.today() + timedelta(days=rng.randint(0, max(0, (ctx.last_date - date.today()).days)))
+    table_id = rng.choice(ctx.tables[cafe_id])
+    return "GET", f"/cafe/{cafe_id}/slots?booking_date={day}&table_id={table_id}", None, ctx.auth(rng.choice(ctx.users))
+
+
+def create_booking(ctx: Context, rng: random.Random, i: int) -> Request:
+    """Новое бронирование на свободную комбинацию (кафе, слот, стол) после last_date"""
+    cafe_id = ctx.cafes[i % len(ctx.cafes)]
+    slots, tables = ctx.slots[cafe_id], ctx.tables[cafe_id]
+    rest = i // len(ctx.cafes)
+    slot_id = slots[rest % len(slots)]
+    table_id = tables[(rest // len(slots)) % len(tables)]
+    day = ctx.last_date + timedelta(days=1 + rest // (len(slots) * len(tables)))
+    body = {"cafe_id": cafe_id, "table_id": table_id, "slot_id": slot_id, "date": day.isoformat()}
+    return "POST", "/booking", body, ctx.auth(rng.choice(ctx.users))
+
+
+SCENARIOS: Dict[str, Callable[[Context, random.Random, int], Request]] = {
+    "get_bookings_user": get_bookings_user,
+    "get_bookings_cafe_date": get_bookings_cafe_date,
+    "get_bookings_cursor": get_bookings_cursor,
+    "get_slots": get_slots,
+    "get_slots_for_table": get_slots_for_table,
+    "create_booking": create_booking,
+}
+
+
+def build_requests(ctx: Context, name: str, count: int, seed: int) -> List[Request]:
+    """Детерминированная последовательность запросов сценария"""
+    rng = random.Random(f"{seed}:{name}")
+    return [SCENARIOS[name](ctx, rng, i) for i in range(count)]
@@ -0,0 +1,160 @@
+"""
+Заполнение локальной БД данными для бенчмарков заданного масштаба.
+
+Данные детерминированы: при одинаковых параметрах получается одинаковая база
+(ID, даты относительно сегодняшнего дня, распределение бронирований), поэтому
+результаты прогонов разных версий можно сравнивать.
+Все таблицы приложения очищаются; по умолчанию скрипт работает только с БД,
+в имени которой есть "bench".
+"""
+import sys
+import os
+import argparse
+import math
+import time
+from datetime import date, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from app.config import settings
+from app.database import engine
+from app.core.security import get_password_hash
+
+BENCH_PASSWORD = "bench"
+# Доля дней с бронированиями, лежащих в будущем (остальные - в прошлом)
+FUTURE_SHARE = 0.25
+
+TRUNCATE_SQL = """
+TRUNCATE booking_dishes, bookings, cafe_dishes, cafe_actions, cafe_managers,
+         dishes, actions, slots, tables, cafes, users, outbox_messages
+RESTART IDENTITY CASCADE
+"""
+
+# ID выдаются по порядку (RESTART IDENTITY): пользователи 1..users, админ users+1,
+# кафе 1..cafes, столы и слоты кафе c - диапазоны (c-1)*tables+1.. и (c-1)*slots+1..
+SEED_SQL = [
+    """
+    INSERT INTO users (username, email, password_hash, role, active, created_at, updated_at)
+    SELECT 'bench_user_' || g, 'bench_user_' || g || '@bench.local', :password_hash, 'user', true, now(), now()
+    FROM generate_series(1, :users) g
+    """,
+    """
+    INSERT INTO users (username, email, password_hash, role, active, created_at, updated_at)
+    VALUES ('bench_admin', 'bench_admin@bench.local', :password_hash, 'admin', true, now(), now())
+    """,
+    """
+    INSERT INTO cafes (name, address, phone, description, active, work_start_time, work_end_time,
+                       slot_duration_minutes, timezone, created_at, updated_at)
+    SELECT 'Bench cafe ' || g, 'Bench street ' || g, '+7000' || lpad(g::text, 7, '0'), 'Benchmark cafe',
+           true, '09:00', '23:00', 60, :timezone, now(), now()
+    FROM generate_series(1, :cafes) g
+    """,
+    """
+    INSERT INTO tables (cafe_id, seats_count, description, active, created_at, updated_at)
+    SELECT c, 2 + t % 5, 'Table ' || t, true, now(), now()
+    FROM generate_series(1, :cafes) c, generate_series(1, :tables) t
+    ORDER BY c, t
+    """,
+    """
+    INSERT INTO slots (cafe_id, start_time, end_time, active, created_at, updated_at)
+    SELECT c, time '09:00' + (s - 1) * interval '1 hour', time '09:00' + s * interval '1 hour', true, now(), now()
+    FROM generate_series(1, :cafes) c, generate_series(1, :slots) s
+    ORDER BY c, s
+    """,
+    """
+    INSERT INTO dishes (name, description, price, active, created_at, updated_at)
+    SELECT 'Bench dish ' || g, 'Benchmark dish', 100 + g * 10, true, now(), now()
+    FROM generate_series(1, :dishes) g
+    """,
+    """
+    INSERT INTO cafe_dishes (dish_id, cafe_id)
+    SELECT d, c FROM generate_series(1, :dishes) d, generate_series(1, :cafes) c
+    """,
+    # Бронирование g занимает уникальную комбинацию (кафе, слот, стол, день):
+    # кафе меняется быстрее всего, затем слот, стол и день
+    """
+    INSERT INTO bookings (user_id, cafe_id, table_id, slot_id, date, status, note,
+                          reminder_sent, active, created_at, updated_at)
+    SELECT 1 + (g::bigint * 7919) % :users,
+           cafe,
+           (cafe - 1) * :tables + 1 + (g / (:cafes * :slots)) % :tables,
+           (cafe - 1) * :slots + 1 + (g / :cafes) % :slots,
+           day,
+           CASE WHEN g % 10 = 0 THEN 'CANCELLED'
+                WHEN day < current_date THEN 'COMPLETED'
+                ELSE 'CONFIRMED' END,
+           NULL, day < current_date, true, now(), now()
+    FROM (
+        SELECT g, 1 + g % :cafes AS cafe, CAST(:start_date AS date) + (g / (:cafes * :slots * :tables))::int AS day
+        FROM generate_series(0, :bookings - 1) g
+    ) b
+    """,
+    # Блюда у каждого третьего бронирования
+    """
+    INSERT INTO booking_dishes (booking_id, dish_id, quantity, price, active, created_at, updated_at)
+    SELECT b.id, 1 + b.id % :dishes, 1 + b.id % 3, 100 + (1 + b.id % :dishes) * 10, true, now(), now()
+    FROM bookings b
+    WHERE b.id % 3 = 0
+    """,
+]
+
+
+def booking_days(bookings: int, cafes: int, tables: int, slots: int) -> int:
+    """Число дней, на которые распределяются бронирования"""
+    return max(1, math.ceil(bookings / (cafes * tables * slots)))
+
+
+def seed(users: int, cafes: int, tables: int, slots: int, dishes: int, bookings: int):
+    """Очистка таблиц и заполнение БД"""
+    days = booking_days(bookings, cafes, tables, slots)
+    start_date = date.today() - timedelta(days=days - math.ceil(days * FUTURE_SHARE))
+    params = {
+        "users": users,
+        "cafes": cafes,
+        "tables": tables,
+        "slots": slots,
+        "dishes": dishes,
+        "bookings": bookings,
+        "start_date": start_date,
+        "timezone": settings.DEFAULT_CAFE_TIMEZONE,
+        "password_hash": get_password_hash(BENCH_PASSWORD),
+    }
+    
+    with engine.begin() as conn:
+        conn.execute(text(TRUNCATE_SQL))
+        for statement in SEED_SQL:
+            started = time.perf_counter()
+            conn.execute(text(statement), params)
+            table = statement.split("INTO", 1)[1].split()[0]
+            print(f"  {table}: {time.perf_counter() - started:.1f}s")
+    
+    # Статистика планировщика для свежих данных
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM ANALYZE"))
+    
+    print(
+        f"✅ Seeded {users} users, {cafes} cafes x {tables} tables x {slots} slots, "
+        f"{bookings} bookings over {days} days from {start_date}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Заполнение БД данными для бенчмарков')
+    parser.add_argument('--users', type=int, default=10000, help='Пользователей')
+    parser.add_argument('--cafes', type=int, default=50, help='Кафе')
+    parser.add_argument('--tables', type=int, default=20, help='Столов в кафе')
+    parser.add_argument('--slots', type=int, default=12, help='Слотов в кафе (по часу с 09:00, не больше 14)')
+    parser.add_argument('--dishes', type=int, default=30, help='Блюд (доступны во всех кафе)')
+    parser.add_argument('--bookings', type=int, default=1_000_000, help='Бронирований')
+    parser.add_argument('--force', action='store_true', help='Разрешить БД без "bench" в имени')
+    
+    args = parser.parse_args()
+    
+    database = make_url(settings.DATABASE_URL).database or ""
+    if "bench" not in database and not args.force:
+        parser.error(f'database "{database}" will be truncated; use a *bench* database or pass --force')
+    if not 1 <= args.slots <= 14:
+        parser.error("--slots must be between 1 and 14")
+    
+    seed(args.users, args.cafes, args.tables, args.slots, args.dishes, args.bookings)
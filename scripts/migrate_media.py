@@ -0,0 +1,132 @@
+"""
+Скрипт для перевода плоского каталога MEDIA_DIR ({uuid}.jpg) в хранилище по хэшу содержимого.
+Файлы переносятся в каталоги ab/cd/{hash}*, одинаковые изображения хранятся один раз,
+UUID записываются в media_aliases, а ссылки в кафе, блюдах и акциях заменяются на хэш.
+Скрипт можно запускать повторно; до его запуска старые изображения отдаются
+из плоского каталога.
+
+Хэш считается по сохраненному файлу {uuid}.jpg: исходные байты загрузки до
+хранения по хэшу не сохранялись, а новые загрузки хэшируются по исходным байтам.
+Поэтому повторная загрузка того же исходного файла сохраняется отдельной копией.
+"""
+import sys
+import os
+import asyncio
+import re
+from collections import defaultdict
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+from app.database import SessionLocal
+from app.models.action import Action
+from app.models.cafe import Cafe
+from app.models.dish import Dish
+from app.models.media import MediaAlias
+from app.utils.image_processing import image_file
+from app.utils.media import MEDIA_DIR, content_hash
+from app.utils.response_cache import invalidate_responses
+from app.utils.logger import logger
+
+# {uuid}.jpg, {uuid}.webp, {uuid}_{width}.jpg ...
+LEGACY_FILE_RE = re.compile(
+    r"^(?P<id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})"
+    r"(?:_(?P<width>\d+))?\.(?P<ext>jpg|webp)$"
+)
+
+
+def collect_legacy_files() -> dict:
+    """Файлы плоского каталога, сгруппированные по UUID"""
+    files = defaultdict(list)
+    for path in MEDIA_DIR.iterdir():
+        match = LEGACY_FILE_RE.match(path.name) if path.is_file() else None
+        if match:
+            files[match.group("id")].append((path, match.group("width"), match.group("ext")))
+    return files
+
+
+def move_image(image_hash: str, files: list):
+    """Перенос файлов изображения в шард его хэша"""
+    for path, width, ext in files:
+        target = image_file(MEDIA_DIR, image_hash, int(width) if width else None, ext)
+        if target.exists():
+            # То же содержимое уже в хранилище - дубликат удаляется
+            path.unlink()
+        else:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(path, target)
+
+
+def migrate_media(dry_run: bool = False):
+    """Перенос изображений и замена ссылок на них.
+    
+    Сначала (только чтением) считаются хэши, затем одним commit сохраняются
+    псевдонимы и ссылки, и только после этого переносятся файлы. Если
+    перенос прервется, повторный запуск возьмет хэши из media_aliases.
+    """
+    db: Session = SessionLocal()
+    try:
+        legacy_files = collect_legacy_files()
+        stored = dict(db.query(MediaAlias.image_id, MediaAlias.content_hash).all())
+        
+        new_aliases = {}
+        for image_id in legacy_files:
+            if image_id in stored:
+                continue
+            original = MEDIA_DIR / f"{image_id}.jpg"
+            if not original.exists():
+                logger.warning(f"Image {image_id} has no original file, skipped")
+                continue
+            new_aliases[image_id] = content_hash(original.read_bytes())
+        
+        # Изображения, перенесенные прошлым запуском, но еще упомянутые в ссылках
+        aliases = {**stored, **new_aliases}
+        
+        unique = len(set(aliases[image_id] for image_id in legacy_files if image_id in aliases))
+        logger.info(f"Media migration: {len(legacy_files)} images in flat directory, {unique} unique")
+        if dry_run or not aliases:
+            return
+        
+        for image_id, image_hash in new_aliases.items():
+            db.execute(
+                insert(MediaAlias)
+                .values(image_id=image_id, content_hash=image_hash)
+                .on_conflict_do_nothing(index_elements=[MediaAlias.image_id])
+            )
+        
+        updated = 0
+        for model in (Cafe, Dish, Action):
+            for item in db.query(model).filter(model.photo.in_(list(aliases))):
+                item.photo = aliases[item.photo]
+                updated += 1
+        db.commit()
+        
+        # Списки каталога закэшированы со старыми ID изображений
+        asyncio.run(invalidate_responses("cafes", "dishes", "actions"))
+        logger.info(f"Media migration: {len(new_aliases)} aliases stored, {updated} references updated")
+        
+        # Файлы переносятся только после сохранения соответствия UUID -> хэш
+        moved = 0
+        for image_id, files in legacy_files.items():
+            if image_id in aliases:
+                move_image(aliases[image_id], files)
+                moved += 1
+        logger.info(f"Media migration: {moved} images moved")
+    except Exception as e:
+        logger.error(f"Error migrating media: {str(e)}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Перевод MEDIA_DIR в хранилище по хэшу содержимого')
+    parser.add_argument('--dry-run', action='store_true', help='Только посчитать изображения, ничего не менять')
+    
+    args = parser.parse_args()
+    
+    migrate_media(dry_run=args.dry_run)
+    
+    print("✅ Миграция изображений завершена")
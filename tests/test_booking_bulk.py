@@ -0,0 +1,83 @@
+"""
+Массовое создание бронирований: статусы ответа и позиций, бюджет запросов
+не зависит от размера группы.
+"""
+from datetime import date, timedelta
+
+from app.utils.query_stats import assert_route_queries
+from tests.conftest import add_bookings, auth_headers
+
+MAX_BULK_ITEMS = 50
+
+
+def bulk_items(data: dict, count: int, first_day: int = 1) -> list:
+    """count бронирований с блюдами на разные столы, слоты и дни"""
+    tables, slots = data["tables"], data["slots"]
+    per_day = len(tables) * len(slots)
+    dishes = [{"dish_id": dish_id, "quantity": 1} for dish_id in data["dishes"]]
+    return [
+        {
+            "cafe_id": data["cafe"],
+            "table_id": tables[i % len(tables)],
+            "slot_id": slots[(i // len(tables)) % len(slots)],
+            "date": (date.today() + timedelta(days=first_day + i // per_day)).isoformat(),
+            "dishes": dishes,
+        }
+        for i in range(count)
+    ]
+
+
+def post_bulk(client, data: dict, items: list, atomic: bool = True):
+    return assert_route_queries(
+        client, "POST", "/booking/bulk", headers=auth_headers(data["user"]), json={"items": items, "atomic": atomic}
+    )
+
+
+def test_bulk_all_created_within_budget(client, cafe_data):
+    response = post_bulk(client, cafe_data, bulk_items(cafe_data, MAX_BULK_ITEMS))
+    assert response.status_code == 201, response.text
+    body = response.json()
+    assert len(body["created"]) == MAX_BULK_ITEMS
+    assert body["errors"] == []
+    assert [result["status"] for result in body["results"]] == [201] * MAX_BULK_ITEMS
+    assert [result["booking_id"] for result in body["results"]] == [booking["id"] for booking in body["created"]]
+
+
+def test_bulk_queries_do_not_grow_with_items(client, cafe_data):
+    few = post_bulk(client, cafe_data, bulk_items(cafe_data, 2, first_day=100))
+    many = post_bulk(client, cafe_data, bulk_items(cafe_data, MAX_BULK_ITEMS, first_day=200))
+    assert few.status_code == many.status_code == 201
+    assert few.headers["X-DB-Queries"] == many.headers["X-DB-Queries"]
+
+
+def test_bulk_partially_created_is_multi_status(client, db, cafe_data):
+    add_bookings(db, cafe_data, 1)
+    # Первая позиция совпадает с существующим бронированием
+    items = bulk_items(cafe_data, 3)
+    response = post_bulk(client, cafe_data, items, atomic=False)
+    assert response.status_code == 207, response.text
+    body = response.json()
+    assert len(body["created"]) == 2
+    assert [result["status"] for result in body["results"]] == [400, 201, 201]
+    assert body["results"][0]["booking_id"] is None
+    assert body["results"][0]["detail"] == body["errors"][0]["detail"]
+
+
+def test_bulk_nothing_created_is_client_error(client, db, cafe_data):
+    add_bookings(db, cafe_data, 2)
+    response = post_bulk(client, cafe_data, bulk_items(cafe_data, 2), atomic=False)
+    assert response.status_code == 400, response.text
+    assert [error["index"] for error in response.json()["detail"]] == [0, 1]
+    
+    response = client.get("/booking", headers=auth_headers(cafe_data["user"]))
+    assert len(response.json()) == 2
+
+
+def test_bulk_atomic_rejects_all(client, db, cafe_data):
+    add_bookings(db, cafe_data, 1)
+    response = post_bulk(client, cafe_data, bulk_items(cafe_data, 3))
+    assert response.status_code == 400, response.text
+    assert [error["index"] for error in response.json()["detail"]] == [0]
+    
+    response = client.get("/booking", headers=auth_headers(cafe_data["user"]))
+    assert len(response.json()) == 1
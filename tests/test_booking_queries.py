@@ -0,0 +1,72 @@
+"""
+Число SQL-запросов эндпоинтов бронирований не зависит от числа
+бронирований и блюд в них (нет N+1).
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from app.utils.query_stats import assert_max_queries
+from tests.conftest import add_bookings, auth_headers
+
+# Бюджеты совпадают с query_budget эндпоинтов
+LIST_QUERIES = 4
+GET_QUERIES = 4
+CREATE_QUERIES = 10
+UPDATE_QUERIES = 8
+
+
+def run_booking_routes(client, data: dict, booking_ids: list, create_day: int = 300) -> dict:
+    """Вызов эндпоинтов бронирований с подсчетом запросов каждого"""
+    headers = auth_headers(data["user"])
+    dishes = [{"dish_id": dish_id, "quantity": 2} for dish_id in data["dishes"]]
+    # Прогрев: пользователь попадает в кэш, если Redis доступен
+    assert client.get("/booking", headers=headers).status_code == 200
+    counts = {}
+    
+    with assert_max_queries(LIST_QUERIES) as stats:
+        response = client.get("/booking", headers=headers, params={"limit": 100})
+    assert response.status_code == 200
+    listed = {booking["id"]: booking for booking in response.json()}
+    assert all(len(listed[booking_id]["dishes"]) == len(dishes) for booking_id in booking_ids)
+    counts["list"] = stats.queries
+    
+    with assert_max_queries(GET_QUERIES) as stats:
+        response = client.get(f"/booking/{booking_ids[-1]}", headers=headers)
+    assert response.status_code == 200
+    counts["get"] = stats.queries
+    
+    body = {
+        "cafe_id": data["cafe"],
+        "table_id": data["tables"][0],
+        "slot_id": data["slots"][0],
+        "date": (date.today() + timedelta(days=create_day)).isoformat(),
+        "dishes": dishes,
+    }
+    with assert_max_queries(CREATE_QUERIES) as stats:
+        response = client.post("/booking", headers=headers, json=body)
+    assert response.status_code == 201, response.text
+    counts["create"] = stats.queries
+    
+    with assert_max_queries(UPDATE_QUERIES) as stats:
+        response = client.patch(
+            f"/booking/{booking_ids[0]}",
+            headers=headers,
+            json={"note": "window seat", "dishes": dishes[:1]},
+        )
+    assert response.status_code == 200, response.text
+    assert len(response.json()["dishes"]) == 1
+    counts["update"] = stats.queries
+    return counts
+
+
+@pytest.mark.parametrize("count", [5, 60])
+def test_booking_routes_within_budget(client, db, cafe_data, count):
+    booking_ids = add_bookings(db, cafe_data, count)
+    run_booking_routes(client, cafe_data, booking_ids)
+
+
+def test_booking_queries_do_not_grow_with_bookings(client, db, cafe_data):
+    few = run_booking_routes(client, cafe_data, add_bookings(db, cafe_data, 3))
+    many = run_booking_routes(client, cafe_data, add_bookings(db, cafe_data, 57, first_day=30), 301)
+    assert few == many
@@ -0,0 +1,24 @@
+"""
+Настройки подключения к БД.
+"""
+from app.config import Settings
+
+
+def test_async_database_url_driver():
+    settings = Settings(DATABASE_URL="postgresql://user:p%40ss@db:5432/booking_db")
+    assert settings.async_database_url == "postgresql+asyncpg://user:p%40ss@db:5432/booking_db"
+
+
+def test_async_database_url_psycopg2_query():
+    settings = Settings(
+        DATABASE_URL="postgresql+psycopg2://user:pass@db/booking_db"
+        "?sslmode=require&connect_timeout=10&application_name=api&host=/run/postgresql"
+    )
+    assert settings.async_database_url == (
+        "postgresql+asyncpg://user:pass@db/booking_db?host=%2Frun%2Fpostgresql&ssl=require"
+    )
+
+
+def test_async_database_url_override():
+    settings = Settings(ASYNC_DATABASE_URL="postgresql+asyncpg://other/db")
+    assert settings.async_database_url == "postgresql+asyncpg://other/db"
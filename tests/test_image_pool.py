@@ -0,0 +1,35 @@
+"""
+Пул обработки изображений: процессы запускаются через spawn и не
+импортируют приложение.
+"""
+import asyncio
+import subprocess
+import sys
+
+from PIL import Image
+
+from app.utils.image_pool import ImageTaskPool
+from app.utils.image_processing import resize_image
+from tests.conftest import PROJECT_ROOT
+
+
+def test_pool_processes_are_spawned(tmp_path):
+    source, target = tmp_path / "source.jpg", tmp_path / "target.jpg"
+    Image.new("RGB", (300, 200), (200, 30, 30)).save(source, "JPEG")
+    pool = ImageTaskPool("test", workers=1, queue_limit=1)
+    try:
+        assert asyncio.run(pool.run(resize_image, str(source), str(target), 64, None, "contain", "jpg")) > 0
+        assert pool._executor._mp_context.get_start_method() == "spawn"
+    finally:
+        pool.shutdown()
+    assert Image.open(target).width == 64
+
+
+def test_pool_functions_do_not_import_app():
+    code = (
+        "import sys, app.utils.image_processing; "
+        "print(sorted(m for m in sys.modules if m.startswith('app.') and m != 'app.utils.image_processing'))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "['app.utils']"
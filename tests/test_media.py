@@ -0,0 +1,65 @@
+"""
+Отдача изображений по хэшу и по старому UUID.
+"""
+import io
+import uuid
+
+import pytest
+from PIL import Image
+
+from app.utils.media import MEDIA_DIR
+from app.utils.resize_cache import resized_path, snap_dimension
+
+
+def jpeg_bytes(width: int = 300, height: int = 200) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def legacy_image():
+    """Изображение в плоском каталоге, еще не перенесенное migrate_media.py"""
+    image_id = str(uuid.uuid4())
+    paths = [MEDIA_DIR / f"{image_id}.jpg", MEDIA_DIR / f"{image_id}_160.jpg"]
+    paths[0].write_bytes(jpeg_bytes())
+    paths[1].write_bytes(jpeg_bytes(160, 107))
+    yield image_id
+    for path in paths:
+        path.unlink(missing_ok=True)
+
+
+def test_legacy_image_served_before_migration(client, legacy_image):
+    response = client.get(f"/media/{legacy_image}")
+    assert response.status_code == 200
+    assert response.content == (MEDIA_DIR / f"{legacy_image}.jpg").read_bytes()
+    
+    response = client.get(f"/media/{legacy_image}", params={"size": 100})
+    assert response.status_code == 200
+    assert response.content == (MEDIA_DIR / f"{legacy_image}_160.jpg").read_bytes()
+
+
+def test_legacy_image_resized_before_migration(client, legacy_image):
+    response = client.get(f"/media/{legacy_image}", params={"w": 64})
+    assert response.status_code == 200
+    assert Image.open(io.BytesIO(response.content)).width == 64
+
+
+def test_unknown_legacy_image(client):
+    assert client.get(f"/media/{uuid.uuid4()}").status_code == 404
+
+
+def test_resized_variant_not_modified_without_building(client, legacy_image):
+    response = client.get(f"/media/{legacy_image}", params={"w": 64})
+    etag = response.headers["ETag"]
+    variant = resized_path(legacy_image, snap_dimension(64), None, "contain", "jpg")
+    variant.unlink()
+    
+    response = client.get(f"/media/{legacy_image}", params={"w": 64}, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    # Вариант не строился заново
+    assert not variant.exists()
+    
+    response = client.get(f"/media/{legacy_image}", params={"w": 64, "fit": "cover"}, headers={"If-None-Match": etag})
+    assert response.status_code == 200
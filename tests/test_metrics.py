@@ -0,0 +1,24 @@
+"""
+Метрики Prometheus в режиме нескольких процессов.
+"""
+import os
+import subprocess
+import sys
+
+from tests.conftest import PROJECT_ROOT
+
+
+def test_celery_app_creates_multiprocess_dir(tmp_path):
+    metrics_dir = tmp_path / "prometheus" / "worker"
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(metrics_dir)}
+    result = subprocess.run(
+        [sys.executable, "-c", "import app.celery_app"],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    assert metrics_dir.is_dir()
+    assert any(name.startswith("gauge_livesum_") for name in os.listdir(metrics_dir))
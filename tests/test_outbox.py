@@ -0,0 +1,92 @@
+"""
+Публикация outbox: ошибка одного сообщения не задерживает остальные,
+после OUTBOX_MAX_ATTEMPTS сообщение откладывается, недоступность брокера
+останавливает пачку без засчитанной попытки.
+"""
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+from kombu.exceptions import OperationalError
+
+from app.celery_app import celery_app
+from app.config import settings
+from app.models.outbox import OutboxMessage
+from app.services.outbox import enqueue_task
+from app.tasks.outbox import relay_outbox
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    """Брокер в памяти: sent - отправленные задачи, errors - исключения по имени задачи"""
+    sent, errors = [], {}
+    
+    @contextmanager
+    def producer_or_acquire(producer=None):
+        yield SimpleNamespace(connection=SimpleNamespace(connection_errors=()))
+    
+    def send_task(name, args=None, **kwargs):
+        if name in errors:
+            raise errors[name]
+        sent.append((name, args))
+    
+    monkeypatch.setattr(celery_app, "producer_or_acquire", producer_or_acquire)
+    monkeypatch.setattr(celery_app, "send_task", send_task)
+    return SimpleNamespace(sent=sent, errors=errors)
+
+
+def enqueue(db, *tasks):
+    for task in tasks:
+        enqueue_task(db, task, 1)
+    db.commit()
+
+
+def outbox(db) -> dict:
+    db.expire_all()
+    return {message.task: message for message in db.query(OutboxMessage)}
+
+
+def test_failed_message_does_not_block_batch(db, broker, monkeypatch):
+    # По одному сообщению в пачке: сообщение с ошибкой не выбирается повторно в том же запуске
+    monkeypatch.setattr(settings, "OUTBOX_BATCH_SIZE", 1)
+    enqueue(db, "broken", "first", "second")
+    broker.errors["broken"] = TypeError("args are not serializable")
+    
+    relay_outbox()
+    
+    assert broker.sent == [("first", [1]), ("second", [1])]
+    messages = outbox(db)
+    assert messages["broken"].attempts == 1
+    assert messages["broken"].published_at is None
+    assert messages["broken"].failed_at is None
+    assert messages["first"].published_at is not None
+
+
+def test_message_parked_after_max_attempts(db, broker):
+    enqueue(db, "broken")
+    broker.errors["broken"] = TypeError("args are not serializable")
+    
+    for _ in range(settings.OUTBOX_MAX_ATTEMPTS + 2):
+        relay_outbox()
+    
+    message = outbox(db)["broken"]
+    assert message.attempts == settings.OUTBOX_MAX_ATTEMPTS
+    assert message.failed_at is not None
+    assert message.published_at is None
+
+
+def test_broker_unavailable_stops_batch(db, broker):
+    enqueue(db, "first", "down", "last")
+    broker.errors["down"] = OperationalError("connection refused")
+    
+    relay_outbox()
+    
+    assert broker.sent == [("first", [1])]
+    messages = outbox(db)
+    assert messages["down"].attempts == 0
+    assert messages["down"].last_error == "connection refused"
+    assert messages["last"].published_at is None
+    
+    del broker.errors["down"]
+    relay_outbox()
+    assert broker.sent == [("first", [1]), ("down", [1]), ("last", [1])]
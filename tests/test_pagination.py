@@ -0,0 +1,39 @@
+"""
+Проверка параметров пагинации списков.
+"""
+import pytest
+
+from app.models import Booking
+from app.utils.pagination import MAX_PAGE_LIMIT, NEXT_CURSOR_HEADER, _keyset_page
+from tests.conftest import add_bookings, auth_headers
+
+LIST_URLS = ["/booking", "/users", "/dishes", "/actions", "/cafes"]
+
+
+@pytest.mark.parametrize("url", LIST_URLS)
+@pytest.mark.parametrize("params", [
+    {"cursor": "", "limit": 0},
+    {"limit": -1},
+    {"limit": MAX_PAGE_LIMIT + 1},
+    {"skip": -1},
+])
+def test_invalid_page_params_rejected(client, cafe_data, url, params):
+    response = client.get(url, params=params, headers=auth_headers(cafe_data["admin"]))
+    assert response.status_code == 422
+
+
+def test_keyset_page_empty():
+    assert _keyset_page([], [Booking.id], 0) == ([], None)
+    assert _keyset_page([], [Booking.id], 10) == ([], None)
+
+
+def test_booking_cursor_pages(client, db, cafe_data):
+    booking_ids = add_bookings(db, cafe_data, 7)
+    headers = auth_headers(cafe_data["user"])
+    seen, cursor = [], ""
+    while cursor is not None:
+        response = client.get("/booking", params={"cursor": cursor, "limit": 3}, headers=headers)
+        assert response.status_code == 200
+        seen += [booking["id"] for booking in response.json()]
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+    assert sorted(seen) == sorted(booking_ids)
@@ -0,0 +1,92 @@
+"""
+Проверка эндпоинтов по объявленному бюджету SQL-запросов (query_budget).
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.database import engine
+from app.utils.query_stats import (
+    QUERIES_HEADER,
+    QueryStatsMiddleware,
+    assert_route_queries,
+    query_budget,
+    route_query_budget,
+)
+from tests.conftest import add_bookings, auth_headers
+
+budget_app = FastAPI()
+budget_app.add_middleware(QueryStatsMiddleware)
+
+
+def run_queries(count: int):
+    with engine.connect() as connection:
+        for _ in range(count):
+            connection.execute(text("SELECT 1"))
+
+
+@budget_app.get("/within/{item_id}")
+@query_budget(2)
+def within_budget(item_id: int):
+    run_queries(2)
+    return {"id": item_id}
+
+
+@budget_app.get("/over")
+@query_budget(1)
+def over_budget():
+    run_queries(3)
+    return {}
+
+
+@budget_app.get("/undeclared")
+def undeclared():
+    return {}
+
+
+@pytest.fixture
+def budget_client():
+    with TestClient(budget_app) as test_client:
+        yield test_client
+
+
+def test_route_query_budget_resolves_endpoint(client):
+    assert route_query_budget(budget_app, "get", "/within/7") == 2
+    assert route_query_budget(budget_app, "GET", "/undeclared") is None
+    assert route_query_budget(client.app, "GET", "/booking/1") == 4
+    assert route_query_budget(client.app, "POST", "/booking") == 10
+
+
+def test_route_within_budget(budget_client):
+    response = assert_route_queries(budget_client, "GET", "/within/7?verbose=1")
+    assert response.status_code == 200
+    assert response.headers[QUERIES_HEADER] == "2"
+
+
+def test_route_over_budget(budget_client):
+    with pytest.raises(AssertionError, match="at most 1 queries, got 3"):
+        assert_route_queries(budget_client, "GET", "/over")
+
+
+def test_route_without_budget(budget_client):
+    with pytest.raises(AssertionError, match="no declared query budget"):
+        assert_route_queries(budget_client, "GET", "/undeclared")
+
+
+def test_strict_mode_rejects_over_budget(budget_client):
+    response = budget_client.get("/over")
+    assert response.status_code == 500
+    assert response.json()["detail"] == "Query budget exceeded: 3 queries, budget 1"
+    assert response.json()["statements"] == ["SELECT 1"] * 3
+
+
+def test_booking_routes_within_declared_budget(client, db, cafe_data):
+    booking_ids = add_bookings(db, cafe_data, 20)
+    headers = auth_headers(cafe_data["user"])
+    assert assert_route_queries(client, "GET", "/booking?limit=50", headers=headers).status_code == 200
+    assert assert_route_queries(client, "GET", f"/booking/{booking_ids[0]}", headers=headers).status_code == 200
+    response = assert_route_queries(
+        client, "PATCH", f"/booking/{booking_ids[0]}", headers=headers, json={"note": "late"}
+    )
+    assert response.status_code == 200
@@ -0,0 +1,33 @@
+"""
+Сброс кэша получателей уведомлений при недоступном Redis.
+"""
+from app.models import Cafe, OutboxMessage, User
+from app.services.recipients import get_cafe_recipients, invalidate_recipients
+from app.tasks.cache import bump_cache_versions
+from app.utils.cache_versions import BUMP_TASK
+from tests.conftest import PASSWORD_HASH, restore_redis
+
+
+def recipient_ids(db, cafe_id: int) -> set:
+    db.expire_all()
+    return {recipient["id"] for recipient in get_cafe_recipients(db, cafe_id)}
+
+
+def test_removed_manager_not_notified_after_failed_invalidation(client, db, cafe_data, redis_server):
+    manager = User(username="manager", email="manager@example.com", password_hash=PASSWORD_HASH, role="manager")
+    cafe = db.get(Cafe, cafe_data["cafe"])
+    cafe.managers.append(manager)
+    db.commit()
+    assert manager.id in recipient_ids(db, cafe.id)
+    
+    # Менеджер снят с кафе, пока Redis недоступен
+    cafe.managers.remove(manager)
+    db.commit()
+    redis_server.connected = False
+    client.portal.call(invalidate_recipients, cafe.id)
+    restore_redis(redis_server)
+    
+    # Воркер Celery читает кэш, пока задача из outbox не повторила сброс
+    message = db.query(OutboxMessage).filter(OutboxMessage.task == BUMP_TASK).one()
+    bump_cache_versions.apply(args=message.args).get()
+    assert recipient_ids(db, cafe.id) == {cafe_data["admin"]}
@@ -0,0 +1,43 @@
+"""
+Сброс кэша ответов каталога при недоступном Redis.
+"""
+from app.models import OutboxMessage
+from app.tasks.cache import bump_cache_versions
+from app.utils import cache_versions
+from app.utils.cache_versions import BUMP_TASK
+from tests.conftest import auth_headers, restore_redis
+
+
+def dish_names(client) -> list:
+    response = client.get("/dishes")
+    assert response.status_code == 200
+    return sorted(dish["name"] for dish in response.json())
+
+
+def rename_dish_without_redis(client, db, data: dict, redis_server):
+    assert dish_names(client) == ["Dish 0", "Dish 1", "Dish 2"]
+    redis_server.connected = False
+    response = client.patch(
+        f"/dishes/{data['dishes'][0]}",
+        headers=auth_headers(data["admin"]),
+        json={"name": "Renamed"},
+    )
+    assert response.status_code == 200
+    restore_redis(redis_server)
+
+
+def test_failed_invalidation_retried_before_read(client, db, cafe_data, redis_server):
+    rename_dish_without_redis(client, db, cafe_data, redis_server)
+    assert dish_names(client) == ["Dish 1", "Dish 2", "Renamed"]
+    assert cache_versions._pending == {}
+
+
+def test_failed_invalidation_persisted_for_other_processes(client, db, cafe_data, redis_server, monkeypatch):
+    rename_dish_without_redis(client, db, cafe_data, redis_server)
+    # Другой воркер API не знает о неудавшемся сбросе и видит старый ответ
+    monkeypatch.setattr(cache_versions, "_pending", {})
+    assert dish_names(client) == ["Dish 0", "Dish 1", "Dish 2"]
+    
+    message = db.query(OutboxMessage).filter(OutboxMessage.task == BUMP_TASK).one()
+    bump_cache_versions.apply(args=message.args).get()
+    assert dish_names(client) == ["Dish 1", "Dish 2", "Renamed"]
@@ -0,0 +1,57 @@
+"""
+Кэш пользователей авторизации и его сброс при изменении пользователя.
+"""
+from app.core import user_cache
+from app.models import User
+from tests.conftest import auth_headers, restore_redis
+
+
+def test_get_me_missing_user(client, db, cafe_data):
+    headers = auth_headers(cafe_data["user"])
+    assert client.get("/users/me", headers=headers).status_code == 200
+    # Пользователь остается в кэше авторизации, но записи в БД уже нет
+    db.query(User).filter(User.id == cafe_data["user"]).delete()
+    db.commit()
+    response = client.get("/users/me", headers=headers)
+    assert response.status_code == 404
+    assert response.json()["detail"] == "User not found"
+    user_cache._local_cache.clear()
+
+
+def test_block_user_invalidates_cache(client, cafe_data, redis_server):
+    user_headers = auth_headers(cafe_data["user"])
+    assert client.get("/users/me", headers=user_headers).status_code == 200
+    assert client.portal.call(user_cache.get_cached_user, cafe_data["user"])["active"]
+    
+    response = client.delete(f"/users/{cafe_data['user']}", headers=auth_headers(cafe_data["admin"]))
+    assert response.status_code == 204
+    assert client.get("/users/me", headers=user_headers).status_code == 403
+
+
+def test_block_user_fails_closed_without_redis(client, db, cafe_data, redis_server):
+    user_headers = auth_headers(cafe_data["user"])
+    admin_headers = auth_headers(cafe_data["admin"])
+    assert client.get("/users/me", headers=user_headers).status_code == 200
+    assert client.get("/users/me", headers=admin_headers).status_code == 200
+    
+    # Удаление из Redis не подтверждено: блокировка не сохраняется
+    redis_server.connected = False
+    response = client.delete(f"/users/{cafe_data['user']}", headers=admin_headers)
+    assert response.status_code == 503
+    assert db.get(User, cafe_data["user"]).active
+    
+    # После восстановления Redis блокировка проходит и запись в кэше сброшена
+    restore_redis(redis_server)
+    assert client.delete(f"/users/{cafe_data['user']}", headers=admin_headers).status_code == 204
+    user_cache._local_cache.clear()
+    assert client.get("/users/me", headers=user_headers).status_code == 403
+
+
+def test_stale_read_not_cached_after_invalidation(client, db, cafe_data, redis_server):
+    # Запрос прочитал пользователя из БД до commit блокировки и кэширует его после
+    stale = db.get(User, cafe_data["user"])
+    db.expunge(stale)
+    client.portal.call(user_cache.invalidate_user, cafe_data["user"])
+    client.portal.call(user_cache.cache_user, stale)
+    
+    assert client.portal.call(user_cache.get_cached_user, cafe_data["user"]) is None